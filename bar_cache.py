@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+本地日线缓存
+按交易日缓存全市场日线截面（pro.daily(trade_date=...) 一次返回全部股票），
+每个交易日一个文件，历史数据只需下载一次，之后直接从本地读取
+"""
+
+import os
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+
+from trading_calendar import TradingCalendar
+
+
+class DailyBarCache:
+    def __init__(self, pro, cache_dir='bar_cache'):
+        self.pro = pro
+        self.cache_dir = cache_dir
+        self.daily_dir = os.path.join(cache_dir, 'daily')
+        if not os.path.exists(self.daily_dir):
+            os.makedirs(self.daily_dir)
+        self.calendar = TradingCalendar(pro, os.path.join(cache_dir, 'trade_cal.csv'))
+        self._memory = {}  # trade_date -> DataFrame，进程内缓存
+        self._recent = {}  # (field, sessions, before) -> 最近几个交易日的矩阵
+
+    def get_trade_dates(self, start_date, end_date):
+        """获取区间内的交易日列表（升序，格式YYYYMMDD）"""
+        return self.calendar.range(start_date, end_date)
+
+    def _cache_file(self, trade_date):
+        return os.path.join(self.daily_dir, f'{trade_date}.csv')
+
+    def get_daily(self, trade_date):
+        """获取某个交易日的全市场日线截面，优先读本地缓存"""
+        if trade_date in self._memory:
+            return self._memory[trade_date]
+
+        filename = self._cache_file(trade_date)
+        if os.path.exists(filename):
+            df = pd.read_csv(filename, dtype={'ts_code': str, 'trade_date': str})
+        else:
+            df = self.pro.daily(trade_date=trade_date)
+            # 收盘前当天数据为空，不写缓存，下次再取
+            if df is None or df.empty:
+                return pd.DataFrame()
+            df['trade_date'] = df['trade_date'].astype(str)
+            df.to_csv(filename, index=False)
+
+        self._memory[trade_date] = df
+        return df
+
+    def prefetch(self, trade_dates, max_workers=4):
+        """并发下载本地缺失的交易日截面"""
+        missing = [d for d in trade_dates
+                   if d not in self._memory and not os.path.exists(self._cache_file(d))]
+        if not missing:
+            return
+
+        print(f"本地缓存缺少 {len(missing)} 个交易日，开始下载...")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self.get_daily, d) for d in missing]
+            for future in tqdm(futures, desc="下载日线截面"):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"下载日线截面失败: {str(e)}")
+
+    def load_panel(self, trade_dates, field='pct_chg'):
+        """加载多个交易日的截面，返回 日期×股票 矩阵（行按日期升序）"""
+        self.prefetch(trade_dates)
+
+        frames = [self.get_daily(d) for d in trade_dates]
+        frames = [df[['trade_date', 'ts_code', field]] for df in frames if not df.empty]
+        if not frames:
+            return pd.DataFrame()
+
+        df = pd.concat(frames, ignore_index=True)
+        return df.pivot(index='trade_date', columns='ts_code', values=field).sort_index()
+
+    def load_rows(self, trade_dates, fields, codes=None, progress=True):
+        """加载多个交易日的截面，返回 (ts_code, trade_date, fields...) 长表（按股票、日期排序）
+        直接读本地文件，不放进进程内缓存（回测一次读取多年数据）
+        codes: 只保留这些股票（每个截面读入后立即过滤，不拼接全市场的长表）
+        progress: 是否显示读取进度条
+        """
+        self.prefetch(trade_dates)
+
+        columns = ['ts_code', 'trade_date'] + list(fields)
+        if codes is not None:
+            codes = set(codes)
+        frames = []
+        for trade_date in tqdm(trade_dates, desc="读取日线截面", disable=not progress):
+            if trade_date in self._memory:
+                df = self._memory[trade_date][columns]
+            elif os.path.exists(self._cache_file(trade_date)):
+                df = pd.read_csv(self._cache_file(trade_date), usecols=columns,
+                                 dtype={'ts_code': str, 'trade_date': str})
+            else:
+                continue
+            frames.append(df if codes is None else df[df['ts_code'].isin(codes)])
+        if not frames:
+            return pd.DataFrame(columns=columns)
+
+        df = pd.concat(frames, ignore_index=True)
+        return df.sort_values(['ts_code', 'trade_date'], kind='stable').reset_index(drop=True)
+
+    def recent_panel(self, field, sessions, before):
+        """before（不含，YYYYMMDD）之前最近 sessions 个交易日的 日期×股票 矩阵
+        同一参数只加载一次，供盘中批量检查共用
+        """
+        key = (field, sessions, before)
+        if key not in self._recent:
+            trade_dates = self.calendar.recent(sessions, before, inclusive=False)
+            self._recent[key] = self.load_panel(trade_dates, field)
+        return self._recent[key]
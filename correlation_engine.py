@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+股票涨跌相关性计算
+一次性加载 股票×交易日 收益率矩阵并标准化，
+任意两只股票的相关系数 = 标准化收益率向量的内积 / 天数，
+所有需要的相关性用一次矩阵乘法算出，不再逐对请求和计算
+"""
+
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+
+class CorrelationEngine:
+    def __init__(self, bar_cache, days=5):
+        self.bar_cache = bar_cache
+        self.days = days  # 使用最近多少个交易日的涨跌幅
+        self.codes = pd.Index([])  # 矩阵行对应的股票代码
+        self.zscores = np.empty((0, 0))  # 股票×交易日 标准化收益率
+        self.loaded_date = None
+
+    def load_returns(self):
+        """加载最近 days 个交易日的涨跌幅矩阵（当天只加载一次）"""
+        today = datetime.now().strftime('%Y%m%d')
+        if self.loaded_date == today:
+            return
+
+        # 收盘前当天没有日线，多取一个交易日，按实际有数据的取最近 days 个
+        trade_dates = self.bar_cache.calendar.recent(self.days + 1, today)
+        panel = self.bar_cache.load_panel(trade_dates, 'pct_chg').tail(self.days)
+
+        # 停牌（缺数据）和涨跌幅完全不变的股票无法计算相关性
+        panel = panel.dropna(axis=1)
+        returns = panel.T.to_numpy(dtype=np.float64)
+        std = returns.std(axis=1)
+        valid = std > 0
+
+        self.codes = panel.columns[valid]
+        returns = returns[valid]
+        self.zscores = (returns - returns.mean(axis=1, keepdims=True)) / std[valid][:, None]
+        self.loaded_date = today
+        print(f"相关性矩阵已加载: {len(self.codes)} 只股票 × {returns.shape[1]} 个交易日")
+
+    def correlations(self, targets, candidates=None):
+        """计算 targets 与 candidates 的相关系数矩阵
+        返回: DataFrame（行: targets，列: candidates），缺数据的股票不出现在结果中
+        """
+        self.load_returns()
+
+        target_idx = self.codes.get_indexer(pd.Index(targets))
+        target_idx = target_idx[target_idx >= 0]
+        if candidates is None:
+            cand_idx = np.arange(len(self.codes))
+        else:
+            cand_idx = self.codes.get_indexer(pd.Index(candidates))
+            cand_idx = cand_idx[cand_idx >= 0]
+
+        n_days = self.zscores.shape[1] if self.zscores.size else 1
+        corr = self.zscores[target_idx] @ self.zscores[cand_idx].T / n_days
+        return pd.DataFrame(corr, index=self.codes[target_idx], columns=self.codes[cand_idx])
+
+    def related_groups(self, targets, candidates=None, threshold=0.8):
+        """找出每只目标股票的关联股票（相关系数 >= threshold）
+        返回: {target: set(related_codes)}
+        """
+        corr = self.correlations(targets, candidates)
+        related = {}
+        mask = corr.to_numpy() >= threshold
+        columns = corr.columns.to_numpy()
+        for i, target in enumerate(corr.index):
+            related[target] = set(columns[mask[i]]) - {target}
+        return related
+
+
+class IntradayCorrelationTracker:
+    """盘中滚动相关性
+    每只股票保留最近 window 个tick的对数收益率（环形缓冲区，所有股票共用写指针），
+    同时增量维护窗口内收益率的和与平方和（均值、方差），每个tick更新代价 O(N)。
+    聚类只看波动最大的 max_active 只股票（活跃集合，每 window 个tick重选一次），
+    活跃集合两两收益率乘积的窗口和也随tick增量维护（加入新tick、减去被覆盖的tick，O(max_active²)），
+    聚类时直接由它得到协方差和相关矩阵，相关系数 >= threshold 的股票连成一组（连通分量）
+    """
+
+    def __init__(self, window=120, threshold=0.7, min_cluster_size=3, max_active=300):
+        self.window = window
+        self.threshold = threshold
+        self.min_cluster_size = min_cluster_size
+        self.max_active = max_active
+
+        self.code_index = {}  # ts_code -> 行号
+        self.codes = []
+        capacity = 1024
+        self.returns = np.zeros((capacity, window), dtype=np.float32)
+        self.sums = np.zeros(capacity, dtype=np.float64)
+        self.sumsq = np.zeros(capacity, dtype=np.float64)
+        self.last_price = np.full(capacity, np.nan, dtype=np.float64)
+        self.pos = 0  # 下一个tick写入的列
+        self.count = 0  # 已写入的tick数（最多window）
+
+        self.active = np.empty(0, dtype=np.int64)  # 活跃集合的行号
+        self.cross = np.zeros((0, 0), dtype=np.float64)  # 活跃集合窗口内 r_i * r_j 之和
+        self.since_select = 0  # 距上次重选活跃集合的tick数
+
+    def _grow(self, needed):
+        """扩容缓冲区（按倍数扩容，均摊O(1)）"""
+        capacity = len(self.sums)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        extra = capacity - len(self.sums)
+        self.returns = np.vstack([self.returns, np.zeros((extra, self.window), dtype=np.float32)])
+        self.sums = np.concatenate([self.sums, np.zeros(extra)])
+        self.sumsq = np.concatenate([self.sumsq, np.zeros(extra)])
+        self.last_price = np.concatenate([self.last_price, np.full(extra, np.nan)])
+
+    def _rows(self, codes):
+        """股票代码转行号，新股票分配新行"""
+        rows = np.empty(len(codes), dtype=np.int64)
+        for i, code in enumerate(codes):
+            row = self.code_index.get(code)
+            if row is None:
+                row = len(self.codes)
+                self.code_index[code] = row
+                self.codes.append(code)
+            rows[i] = row
+        self._grow(len(self.codes))
+        return rows
+
+    def update(self, codes, prices):
+        """写入一个tick的报价（本tick没有报价的股票收益率记为0）"""
+        rows = self._rows(codes)
+        prices = np.asarray(prices, dtype=np.float64)
+        n = len(self.codes)
+
+        tick_returns = np.zeros(n, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = np.log(prices / self.last_price[rows])
+        tick_returns[rows] = np.where(np.isfinite(r), r, 0.0)
+        # 按缓冲区精度取值，增量加入和日后减去的是同一个数
+        tick_returns = tick_returns.astype(np.float32).astype(np.float64)
+
+        valid_price = prices > 0
+        self.last_price[rows[valid_price]] = prices[valid_price]
+
+        # 增量更新窗口统计：加入新值，减去被覆盖的旧值
+        old = self.returns[:n, self.pos].astype(np.float64)
+        self.sums[:n] += tick_returns - old
+        self.sumsq[:n] += tick_returns * tick_returns - old * old
+        if len(self.active):
+            new_active, old_active = tick_returns[self.active], old[self.active]
+            self.cross += np.outer(new_active, new_active) - np.outer(old_active, old_active)
+        self.returns[:n, self.pos] = tick_returns
+        self.since_select += 1
+
+        self.pos = (self.pos + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+
+    def clusters(self):
+        """找出当前联动的股票组
+        返回: [[ts_code, ...], ...]，按组大小降序
+        """
+        n = len(self.codes)
+        if n == 0 or self.count < self.window // 2:
+            return []
+
+        if not len(self.active) or self.since_select >= self.window:
+            self._select_active()
+
+        # 由增量维护的和、平方和、乘积和得到活跃集合的相关矩阵
+        k = self.window
+        active = self.active
+        mean = self.sums[active] / k
+        var = self.sumsq[active] / k - mean * mean
+        keep = var > 1e-18  # 窗口内没有波动（或只剩浮点误差）的股票不参与
+        if keep.sum() < self.min_cluster_size:
+            return []
+        active, mean, std = active[keep], mean[keep], np.sqrt(var[keep])
+        cov = self.cross[np.ix_(keep, keep)] / k - np.outer(mean, mean)
+        adjacency = (cov / np.outer(std, std)) >= self.threshold
+
+        # 连通分量
+        groups = []
+        visited = np.zeros(len(active), dtype=bool)
+        for start in range(len(active)):
+            if visited[start]:
+                continue
+            visited[start] = True
+            members = [start]
+            queue = [start]
+            while queue:
+                node = queue.pop()
+                neighbors = np.flatnonzero(adjacency[node] & ~visited)
+                visited[neighbors] = True
+                members.extend(neighbors.tolist())
+                queue.extend(neighbors.tolist())
+            if len(members) >= self.min_cluster_size:
+                groups.append([self.codes[active[i]] for i in members])
+
+        groups.sort(key=len, reverse=True)
+        return groups
+
+    def _select_active(self):
+        """重选活跃集合（波动最大的 max_active 只），并从缓冲区重算窗口统计，
+        同时消除增量更新累积的浮点误差
+        """
+        n = len(self.codes)
+        window_returns = self.returns[:n].astype(np.float64)
+        self.sums[:n] = window_returns.sum(axis=1)
+        self.sumsq[:n] = (window_returns * window_returns).sum(axis=1)
+
+        k = self.window
+        mean = self.sums[:n] / k
+        var = np.maximum(self.sumsq[:n] / k - mean * mean, 0.0)
+
+        # 只对波动最大的股票聚类，控制矩阵规模
+        active = np.flatnonzero(var > 0)
+        if len(active) > self.max_active:
+            active = active[np.argsort(var[active])[-self.max_active:]]
+        self.active = active
+        self.cross = window_returns[active] @ window_returns[active].T
+        self.since_select = 0
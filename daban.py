@@ -7,29 +7,60 @@ import numpy as np
 import time
 import os
 import sys
-from datetime import datetime, timedelta
-import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
+import json
+from datetime import datetime
 import threading
 import random
-from tqdm import tqdm
 import requests  # 添加到文件顶部的导入部分
 
+from bar_cache import DailyBarCache
+from correlation_engine import CorrelationEngine, IntradayCorrelationTracker
+from minute_bars import MinuteBarBuffer
+from quote_scheduler import TieredQuoteScheduler
+from quote_client import default_client
+from quote_snapshot import fetch_quotes
+from universe import StockUniverse, BOARD_MAIN
+from tick_recorder import SystemClock, ReplayClock, TickRecorder, TickTape
+from limit_up_data import LimitUpDataset
+
+# 本地缓存目录（脚本所在目录下的 bar_cache，与复盘工具、量价分析共用，不随运行目录变化）
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bar_cache')
+
 
 class StockMonitor:
-    def __init__(self, stock_list, upper_limit=0.1, lower_limit=-0.1):
+    def __init__(self, stock_list, upper_limit=0.1, lower_limit=-0.1, clock=None):
         ts.set_token('854634d420c0b6aea2907030279da881519909692cf56e6f35c4718c')
         self.pro = ts.pro_api()
         self.stock_list = stock_list
         self.upper_limit = upper_limit
         self.lower_limit = lower_limit
+        self.clock = clock or SystemClock()  # 时钟（回放时注入回放时钟）
+        self.live = True  # 实盘模式：发送通知、回补分钟K线；回放时关闭
         self.last_prices = {}
         self.current_batch = 0  # 追踪当前批次
         self.lock = threading.Lock()  # 添加线程锁
         self.hot_concepts = {}  # 存储关联板块信息
         self.first_limit_up_stocks = set()  # 存储3天内首次涨停的股票
+        self.early_volume_stocks = set()  # 10:30前成交额超过1.5亿的股票
         self.related_stocks = {}  # 存储股票关联关系
         self.all_stocks_data = None  # 初始化为 None，而不是空 DataFrame
+        self.bar_cache = DailyBarCache(self.pro, CACHE_DIR)  # 本地日线截面缓存
+        self.universe = StockUniverse(self.pro, CACHE_DIR)  # 全市场股票表（代码 -> int32 编号）
+        self.limit_up = LimitUpDataset(self.bar_cache, CACHE_DIR)  # 每日涨停记录（日线 + 复盘梯队）
+        self.correlation_engine = CorrelationEngine(self.bar_cache)  # 涨跌相关性计算
+        self.intraday_tracker = IntradayCorrelationTracker()  # 盘中滚动相关性
+        self.tick_count = 0  # 已处理的行情轮数
+        self.cluster_interval = 30  # 每隔多少轮输出一次盘中联动板块
+        self.minute_bars = MinuteBarBuffer()  # 由行情快照聚合的分钟K线
+        self.minute_bars_backfilled = set()  # 已用 pro_bar 回补过的股票
+        self.minute_bars_need_backfill = False  # 盘中启动或断线重连后需要回补
+        self.last_tick_time = None
+        self.concept_cache = {}  # ts_code -> 所属概念（当天只查一次）
+        self.concept_stocks_cache = {}  # 概念代码 -> 成分股
+        self.quote_client = default_client()  # 异步行情客户端（连接池 + 并发限制）
+        self.poll_config = {'quiet_every': 1}  # 行情轮询配置，默认每轮取全部股票
+        self.quote_scheduler = None
+        self.filter_state = None  # 筛选用的涨停状态（每只股票窗口内的涨停日期）
 
         # 修改飞书配置，使用 webhook
         self.feishu_webhook = "https://open.feishu.cn/open-apis/bot/v2/hook/4ae401fd-fb8f-490b-b496-f437e8b15227"
@@ -50,9 +81,8 @@ class StockMonitor:
         self.current_batch += 1
 
         try:
-            stock_str = ','.join(stocks_to_monitor)
-            df = ts.realtime_quote(ts_code=stock_str)
-            if df is not None and not df.empty:
+            df = self.quote_client.fetch_sync(stocks_to_monitor)
+            if not df.empty:
                 print(f"\n正在监控第 {self.current_batch} 批股票 (总共 {len(self.stock_list)} 只)")
                 return df
             return pd.DataFrame()
@@ -61,36 +91,53 @@ class StockMonitor:
             return pd.DataFrame()
 
     def get_minute_vol(self, ts_code, limit=30):
-        """获取最近30分钟的分钟级别数据"""
+        """获取最近30分钟的分钟级别数据（从分钟K线缓冲区读取，不请求接口）"""
+        if self.minute_bars_need_backfill and ts_code not in self.minute_bars_backfilled:
+            self.backfill_minute_bars(ts_code)
+        return self.minute_bars.minute_amount_stats(ts_code, limit)
+
+    def backfill_minute_bars(self, ts_code):
+        """用 pro_bar 回补一只股票当天的分钟K线（每只股票只回补一次）"""
+        self.minute_bars_backfilled.add(ts_code)
         try:
-            # 修正pro_bar的调用方式
             df = ts.pro_bar(
                 ts_code=ts_code,
                 freq='1min',
-                start_date=datetime.now().strftime('%Y%m%d'),
-                end_date=datetime.now().strftime('%Y%m%d'),
+                start_date=self.clock.now().strftime('%Y%m%d'),
+                end_date=self.clock.now().strftime('%Y%m%d'),
                 asset='E',
                 adj='qfq'
             )
-
-            if df is not None and not df.empty:
-                # 计算最高成交额和对应时间
-                max_amount = df['amount'].max()
-                max_amount_time = df.loc[df['amount'] == max_amount, 'trade_time'].iloc[0]
-                latest_amount = df['amount'].iloc[0]  # 最新一分钟成交额
-
-                return {
-                    'latest_amount': latest_amount / 10000,  # 转换为万元
-                    'max_amount': max_amount / 10000,
-                    'max_amount_time': max_amount_time
-                }
+            self.minute_bars.backfill(ts_code, df)
         except Exception as e:
             print(f"获取{ts_code}分钟数据失败: {str(e)}")
-        return None
+
+    def update_minute_bars(self, df):
+        """用本轮行情快照更新分钟K线；行情中断超过1分钟视为重连，之后按需重新回补"""
+        now = self.clock.now()
+        if self.last_tick_time is None:
+            # 开盘1分钟内启动的不需要回补
+            self.minute_bars_need_backfill = self.live and now.time() > datetime.strptime('09:31:00', '%H:%M:%S').time()
+        elif (now - self.last_tick_time).total_seconds() > 60:
+            lunch_break = (self.last_tick_time.time() <= datetime.strptime('11:30:00', '%H:%M:%S').time()
+                           and now.time() >= datetime.strptime('13:00:00', '%H:%M:%S').time())
+            if not lunch_break and self.live:
+                print("\n行情中断超过1分钟，分钟K线将按需重新回补")
+                self.minute_bars_need_backfill = True
+                self.minute_bars_backfilled.clear()
+        self.last_tick_time = now
+
+        self.minute_bars.update(df['ts_code'].to_numpy(),
+                                df['price'].to_numpy(),
+                                pd.to_numeric(df['volume'], errors='coerce').to_numpy(),
+                                df['amount'].to_numpy(),
+                                now)
 
     def is_trading_time(self):
-        """判断当前是否为交易时间"""
-        now = datetime.now().time()
+        """判断当前是否为交易时间（节假日、周末不是交易日）"""
+        if not self.bar_cache.calendar.is_trading_day(self.clock.now()):
+            return False
+        now = self.clock.now().time()
         
         # 定义交易时间段
         morning_start = datetime.strptime('09:30:00', '%H:%M:%S').time()
@@ -104,17 +151,27 @@ class StockMonitor:
         
         return is_morning_trading or is_afternoon_trading
 
-    def monitor(self, interval=1):
-        """修改监控函数，添加交易时间判断和开盘提醒"""
+    def monitor(self, interval=1, fetch=None, recorder=None):
+        """修改监控函数，添加交易时间判断和开盘提醒
+        参数: fetch - 行情获取函数（回放时传入），recorder - 行情录制器（可选）
+        """
         last_status = False  # 记录上一次的交易状态
+        if fetch is None:
+            # 本机行情守护进程在运行时读共享快照，否则直接请求；
+            # 截止时间留出处理时间，超时未返回的批次沿用上一次报价
+            fetch = lambda codes: fetch_quotes(codes, deadline=interval * 0.8)
+        if recorder is not None:
+            fetch = recorder.wrap(fetch, self.clock)
+        self.quote_scheduler = TieredQuoteScheduler(fetch, self.stock_list,
+                                                    budget=interval, **self.poll_config)
         
-        while True:
+        while self.clock.running():
             try:
                 current_status = self.is_trading_time()
                 
                 # 检测是否刚开盘（状态从非交易变为交易）
-                if current_status and not last_status:
-                    current_time = datetime.now().strftime('%H:%M:%S')
+                if current_status and not last_status and self.live:
+                    current_time = self.clock.now().strftime('%H:%M:%S')
                     print(f"\n市场开盘了！当前时间: {current_time}")
                     
                     # 发送飞书通知
@@ -140,351 +197,445 @@ class StockMonitor:
                 
                 # 非交易时间处理
                 if not current_status:
-                    current_time = datetime.now().strftime('%H:%M:%S')
+                    current_time = self.clock.now().strftime('%H:%M:%S')
                     print(f"\r当前时间 {current_time} 不在交易时间内，等待中...", end='')
-                    time.sleep(60)  # 非交易时间每分钟检查一次
+                    self.clock.sleep(60)  # 非交易时间每分钟检查一次
                     continue
                     
-                # 使用线程池并行获取数据
-                with ThreadPoolExecutor(max_workers=5) as executor:
-                    futures = []
-                    for i in range(0, len(self.stock_list), 50):
-                        batch = self.stock_list[i:i + 50]
-                        futures.append(executor.submit(self.get_batch_data, batch))
-
-                    # 收集所有批次的数据
-                    all_data = []
-                    for future in concurrent.futures.as_completed(futures):
-                        result = future.result()
-                        if result is not None and not result.empty:
-                            all_data.append(result)
-
-                    if all_data:
-                        # 合并所有数据
-                        df = pd.concat(all_data, ignore_index=True)
-
-                        # 处理数据
-                        df['price'] = pd.to_numeric(df['price'], errors='coerce')
-                        df['pre_close'] = pd.to_numeric(df['pre_close'], errors='coerce')
-                        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-                        df['pct_chg'] = (df['price'] - df['pre_close']) / df['pre_close'] * 100
-
-                        # 找出涨停股票
-                        limit_up_stocks = df[df['pct_chg'] >= 9.5].copy()
-
-                        if not limit_up_stocks.empty:
-                            print(f"\n发现 {len(limit_up_stocks)} 只涨停股票")
-
-                            # 获取所有涨停股票的概念信息
-                            concept_groups = {}  # 存储每个概念下的涨停股票
-                            concept_codes = {}  # 存储概念名称到代码的映射
-                            other_stocks = limit_up_stocks.copy()  # 用于存储不属于热门概念的涨停股
-
-                            for _, stock in limit_up_stocks.iterrows():
-                                try:
-                                    concepts = self.pro.concept_detail(ts_code=stock['ts_code'])
-                                    if concepts is not None and not concepts.empty:
-                                        for _, concept in concepts.iterrows():
-                                            concept_name = concept['concept_name']
-                                            concept_code = concept['id']
-                                            if concept_name not in concept_groups:
-                                                concept_groups[concept_name] = []
-                                                concept_codes[concept_name] = concept_code
-                                            concept_groups[concept_name].append(stock)
-                                except Exception as e:
-                                    print(f"获取概念信息失败: {str(e)}")
-
-                            # 筛选涨停数量大于等于3的概念
-                            hot_concepts = {k: v for k, v in concept_groups.items() if len(v) >= 3}
-
-                            # 从其他股票中移除属于热门概念的股票
-                            if hot_concepts:
-                                hot_stocks = set()
-                                for stocks in hot_concepts.values():
-                                    hot_stocks.update([stock['ts_code'] for stock in stocks])
-                                other_stocks = other_stocks[~other_stocks['ts_code'].isin(hot_stocks)]
-
-                            # 先显示热门概念板块
-                            if hot_concepts:
-                                print("\n=== 热门概念板块（涨停数量>=3）===")
-                                for concept_name, stocks in hot_concepts.items():
-                                    print(f"\n【{concept_name}】概念 已有{len(stocks)}只涨停")
-                                    print("=" * 80)
-
-                                    print("\n涨停股票:")
-                                    print("-" * 80)
-                                    for stock in stocks:
-                                        print(f"{stock['ts_code']} {stock['name']} "
-                                              f"涨幅: {stock['pct_chg']:.2f}% "
-                                              f"成交额: {float(stock['amount']) / 10000:.2f}万")
-
-                                    # 获取同概念未涨停的潜力股
-                                    try:
-                                        concept_code = concept_codes.get(concept_name)
-                                        if concept_code:
-                                            concept_stocks = self.pro.concept_detail(id=concept_code)
-                                            if concept_stocks is not None and not concept_stocks.empty:
-                                                potential_stocks = df[
-                                                    (df['ts_code'].isin(concept_stocks['ts_code'])) &
-                                                    (df['pct_chg'] >= 6.0) &
-                                                    (df['pct_chg'] < 9.5)
-                                                    ]
-
-                                                if not potential_stocks.empty:
-                                                    print("\n同概念潜力股(涨幅6%-9.5%):")
-                                                    print("-" * 80)
-                                                    for _, pot_stock in potential_stocks.iterrows():
-                                                        print(f"{pot_stock['ts_code']} {pot_stock['name']} "
-                                                              f"涨幅: {pot_stock['pct_chg']:.2f}% "
-                                                              f"成交额: {float(pot_stock['amount']) / 10000:.2f}万")
-
-                                                    # 发送飞书通知
-                                                    self.send_feishu_message(concept_name, stocks, potential_stocks)
-
-                                    except Exception as e:
-                                        print(f"获取同概念股票失败: {str(e)}")
-
-                                    print("\n" + "=" * 80)
-
-                            # 显示其他涨停股票
-                            if not other_stocks.empty:
-                                print("\n=== 其他涨停股票 ===")
-                                print("=" * 80)
-                                for _, stock in other_stocks.iterrows():
-                                    print(f"\n{stock['ts_code']} {stock['name']} "
-                                          f"涨幅: {stock['pct_chg']:.2f}% "
-                                          f"成交额: {float(stock['amount']) / 10000:.2f}万")
-
-                                    # 显示该股票所属的所有概念（涨停数<3的概念）
-                                    try:
-                                        concepts = self.pro.concept_detail(ts_code=stock['ts_code'])
-                                        if concepts is not None and not concepts.empty:
-                                            stock_concepts = []
-                                            for _, concept in concepts.iterrows():
-                                                concept_name = concept['concept_name']
-                                                if concept_name in concept_groups:
-                                                    count = len(concept_groups[concept_name])
-                                                    stock_concepts.append(f"{concept_name}({count}只涨停)")
-                                            if stock_concepts:
-                                                print(f"所属概念: {', '.join(stock_concepts)}")
-                                    except Exception as e:
-                                        print(f"获取概念信息失败: {str(e)}")
+                # 分层轮询获取行情（热门股每轮都取，冷门股分片轮流取）
+                tick_start = time.perf_counter()
+                df = self.quote_scheduler.poll()
+                if not df.empty:
+                    self.process_snapshot(df)
+                self.quote_scheduler.record_tick(time.perf_counter() - tick_start)
 
-                                    print("-" * 80)
-
-                print(f"\n等待 {interval} 秒后开始下一轮...")
-                time.sleep(interval)
+                wait = max(0.0, interval - (time.perf_counter() - tick_start))
+                print(f"\n等待 {wait:.1f} 秒后开始下一轮...")
+                self.clock.sleep(wait)
 
             except Exception as e:
                 print(f"监控异常: {str(e)}")
-                time.sleep(interval)
-
-    def get_batch_data(self, batch):
-        """获取单个批次的数据"""
-        try:
-            stock_str = ','.join(batch)
-            df = ts.realtime_quote(ts_code=stock_str)
-            if df is not None and not df.empty:
-                df.columns = df.columns.str.lower()
-                return df
-        except Exception as e:
-            print(f"获取批次数据失败: {str(e)}")
-        return None
+                self.clock.sleep(interval)
+
+    def replay(self, path, speed=None, interval=1):
+        """回放录制的一天行情（speed=None 尽快回放，1 为实盘速度），最后输出每轮耗时报告"""
+        tape = TickTape.load(path)
+        if len(tape) == 0:
+            print(f"录制文件 {path} 中没有行情")
+            return
+
+        self.clock = ReplayClock(tape.times, speed)
+        self.live = False
+        self.stock_list = tape.codes
+        print(f"\n开始回放 {path}: {len(tape)} 批行情，{len(tape.codes)} 只股票")
+
+        start = time.perf_counter()
+        self.monitor(interval, fetch=lambda codes: tape.batch(self.clock.index))
+        if self.quote_scheduler.tick % self.quote_scheduler.report_every:
+            self.quote_scheduler.print_latency_report()
+        print(f"\n回放完成，用时 {time.perf_counter() - start:.1f} 秒")
+
+    def process_snapshot(self, df):
+        """处理一轮全量行情快照：更新分钟K线和盘中相关性，输出涨停及热门概念"""
+        # 处理数据
+        df['price'] = pd.to_numeric(df['price'], errors='coerce')
+        df['pre_close'] = pd.to_numeric(df['pre_close'], errors='coerce')
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+        df['pct_chg'] = (df['price'] - df['pre_close']) / df['pre_close'] * 100
+
+        # 更新分钟K线
+        self.update_minute_bars(df)
+
+        # 更新盘中收益率缓冲区，定期输出盘中联动板块
+        self.intraday_tracker.update(df['ts_code'].to_numpy(), df['price'].to_numpy())
+        self.tick_count += 1
+        if self.tick_count % self.cluster_interval == 0:
+            self.print_hidden_sectors(df)
+
+        # 找出涨停股票
+        limit_up_stocks = df[df['pct_chg'] >= 9.5].copy()
+        snapshot_ids = self.universe.ids(df['ts_code'])
+
+        if not limit_up_stocks.empty:
+            print(f"\n发现 {len(limit_up_stocks)} 只涨停股票")
+
+            # 批量标注首板、早盘成交额达标
+            limit_up_stocks['alert_flags'] = self.get_alert_flags(limit_up_stocks)
+
+            # 获取所有涨停股票的概念信息
+            concept_groups = {}  # 存储每个概念下的涨停股票
+            concept_codes = {}  # 存储概念名称到代码的映射
+            other_stocks = limit_up_stocks.copy()  # 用于存储不属于热门概念的涨停股
+
+            for _, stock in limit_up_stocks.iterrows():
+                try:
+                    concepts = self.get_stock_concepts(stock['ts_code'])
+                    if concepts is not None and not concepts.empty:
+                        for _, concept in concepts.iterrows():
+                            concept_name = concept['concept_name']
+                            concept_code = concept['id']
+                            if concept_name not in concept_groups:
+                                concept_groups[concept_name] = []
+                                concept_codes[concept_name] = concept_code
+                            concept_groups[concept_name].append(stock)
+                except Exception as e:
+                    print(f"获取概念信息失败: {str(e)}")
+
+            # 筛选涨停数量大于等于3的概念
+            hot_concepts = {k: v for k, v in concept_groups.items() if len(v) >= 3}
+
+            # 从其他股票中移除属于热门概念的股票
+            if hot_concepts:
+                hot_stocks = set()
+                for stocks in hot_concepts.values():
+                    hot_stocks.update([stock['ts_code'] for stock in stocks])
+                # 不在股票表中的代码编号为 -1，不能参与匹配
+                other_ids = self.universe.ids(other_stocks['ts_code'])
+                hot_ids = self.universe.ids(list(hot_stocks))
+                other_stocks = other_stocks[~((other_ids >= 0) & np.isin(other_ids, hot_ids[hot_ids >= 0]))]
+
+            # 先显示热门概念板块
+            if hot_concepts:
+                print("\n=== 热门概念板块（涨停数量>=3）===")
+                for concept_name, stocks in hot_concepts.items():
+                    print(f"\n【{concept_name}】概念 已有{len(stocks)}只涨停")
+                    print("=" * 80)
+
+                    print("\n涨停股票:")
+                    print("-" * 80)
+                    for stock in stocks:
+                        print(f"{stock['ts_code']} {stock['name']} "
+                              f"涨幅: {stock['pct_chg']:.2f}% "
+                              f"成交额: {float(stock['amount']) / 10000:.2f}万 "
+                              f"{stock['alert_flags']}")
+
+                    # 获取同概念未涨停的潜力股
+                    try:
+                        concept_code = concept_codes.get(concept_name)
+                        if concept_code:
+                            concept_stocks = self.get_concept_stocks(concept_code)
+                            if concept_stocks is not None and not concept_stocks.empty:
+                                # 概念成分中已退市等不在股票表中的代码（编号 -1）不参与匹配
+                                member_ids = self.universe.ids(concept_stocks['ts_code'])
+                                potential_stocks = df[
+                                    (snapshot_ids >= 0) & np.isin(snapshot_ids, member_ids[member_ids >= 0]) &
+                                    (df['pct_chg'] >= 6.0) &
+                                    (df['pct_chg'] < 9.5)
+                                    ]
+
+                                if not potential_stocks.empty:
+                                    print("\n同概念潜力股(涨幅6%-9.5%):")
+                                    print("-" * 80)
+                                    for _, pot_stock in potential_stocks.iterrows():
+                                        print(f"{pot_stock['ts_code']} {pot_stock['name']} "
+                                              f"涨幅: {pot_stock['pct_chg']:.2f}% "
+                                              f"成交额: {float(pot_stock['amount']) / 10000:.2f}万")
 
-    def process_stock_data(self, stock_code, period='3days'):
-        """处理单个股票数据，添加重试机制"""
-        max_retries = 3
-        retry_delay = 1  # 初始延迟1秒
+                                    # 发送飞书通知
+                                    self.send_feishu_message(concept_name, stocks, potential_stocks)
 
-        for attempt in range(max_retries):
-            try:
-                today = datetime.now().strftime('%Y%m%d')
-                if period == '3days':
-                    # 修改：获取今天之前的3个交易日数据
-                    start_date = (datetime.now() - pd.Timedelta(days=7)).strftime('%Y%m%d')
-                    df_daily = self.pro.daily(ts_code=stock_code,
-                                              start_date=start_date,
-                                              end_date=today)
-
-                    if df_daily is not None and not df_daily.empty:
-                        # 修改：排除今天的数据，只看之前3个交易日
-                        df_daily = df_daily[df_daily['trade_date'] < today]
-                        recent_days = df_daily.head(3)  # 取最近3个交易日
-                        has_limit_up = (recent_days['pct_chg'] >= 9.5).any()
-                else:  # 3months
-                    start_date = (datetime.now() - pd.Timedelta(days=90)).strftime('%Y%m%d')
-                    df_daily = self.pro.daily(ts_code=stock_code,
-                                              start_date=start_date,
-                                              end_date=today)
-
-                    if df_daily is not None and not df_daily.empty:
-                        has_limit_up = (df_daily['pct_chg'] >= 9.5).any()
-
-                if df_daily is not None and not df_daily.empty:
-                    with self.lock:
-                        print(f"股票 {stock_code} {period}内{'有' if has_limit_up else '无'}涨停")
-                    return stock_code if has_limit_up else None
+                    except Exception as e:
+                        print(f"获取同概念股票失败: {str(e)}")
 
-            except Exception as e:
-                if "每分钟最多访问该接口800次" in str(e):
-                    retry_delay *= 2  # 指数退避
-                    with self.lock:
-                        print(f"处理{stock_code}遇到限频，等待{retry_delay}秒后重试...")
-                    time.sleep(retry_delay)
-                    continue
+                    print("\n" + "=" * 80)
 
-                with self.lock:
-                    print(f"处理{stock_code}失败: {str(e)}")
-                break
+            # 显示其他涨停股票
+            if not other_stocks.empty:
+                print("\n=== 其他涨停股票 ===")
+                print("=" * 80)
+                for _, stock in other_stocks.iterrows():
+                    print(f"\n{stock['ts_code']} {stock['name']} "
+                          f"涨幅: {stock['pct_chg']:.2f}% "
+                          f"成交额: {float(stock['amount']) / 10000:.2f}万 "
+                          f"{stock['alert_flags']}")
 
-        return None
+                    # 显示该股票所属的所有概念（涨停数<3的概念）
+                    try:
+                        concepts = self.get_stock_concepts(stock['ts_code'])
+                        if concepts is not None and not concepts.empty:
+                            stock_concepts = []
+                            for _, concept in concepts.iterrows():
+                                concept_name = concept['concept_name']
+                                if concept_name in concept_groups:
+                                    count = len(concept_groups[concept_name])
+                                    stock_concepts.append(f"{concept_name}({count}只涨停)")
+                            if stock_concepts:
+                                print(f"所属概念: {', '.join(stock_concepts)}")
+                    except Exception as e:
+                        print(f"获取概念信息失败: {str(e)}")
+
+                    print("-" * 80)
+
+    def get_alert_flags(self, limit_up_stocks):
+        """批量生成涨停提醒的标注（首板 / N连板 / 10:30前成交额>1.5亿 / 分钟放量）"""
+        first_limit_up = self.check_first_limit_up_bulk(limit_up_stocks['ts_code'].tolist())
+        prev_boards = self.get_prev_boards()
+        early_volume = self.check_volume_threshold_bulk(limit_up_stocks)
+        volume_surge = self.minute_bars.volume_surge(limit_up_stocks['ts_code'].tolist())
+
+        def flags(ts_code):
+            parts = []
+            if ts_code in first_limit_up:
+                parts.append('[首板]')
+            elif ts_code in prev_boards:
+                parts.append(f'[{prev_boards[ts_code] + 1}连板]')
+            if ts_code in early_volume:
+                parts.append('[成交额>1.5亿]')
+            if ts_code in volume_surge:
+                parts.append('[分钟放量]')
+            return ''.join(parts)
+
+        return limit_up_stocks['ts_code'].map(flags)
+
+    def get_prev_boards(self):
+        """上一个交易日涨停股票的连板数 {ts_code: 板数}（今天再涨停即 板数+1 连板）"""
+        try:
+            today = self.clock.now().strftime('%Y%m%d')
+            return self.limit_up.boards(self.bar_cache.calendar.prev(today))
+        except Exception as e:
+            print(f"获取连板数失败: {str(e)}")
+            return {}
 
-    def get_filtered_stocks(self):
-        # 获取基础股票信息
-        data = self.pro.stock_basic(exchange='', list_status='L',
-                                    fields='ts_code,symbol,name,area,industry,list_date')
+    def print_hidden_sectors(self, df):
+        """输出盘中同涨同跌的股票组（不依赖概念归属的隐形板块）"""
+        clusters = self.intraday_tracker.clusters()
+        if not clusters:
+            return
+
+        quotes = df.drop_duplicates('ts_code').set_index('ts_code')
+        print("\n=== 盘中联动板块（近期走势高度相关）===")
+        for i, codes in enumerate(clusters, 1):
+            members = quotes.reindex(codes).dropna(subset=['pct_chg']).sort_values('pct_chg', ascending=False)
+            if members.empty:
+                continue
+            print(f"\n【联动组{i}】{len(codes)}只 平均涨幅: {members['pct_chg'].mean():.2f}%")
+            print("-" * 80)
+            for ts_code, stock in members.iterrows():
+                print(f"{ts_code} {stock['name']} 涨幅: {stock['pct_chg']:.2f}%")
+        print("=" * 80)
+
+    def load_market_stocks(self):
+        """全市场监控：加载沪深全部上市股票，冷门股分片轮询"""
+        try:
+            self.stock_list = self.universe.codes[self.universe.mask(exchanges=('SH', 'SZ'))].tolist()
+            # 5000+只股票：冷门股每5轮取一次
+            self.poll_config = {'quiet_every': 5}
+            print(f"\n全市场监控，共 {len(self.stock_list)} 只股票")
+            return True
+        except Exception as e:
+            print(f"加载全市场股票失败: {str(e)}")
+            return False
 
-        # 先进行基本筛选
-        filtered_stocks = data[
-            (~data['ts_code'].str.startswith('300')) &  # 排除创业板
-            (~data['ts_code'].str.startswith('688')) &  # 排除科创板
-            (~data['name'].str.contains('ST')) &  # 排除ST股票
-            (~data['name'].str.contains('银行|中国|保险|证券|铁路|电信|石油|工商|农业|建设|中信|招商')) &  # 排除大型蓝筹股
-            (data['ts_code'].str.endswith(('SH', 'SZ')))  # 只保留沪深主板
-            ]
+    def get_stock_concepts(self, ts_code):
+        """获取股票所属概念（缓存，盘中每只股票只请求一次）"""
+        if ts_code not in self.concept_cache:
+            self.concept_cache[ts_code] = self.pro.concept_detail(ts_code=ts_code)
+        return self.concept_cache[ts_code]
+
+    def get_concept_stocks(self, concept_code):
+        """获取概念成分股（缓存）"""
+        if concept_code not in self.concept_stocks_cache:
+            self.concept_stocks_cache[concept_code] = self.pro.concept_detail(id=concept_code)
+        return self.concept_stocks_cache[concept_code]
+
+    def get_basic_stocks(self):
+        """获取基础股票信息并做基本筛选"""
+        # 只保留沪深主板（排除创业板、科创板、北交所），排除ST股票
+        keep = self.universe.mask(exchanges=('SH', 'SZ'), boards=(BOARD_MAIN,), exclude_st=True)
+        # 排除大型蓝筹股
+        keep &= ~pd.Series(self.universe.names).str.contains(
+            '银行|中国|保险|证券|铁路|电信|石油|工商|农业|建设|中信|招商').to_numpy()
+        filtered_stocks = self.universe.frame(np.flatnonzero(keep))
 
         print(f"\n初步筛选结果:")
         print(f"共筛选出 {len(filtered_stocks)} 只股票")
+        return filtered_stocks
 
-        # 获取当前日期
+    def get_filter_window(self):
+        """筛选窗口：半年涨停按最近90天统计，返回 (窗口起始日, 今天)"""
         today = datetime.now().strftime('%Y%m%d')
+        window_start = (datetime.now() - pd.Timedelta(days=90)).strftime('%Y%m%d')
+        return window_start, today
 
-        try:
-            # 第一步：并发检查3天内涨停，降低并发数
-            print("\n开始并发检查最近3天涨停情况...")
-            limit_up_stocks_3days = set()
-
-            # 每批处理的股票数量
-            batch_size = 50
-            stock_codes = filtered_stocks['ts_code'].tolist()
-            total_batches = len(stock_codes) // batch_size + (1 if len(stock_codes) % batch_size else 0)
-
-            # 使用tqdm创建进度条
-            with tqdm(total=len(stock_codes), desc="处理3天涨停数据") as pbar:
-                for i in range(0, len(stock_codes), batch_size):
-                    batch = stock_codes[i:i + batch_size]
-                    print(f"\n处理第 {i // batch_size + 1}/{total_batches} 批，共 {len(batch)} 只股票")
-
-                    with ThreadPoolExecutor(max_workers=2) as executor:
-                        futures = [executor.submit(self.process_stock_data, code, '3days')
-                                   for code in batch]
-
-                        for future in concurrent.futures.as_completed(futures):
-                            result = future.result()
-                            if result:
-                                limit_up_stocks_3days.add(result)
-                            pbar.update(1)  # 更新进度条
-
-                    time.sleep(2)
-
-            # 过滤掉3天内涨停的股票
-            filtered_stocks = filtered_stocks[~filtered_stocks['ts_code'].isin(limit_up_stocks_3days)]
-            print(f"\n3天内涨停过滤完成: {len(limit_up_stocks_3days)} 只股票被过滤")
-
-            # 第二步：并发检查半年内涨停
-            print("\n开始并发检查半年内涨停情况...")
-            limit_up_stocks_6months = set()
-            remaining_stocks = filtered_stocks['ts_code'].tolist()
-
-            # 为半年数据检查创建新的进度条
-            with tqdm(total=len(remaining_stocks), desc="处理半年涨停数据") as pbar:
-                for i in range(0, len(remaining_stocks), batch_size):
-                    batch = remaining_stocks[i:i + batch_size]
-                    current_batch = i // batch_size + 1
-                    total_batches = len(remaining_stocks) // batch_size + (
-                        1 if len(remaining_stocks) % batch_size else 0)
-                    print(f"\n处理第 {current_batch}/{total_batches} 批，共 {len(batch)} 只股票")
-
-                    with ThreadPoolExecutor(max_workers=2) as executor:
-                        futures = [executor.submit(self.process_stock_data, code, '6months')
-                                   for code in batch]
-
-                        for future in concurrent.futures.as_completed(futures):
-                            result = future.result()
-                            if result:
-                                limit_up_stocks_6months.add(result)
-                            pbar.update(1)  # 更新进度条
-
-                    time.sleep(2)
-
-            # 只保留半年内有涨停的股票
-            filtered_stocks = filtered_stocks[filtered_stocks['ts_code'].isin(limit_up_stocks_6months)]
-            print(f"\n半年涨停筛选完成: 保留 {len(filtered_stocks)} 只股票")
-
-            # 获取实时价格数据
-            try:
-                all_filtered_stocks = []
-                batch_size = 100
-                # 修改：确保使用正确格式的股票代码
-                stock_codes = filtered_stocks['ts_code'].tolist()
-                stock_batches = [stock_codes[i:i + batch_size]
-                                 for i in range(0, len(stock_codes), batch_size)]
+    def build_filter_state(self, trade_dates):
+        """全量重建涨停状态
+        返回: {'as_of': 最新交易日, 'stocks': {ts_code: {'dates': [涨停日期...], 'close': 最新收盘价}}}
+        只记录窗口内有过涨停的股票
+        """
+        print(f"\n全量重建：加载 {len(trade_dates)} 个交易日的日线截面...")
+        pct_chg = self.bar_cache.load_panel(trade_dates, 'pct_chg')
+        if pct_chg.empty:
+            print("未获取到日线截面数据")
+            return None
 
-                print(f"共有 {len(stock_batches)} 批股票需要处理...")
+        last_close = self.bar_cache.load_panel(trade_dates, 'close').ffill().iloc[-1]
 
-                for i, batch in enumerate(stock_batches, 1):
-                    if not batch:  # 检查批次是否为空
-                        continue
+        # 日期×股票 涨停矩阵，展开成 (日期, 股票) 的涨停记录
+        limit_up = (pct_chg >= 9.5).stack()
+        limit_up = limit_up[limit_up]
 
-                    print(f"正在处理第 {i}/{len(stock_batches)} 批...")
-                    try:
-                        # 转换股票代码格式
-                        formatted_codes = [code.split('.')[0] for code in batch]
-                        price_data = ts.get_realtime_quotes(formatted_codes)
-
-                        if price_data is not None and not price_data.empty:
-                            price_data['price'] = price_data['price'].astype(float)
-                            # 筛选价格在3元到20元之间的股票
-                            price_filtered = price_data[(price_data['price'] > 3) & (price_data['price'] <= 20)]
-
-                            # 将代码转回原格式进行匹配
-                            original_codes = [f"{code}.{batch[idx].split('.')[1]}"
-                                              for idx, code in enumerate(price_filtered['code'])]
-                            batch_filtered = filtered_stocks[filtered_stocks['ts_code'].isin(original_codes)]
-
-                            if not batch_filtered.empty:
-                                all_filtered_stocks.append(batch_filtered)
-                    except Exception as e:
-                        print(f"处理批次 {i} 时出错: {str(e)}")
-                        continue
+        stocks = {}
+        for trade_date, ts_code in limit_up.index:
+            info = stocks.setdefault(ts_code, {'dates': [], 'close': None})
+            info['dates'].append(trade_date)
+        for ts_code, info in stocks.items():
+            close = last_close.get(ts_code)
+            info['close'] = None if pd.isna(close) else float(close)
 
-                    time.sleep(0.5)
+        return {'as_of': pct_chg.index[-1], 'stocks': stocks}
 
-                if all_filtered_stocks:
-                    filtered_stocks = pd.concat(all_filtered_stocks, ignore_index=True)
-                else:
-                    filtered_stocks = pd.DataFrame()
+    def update_filter_state(self, state, trade_dates):
+        """增量更新涨停状态：只拉取 as_of 之后新增交易日的截面
+        状态过旧（早于窗口起点）时返回 None，由调用方全量重建
+        """
+        window_start, _ = self.get_filter_window()
+        if state.get('as_of', '') < window_start:
+            print("涨停状态已过期，需要全量重建")
+            return None
 
-            except Exception as e:
-                print(f"获取实时价格数据失败: {str(e)}")
-                filtered_stocks = pd.DataFrame()
+        new_dates = [d for d in trade_dates if d > state['as_of']]
+        stocks = state['stocks']
 
-        except Exception as e:
-            print(f"获取实时价格数据失败: {str(e)}")
-            filtered_stocks = pd.DataFrame()
+        for trade_date in new_dates:
+            df = self.bar_cache.get_daily(trade_date)
+            if df.empty:
+                # 当天数据还没出来，下次再更新
+                break
+
+            closes = df.set_index('ts_code')['close']
+            for ts_code, info in stocks.items():
+                if ts_code in closes.index:
+                    info['close'] = float(closes[ts_code])
+
+            for _, row in df[df['pct_chg'] >= 9.5].iterrows():
+                info = stocks.setdefault(row['ts_code'], {'dates': [], 'close': None})
+                info['dates'].append(trade_date)
+                info['close'] = float(row['close'])
+
+            state['as_of'] = trade_date
+            print(f"增量更新 {trade_date}: 当日涨停 {int((df['pct_chg'] >= 9.5).sum())} 只")
+
+        return state
+
+    def prune_filter_state(self, state):
+        """剔除窗口外的涨停记录"""
+        window_start, _ = self.get_filter_window()
+        stocks = {}
+        for ts_code, info in state['stocks'].items():
+            dates = [d for d in info['dates'] if d >= window_start]
+            if dates:
+                stocks[ts_code] = {'dates': dates, 'close': info['close']}
+        state['stocks'] = stocks
+        return state
+
+    def apply_filter_state(self, state, trade_dates):
+        """根据涨停状态筛选股票"""
+        filtered_stocks = self.get_basic_stocks()
+        _, today = self.get_filter_window()
+        stocks = state['stocks']
+
+        # 涨停状态按编号展开成数组，之后的筛选都是整数数组运算
+        ids = self.universe.ids(filtered_stocks['ts_code'])
+        state_codes = list(stocks.keys())
+        state_ids = self.universe.ids(state_codes)
+        known = state_ids >= 0
+        close = np.full(len(self.universe), np.nan)
+        close[state_ids[known]] = pd.to_numeric(
+            pd.Series([stocks[c]['close'] for c in state_codes]), errors='coerce').to_numpy()[known]
+
+        # 第一步：最近3个交易日（不含今天）有涨停的剔除
+        recent_sessions = set([d for d in trade_dates if d < today][-3:])
+        recent_ids = self.universe.ids([c for c in state_codes
+                                        if any(d in recent_sessions for d in stocks[c]['dates'])])
+        in_3days = np.isin(ids, recent_ids)
+        print(f"\n3天内涨停过滤完成: {int(in_3days.sum())} 只股票被过滤")
+
+        # 第二步：只保留半年内有涨停的股票
+        keep = ~in_3days & np.isin(ids, state_ids)
+        print(f"\n半年涨停筛选完成: 保留 {int(keep.sum())} 只股票")
+
+        # 第三步：价格筛选（3元到20元），使用最近一个交易日的收盘价
+        price = close[ids]
+        keep &= (price > 3) & (price <= 20)
+        filtered_stocks = filtered_stocks[keep]
+        print(f"\n价格筛选完成: 保留 {len(filtered_stocks)} 只股票")
 
         return filtered_stocks
 
-    def save_filtered_stocks(self, filename='filtered_stocks.csv'):
-        """保存筛选后的股票到文件"""
-        filtered_stocks = self.get_filtered_stocks()
+    def get_filtered_stocks(self, state=None):
+        """筛选股票
+        传入上次保存的涨停状态时增量更新，否则（或状态不可用时）全量重建
+        筛选后的状态保存在 self.filter_state
+        """
+        window_start, today = self.get_filter_window()
+
+        try:
+            trade_dates = self.bar_cache.get_trade_dates(window_start, today)
+
+            if state is not None:
+                state = self.update_filter_state(state, trade_dates)
+            if state is None:
+                state = self.build_filter_state(trade_dates)
+            if state is None:
+                return pd.DataFrame()
+
+            self.filter_state = self.prune_filter_state(state)
+            limit_up_counts = [len(info['dates']) for info in self.filter_state['stocks'].values()]
+            print(f"\n涨停状态截至 {self.filter_state['as_of']}: "
+                  f"{len(limit_up_counts)} 只股票窗口内有涨停，共 {sum(limit_up_counts)} 次")
+
+            return self.apply_filter_state(self.filter_state, trade_dates)
+
+        except Exception as e:
+            print(f"筛选股票失败: {str(e)}")
+            return pd.DataFrame()
+
+    def load_filter_state(self, state_file):
+        """加载涨停状态文件"""
+        if not os.path.exists(state_file):
+            return None
+        try:
+            with open(state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"加载涨停状态失败: {str(e)}")
+            return None
+
+    def save_filter_state(self, state_file):
+        """保存涨停状态文件"""
+        with open(state_file, 'w', encoding='utf-8') as f:
+            json.dump(self.filter_state, f, ensure_ascii=False)
+
+    def save_filtered_stocks(self, filename='filtered_stocks.csv', incremental=True):
+        """保存筛选后的股票到文件
+        incremental=True 时基于同目录下的涨停状态文件增量更新，状态缺失或过期则全量重建
+        """
+        state_file = os.path.splitext(filename)[0] + '_state.json'
+        state = self.load_filter_state(state_file) if incremental else None
+        if incremental and state is None:
+            print("未找到可用的涨停状态，执行全量重建")
+
+        filtered_stocks = self.get_filtered_stocks(state)
 
         if not filtered_stocks.empty:
+            # 与上次结果对比
+            if os.path.exists(filename):
+                try:
+                    old_codes = set(pd.read_csv(filename)['ts_code'])
+                    new_codes = set(filtered_stocks['ts_code'])
+                    entered = sorted(new_codes - old_codes)
+                    left = sorted(old_codes - new_codes)
+                    print(f"\n新增 {len(entered)} 只: {', '.join(entered)}")
+                    print(f"移出 {len(left)} 只: {', '.join(left)}")
+                except Exception as e:
+                    print(f"对比上次筛选结果失败: {str(e)}")
+
             # 添加筛选时间
             filtered_stocks['filter_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
             # 保存到CSV文件
             filtered_stocks.to_csv(filename, index=False)
+            self.save_filter_state(state_file)
             print(f"\n筛选结果已保存到 {filename}")
             print(f"共保存 {len(filtered_stocks)} 只股票")
             return True
@@ -512,35 +663,14 @@ class StockMonitor:
     def get_industry_info(self):
         """获取所有股票的行业信息"""
         try:
-            industry_data = self.pro.stock_basic(fields='ts_code,industry')
-            return industry_data.set_index('ts_code')['industry'].to_dict()
+            return self.universe.industry_map()
         except Exception as e:
             print(f"获取行业信息失败: {str(e)}")
             return {}
 
-    def get_realtime_data_parallel(self, max_workers=5):
-        """并行获取所有股票实时数据"""
-        # 将股票列表分成多个子列表
-        chunk_size = 50  # tushare单次请求限制
-        stock_chunks = [self.stock_list[i:i + chunk_size]
-                        for i in range(0, len(self.stock_list), chunk_size)]
-
-        all_data = []
-
-        def fetch_chunk(stocks):
-            try:
-                stock_str = ','.join(stocks)
-                return ts.realtime_quote(ts_code=stock_str)
-            except Exception as e:
-                print(f"获取数据出错: {e}")
-                return None
-
-        # 使用线程池并行获取数据
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = list(executor.map(fetch_chunk, stock_chunks))
-
-        # 合并所有结果
-        return pd.concat([df for df in results if df is not None], ignore_index=True)
+    def get_realtime_data_parallel(self):
+        """并发获取所有股票实时数据（行情客户端内部分批并发）"""
+        return self.quote_client.fetch_sync(self.stock_list)
 
     def get_concept_info(self):
         """获取开盘啦题材概念数据"""
@@ -570,65 +700,61 @@ class StockMonitor:
             print(f"获取题材概念数据失败: {str(e)}")
         return {}
 
+    def check_first_limit_up_bulk(self, ts_codes, sessions=2):
+        """批量检查首板：今天涨停的股票中，前 sessions 个交易日都没有涨停的
+        参数: ts_codes - 今天涨停的股票代码列表
+        返回: 首板股票代码集合
+        """
+        try:
+            today = self.clock.now().strftime('%Y%m%d')
+            recent_limit_up = set()
+            for trade_date in self.bar_cache.calendar.recent(sessions, today, inclusive=False):
+                recent_limit_up |= self.limit_up.codes(trade_date)
+            first_limit_up = set(ts_codes) - recent_limit_up
+            self.first_limit_up_stocks.update(first_limit_up)
+            return first_limit_up
+        except Exception as e:
+            print(f"批量检查首次涨停失败: {str(e)}")
+            return set()
+
     def check_first_limit_up(self, ts_code):
         """检查是否3天内首次涨停"""
+        return ts_code in self.check_first_limit_up_bulk([ts_code])
+
+    def check_volume_threshold_bulk(self, quotes, threshold=150000000):
+        """批量检查10:30前成交额是否超过1.5亿
+        参数: quotes - 实时行情DataFrame（含 ts_code、amount，成交额单位为元）
+        返回: 10:30前成交额达标的股票代码集合（当天达标过的一直保留）
+        """
         try:
-            today = datetime.now().strftime('%Y%m%d')
-            start_date = (datetime.now() - pd.Timedelta(days=3)).strftime('%Y%m%d')
-            df = self.pro.daily(ts_code=ts_code, start_date=start_date, end_date=today)
-
-            if df is not None and not df.empty:
-                # 检查最近3天是否有涨停
-                recent_limit_up = df[df['pct_chg'] >= 9.5]
-                if len(recent_limit_up) == 1 and recent_limit_up.iloc[0]['trade_date'] == today:
-                    return True
-            return False
+            current_time = self.clock.now().time()
+            if current_time <= datetime.strptime('10:30:00', '%H:%M:%S').time():
+                amount = pd.to_numeric(quotes['amount'], errors='coerce')
+                self.early_volume_stocks.update(quotes.loc[amount > threshold, 'ts_code'])
+            return self.early_volume_stocks & set(quotes['ts_code'])
         except Exception as e:
-            print(f"检查首次涨停失败 {ts_code}: {str(e)}")
-            return False
+            print(f"批量检查成交量失败: {str(e)}")
+            return set()
 
     def check_volume_threshold(self, ts_code):
-        """检查10:30前成交量是否超过1.5亿"""
-        try:
-            current_time = datetime.now().time()
-            if current_time > datetime.strptime('10:30:00', '%H:%M:%S').time():
-                return False
-
-            df = self.pro.daily(ts_code=ts_code, start_date=datetime.now().strftime('%Y%m%d'))
-            if df is not None and not df.empty:
-                volume = float(df.iloc[0]['amount'])  # 成交额
-                return volume > 150000000  # 1.5亿
-            return False
-        except Exception as e:
-            print(f"检查成交量失败 {ts_code}: {str(e)}")
-            return False
+        """检查10:30前成交量是否超过1.5亿（需先有该股票的实时行情）"""
+        return ts_code in self.early_volume_stocks
 
-    def find_related_stocks(self, limit_up_stocks, all_stocks_df):
-        """根据涨跌幅相关性找出关联股票"""
+    def find_related_stocks(self, limit_up_stocks, all_stocks_df, threshold=0.8):
+        """根据涨跌幅相关性找出关联股票（收益率矩阵一次加载，矩阵乘法批量计算相关性）"""
         related_groups = {}
 
+        related = self.correlation_engine.related_groups(
+            limit_up_stocks, all_stocks_df['ts_code'], threshold=threshold)
+
         for stock in limit_up_stocks:
             if stock not in self.related_stocks:
                 self.related_stocks[stock] = set()
 
-            # 获取该股票近期的涨跌数据
-            stock_data = self.get_recent_price_changes(stock)
-            if stock_data is None:
+            # 缺少近期数据的股票无法计算相关性
+            if stock not in related:
                 continue
-
-            # 查找涨跌幅相关的股票
-            for _, row in all_stocks_df.iterrows():
-                other_stock = row['ts_code']
-                if other_stock == stock:
-                    continue
-
-                other_data = self.get_recent_price_changes(other_stock)
-                if other_data is None:
-                    continue
-
-                # 计算相关性
-                if self.check_price_correlation(stock_data, other_data):
-                    self.related_stocks[stock].add(other_stock)
+            self.related_stocks[stock].update(related[stock])
 
             # 根据关联股票数量分组
             group_key = len(self.related_stocks[stock])
@@ -638,31 +764,10 @@ class StockMonitor:
 
         return related_groups
 
-    def get_recent_price_changes(self, ts_code, days=5):
-        """获取股票最近几天的涨跌数据"""
-        try:
-            end_date = datetime.now().strftime('%Y%m%d')
-            start_date = (datetime.now() - pd.Timedelta(days=days)).strftime('%Y%m%d')
-            df = self.pro.daily(ts_code=ts_code, start_date=start_date, end_date=end_date)
-            if df is not None and not df.empty:
-                return df['pct_chg'].tolist()
-            return None
-        except Exception as e:
-            print(f"获取{ts_code}历史数据失败: {str(e)}")
-            return None
-
-    def check_price_correlation(self, data1, data2, threshold=0.8):
-        """检查两只股票的涨跌相关性"""
-        try:
-            if len(data1) != len(data2):
-                return False
-            correlation = np.corrcoef(data1, data2)[0, 1]
-            return correlation >= threshold
-        except Exception:
-            return False
-
     def send_feishu_message(self, concept_name, stocks, potential_stocks):
         """发送飞书通知"""
+        if not self.live:
+            return
         try:
             # 构建消息内容
             message = f"🔥 热门板块提醒 🔥\n\n"
@@ -672,7 +777,8 @@ class StockMonitor:
             for stock in stocks:
                 message += (f"- {stock['name']}({stock['ts_code']}) "
                             f"涨幅: {stock['pct_chg']:.2f}% "
-                            f"成交额: {float(stock['amount']) / 10000:.2f}万\n")
+                            f"成交额: {float(stock['amount']) / 10000:.2f}万 "
+                            f"{stock.get('alert_flags', '')}\n")
 
             if not potential_stocks.empty:
                 message += "\n潜力股票:\n"
@@ -702,29 +808,19 @@ class StockMonitor:
         2. 昨天和前天都没有涨停
         即：找出真正的首板股票
         """
-        today = datetime.now()
-        today_str = today.strftime('%Y%m%d')
-        yesterday = (today - timedelta(days=1))
-        yesterday_str = yesterday.strftime('%Y%m%d')
-        day_before = (today - timedelta(days=2))
-        day_before_str = day_before.strftime('%Y%m%d')
+        today_str = datetime.now().strftime('%Y%m%d')
+        # 按交易日历取前两个交易日（跨周末、节假日）
+        yesterday_str = self.bar_cache.calendar.prev(today_str)
+        day_before_str = self.bar_cache.calendar.prev(today_str, 2)
 
         try:
-            # 获取最近3天的数据
-            df = self.pro.daily(start_date=day_before_str,
-                                end_date=today_str)
-
-            # 按日期分组
-            today_df = df[df['trade_date'] == today_str]
-            yesterday_df = df[df['trade_date'] == yesterday_str]
-            day_before_df = df[df['trade_date'] == day_before_str]
-
-            # 1. 找出今天涨停的股票
-            today_limit_up = set(today_df[today_df['pct_chg'] >= 9.5]['ts_code'])
+            # 1. 今天涨停的股票（每天的涨停记录只解析一次）
+            today_records = self.limit_up.daily(today_str)
+            today_limit_up = set(today_records)
 
             # 2. 找出昨天和前天涨停的股票
-            yesterday_limit_up = set(yesterday_df[yesterday_df['pct_chg'] >= 9.5]['ts_code'])
-            day_before_limit_up = set(day_before_df[day_before_df['pct_chg'] >= 9.5]['ts_code'])
+            yesterday_limit_up = self.limit_up.codes(yesterday_str)
+            day_before_limit_up = self.limit_up.codes(day_before_str)
 
             # 3. 筛选真正的首板：今天涨停，昨天和前天都没涨停
             first_limit_up = today_limit_up - yesterday_limit_up - day_before_limit_up
@@ -738,13 +834,13 @@ class StockMonitor:
             # 5. 获取首板股票的详细信息
             first_limit_details = []
             for stock in first_limit_up:
-                stock_data = today_df[today_df['ts_code'] == stock].iloc[0]
+                record = today_records[stock]
                 first_limit_details.append({
                     'ts_code': stock,
                     'name': self.get_stock_name(stock),
-                    'price': stock_data['close'],
-                    'pct_chg': stock_data['pct_chg'],
-                    'amount': stock_data['amount'] / 10000  # 转换为万元
+                    'price': record.close,
+                    'pct_chg': record.pct_chg,
+                    'amount': record.amount / 10000  # 转换为万元
                 })
 
             # 6. 按成交额排序
@@ -767,8 +863,7 @@ class StockMonitor:
     def get_stock_name(self, ts_code):
         """获取股票名称"""
         try:
-            df = self.pro.stock_basic(ts_code=ts_code, fields='name')
-            return df.iloc[0]['name']
+            return self.universe.name(ts_code)
         except:
             return ts_code
 
@@ -795,17 +890,30 @@ if __name__ == "__main__":
     monitor = StockMonitor([])
 
     if len(sys.argv) > 1 and sys.argv[1] == 'filter':
-        # 运行筛选并保存
-        monitor.save_filtered_stocks()
+        # 运行筛选并保存（默认增量更新，--full 强制全量重建）
+        monitor.save_filtered_stocks(incremental='--full' not in sys.argv)
+    elif len(sys.argv) > 2 and sys.argv[1] == 'replay':
+        # 回放录制的行情（python daban.py replay ticks/20250101.npz），--realtime 按实盘速度
+        monitor.replay(sys.argv[2], speed=1 if '--realtime' in sys.argv else None)
     else:
         # 等待开盘
         monitor.wait_for_market_open()
 
-        # 从文件加载并监控
-        if monitor.load_filtered_stocks():
+        # 全市场监控（python daban.py all），否则从文件加载并监控
+        if len(sys.argv) > 1 and sys.argv[1] == 'all':
+            loaded = monitor.load_market_stocks()
+        else:
+            loaded = monitor.load_filtered_stocks()
+
+        if loaded:
+            # --record 录制当天行情，收盘后可回放
+            recorder = TickRecorder() if '--record' in sys.argv else None
             try:
-                monitor.monitor(interval=1)
+                monitor.monitor(interval=1, recorder=recorder)
             except KeyboardInterrupt:
                 print("\n程序已停止")
+            finally:
+                if recorder is not None:
+                    recorder.close()
         else:
-            print("加载股票列表失败，请先运行筛选")
\ No newline at end of file
+            print("加载股票列表失败，请先运行筛选")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+盘中连板梯队实时跟踪
+按固定间隔并发请求 1-5 板（PidType=1..5，每个 PidType 一个请求，复用复盘工具的连接池），
+在内存中保存当前梯队，每轮与上一轮比较：新晋涨停、开板（从涨停列表消失）、板数变化、题材涨停数变化。
+变化输出到控制台、告警队列（queue.Queue，供其他线程消费）、可选的飞书 webhook，
+并可写出实时 JSON/HTML 页面，不再每轮重建复盘 Excel
+
+运行: python stock_review2.py --watch [--interval 30] [--view ladder.html]
+"""
+
+import os
+import json
+import time
+import queue
+import requests
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from html import escape
+
+
+class LadderWatcher:
+    def __init__(self, tool, interval=30, view_file=None, webhook=None, alerts=None):
+        """
+        tool: StockReviewTool（请求、分类、题材颜色）
+        view_file: 实时页面文件，.json 只写数据，其他后缀写 HTML（同时写同名 .json）
+        webhook: 飞书机器人 webhook，有变化时推送
+        alerts: 告警队列，不传则新建（self.alerts）
+        """
+        self.tool = tool
+        self.interval = interval
+        self.view_file = view_file
+        self.webhook = webhook
+        self.alerts = alerts if alerts is not None else queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=5)
+        self.ladder = {}  # 代码 -> LimitUpRecord
+        self.updated_at = None
+
+    def poll(self, day):
+        """并发获取 1-5 板，返回 代码 -> LimitUpRecord"""
+        futures = [self.executor.submit(self.tool.get_stocks_by_pidtype, day, pidtype) for pidtype in range(1, 6)]
+        stocks = []
+        for future in futures:
+            stocks.extend(future.result())
+
+        ladder = {}
+        for board_num, board_stocks in self.tool.classify_stocks_by_board(stocks).items():
+            for stock in board_stocks:
+                ladder[stock.code] = stock
+        return ladder
+
+    def diff(self, previous, current):
+        """比较两轮梯队
+        返回: {'new': [股票], 'broken': [股票], 'moved': [(股票, 原板数)], 'topics': {题材: (原数量, 现数量)}}
+        """
+        new = [current[code] for code in current.keys() - previous.keys()]
+        broken = [previous[code] for code in previous.keys() - current.keys()]
+        moved = [(current[code], previous[code].board_num) for code in current.keys() & previous.keys()
+                 if current[code].board_num != previous[code].board_num]
+
+        before = Counter(stock.topic for stock in previous.values())
+        after = Counter(stock.topic for stock in current.values())
+        topics = {topic: (before[topic], after[topic]) for topic in before.keys() | after.keys()
+                  if before[topic] != after[topic]}
+
+        sort_key = lambda stock: (-stock.board_num, stock.code)
+        return {'new': sorted(new, key=sort_key), 'broken': sorted(broken, key=sort_key),
+                'moved': sorted(moved, key=lambda item: sort_key(item[0])), 'topics': topics}
+
+    def format_update(self, update):
+        """变化转为文本（控制台和 webhook 共用）"""
+        lines = []
+        for stock in update['new']:
+            lines.append(f"+ 涨停 {stock.name}({stock.code}) {stock.board_info} [{stock.topic}]")
+        for stock in update['broken']:
+            lines.append(f"- 开板 {stock.name}({stock.code}) {stock.board_info} [{stock.topic}]")
+        for stock, old_board in update['moved']:
+            lines.append(f"* 板数 {stock.name}({stock.code}) {old_board}板 -> {stock.board_num}板")
+        topics = sorted(update['topics'].items(), key=lambda item: -item[1][1])
+        if topics:
+            lines.append('题材: ' + '  '.join(f'{topic} {old}->{new}' for topic, (old, new) in topics))
+        return lines
+
+    def emit(self, day, update):
+        """输出一轮变化：控制台、告警队列、webhook"""
+        lines = self.format_update(update)
+        if not lines:
+            return
+        now = self.updated_at.strftime('%H:%M:%S')
+        print(f"\n[{now}] 连板梯队变化:")
+        for line in lines:
+            print(f"  {line}")
+
+        self.alerts.put({'time': self.updated_at, 'day': day, **update})
+
+        if self.webhook:
+            data = {
+                "msg_type": "text",
+                "content": {
+                    "text": f"📈 连板梯队变化 {day} {now}\n\n" + '\n'.join(lines)
+                }
+            }
+            try:
+                response = requests.post(self.webhook, json=data, timeout=self.tool.timeout)
+                if response.status_code != 200:
+                    print(f"发送飞书消息失败: {response.text}")
+            except Exception as e:
+                print(f"发送飞书消息异常: {str(e)}")
+
+    def boards(self):
+        """当前梯队按板数分组（高板在前，同一板内按题材聚集）"""
+        boards = {}
+        for stock in sorted(self.ladder.values(), key=lambda s: (-s.board_num, s.topic, s.code)):
+            boards.setdefault(stock.board_num, []).append(stock)
+        return boards
+
+    def write_view(self, day, update):
+        """写出实时页面（先写临时文件再替换，浏览器或其他进程不会读到写了一半的文件）"""
+        base, ext = os.path.splitext(self.view_file)
+        boards = self.boards()
+        data = {
+            'day': day,
+            'time': self.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'boards': {str(board_num): [stock.as_dict() for stock in stocks]
+                       for board_num, stocks in boards.items()},
+            'changes': self.format_update(update) if update else [],
+        }
+        self._replace(base + '.json', json.dumps(data, ensure_ascii=False))
+        if ext.lower() == '.json':
+            return
+
+        columns = []
+        for board_num, stocks in boards.items():
+            cells = ''.join(
+                f'<div class="stock" style="background:#{self.tool.get_topic_color(stock.topic)}">'
+                f'<b>{escape(stock.name)}</b> {stock.code}<br>'
+                f'{escape(stock.topic)} · {escape(stock.board_info)}</div>'
+                for stock in stocks)
+            columns.append(f'<div class="board"><h3>{board_num}板（{len(stocks)}只）</h3>{cells}</div>')
+        changes = '<br>'.join(escape(line) for line in data['changes'])
+        html = (f'<!DOCTYPE html><html><head><meta charset="utf-8">'
+                f'<meta http-equiv="refresh" content="{max(int(self.interval), 5)}">'
+                f'<title>连板梯队 {day}</title><style>'
+                f'body{{font-family:sans-serif}} .ladder{{display:flex;gap:8px;align-items:flex-start}}'
+                f'.board{{min-width:180px}} .stock{{padding:4px;margin:2px 0;font-size:12px}}'
+                f'</style></head><body><h2>{day} 连板梯队（更新于 {data["time"]}，共 {len(self.ladder)} 只）</h2>'
+                f'<p>{changes}</p><div class="ladder">{"".join(columns)}</div></body></html>')
+        self._replace(self.view_file, html)
+
+    @staticmethod
+    def _replace(filename, text):
+        tmp_file = filename + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_file, filename)
+
+    def step(self, day):
+        """轮询一次并输出变化，返回变化（第一轮返回 None）"""
+        current = self.poll(day)
+        self.updated_at = datetime.now()
+        now = self.updated_at.strftime('%H:%M:%S')
+        if not current and self.ladder:
+            # 请求失败时接口返回空列表，不当作全部开板
+            print(f"\n[{now}] 没有获取到涨停数据，保留上一轮梯队")
+            return None
+
+        update = self.diff(self.ladder, current) if self.ladder else None
+        self.ladder = current
+        if update is None:
+            counts = '  '.join(f'{board_num}板: {len(stocks)}只' for board_num, stocks in self.boards().items())
+            print(f"[{now}] 当前连板梯队 共{len(current)}只  {counts}")
+        else:
+            self.emit(day, update)
+        if self.view_file:
+            self.write_view(day, update)
+        return update
+
+    def run(self, day=None, end_time='15:00'):
+        """盘中循环轮询，到 end_time 结束"""
+        day = day or datetime.now().strftime('%Y-%m-%d')
+        if not self.tool.is_trading_day(day):
+            print(f"{day} 不是交易日")
+            return
+
+        print(f"开始跟踪 {day} 连板梯队，每 {self.interval} 秒更新一次（Ctrl+C 结束）")
+        try:
+            while datetime.now().strftime('%H:%M') <= end_time:
+                start = time.perf_counter()
+                self.step(day)
+                time.sleep(max(0.0, self.interval - (time.perf_counter() - start)))
+        except KeyboardInterrupt:
+            print("\n已停止跟踪")
+        finally:
+            self.executor.shutdown(wait=False)
+            self.tool.save_topic_colors()
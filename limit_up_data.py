@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+统一的涨停数据
+两个来源每天各解析一次，生成同一种涨停记录（LimitUpRecord，__slots__ 定长属性）：
+- 开盘啦连板梯队（DailyLimitPerformance）：板数、连板信息、题材，原始数组的下标只在这里出现；
+- Tushare 日线截面（pct_chg >= 9.5）：收盘价、涨幅、成交额。
+按天缓存（梯队收盘后保存到本地，日线截面复用 DailyBarCache 的缓存），
+复盘工具、首板筛选和盘中监控都从这里取，不再各自解析原始数据
+"""
+
+import os
+import re
+import json
+from datetime import datetime
+
+
+LIMIT_UP_PCT = 9.5  # 日线涨幅达到多少算涨停（与盘中监控一致）
+
+
+def to_ts_code(code):
+    """6位代码转 ts_code"""
+    if code.startswith(('6', '9')) and not code.startswith('92'):
+        return f'{code}.SH'
+    if code.startswith(('4', '8', '92')):
+        return f'{code}.BJ'
+    return f'{code}.SZ'
+
+
+def parse_board_number(board_info):
+    """解析连板信息，返回板数"""
+    if not board_info:
+        return 1  # 没有连板信息，默认为一板
+
+    # 匹配 "X连板"、"X天Y板" 或 "Y板" 格式
+    # 优先匹配 "X连板"
+    match = re.search(r'(\d+)连板', board_info)
+    if match:
+        return int(match.group(1))
+
+    # 其次匹配 "X天Y板" 中的 Y
+    match = re.search(r'(\d+)天(\d+)板', board_info)
+    if match:
+        return int(match.group(2))
+
+    # 最后匹配 "Y板"
+    match = re.search(r'(\d+)板', board_info)
+    if match:
+        return int(match.group(1))
+
+    return 1
+
+
+class LimitUpRecord:
+    """一只股票一天的涨停记录"""
+    __slots__ = ('code', 'ts_code', 'name', 'board_num', 'board_info', 'main_topic', 'topics',
+                 'close', 'pct_chg', 'amount')
+
+    def __init__(self, code, name, board_num=None, board_info='', main_topic='', topics='',
+                 close=None, pct_chg=None, amount=None, ts_code=None):
+        self.code = code
+        self.ts_code = ts_code or to_ts_code(code)
+        self.name = name
+        self.board_num = board_num  # 连板数，只有日线数据时为 None
+        self.board_info = board_info
+        self.main_topic = main_topic
+        self.topics = topics
+        self.close = close
+        self.pct_chg = pct_chg
+        self.amount = amount  # 成交额（千元，同 Tushare）
+
+    @property
+    def topic(self):
+        """主题材，没有时归为"其他\""""
+        return self.main_topic if self.main_topic else '其他'
+
+    @classmethod
+    def from_ladder(cls, stock, pidtype):
+        """解析开盘啦梯队的一只股票
+        原始数组：[0]: 代码, [1]: 名称, [5]: 主题材, [12]: 题材列表, [18]: 连板信息
+        PidType=1-4 直接对应板数，PidType=5 是高连板，从连板信息解析具体板数
+        """
+        board_info = stock[18] if len(stock) > 18 else ''
+        board_num = pidtype if pidtype <= 4 else parse_board_number(board_info)
+        # 没有连板信息时按板数构造
+        if not board_info:
+            board_info = '首板' if board_num == 1 else f'{board_num}板'
+        return cls(code=stock[0], name=stock[1], board_num=board_num, board_info=board_info,
+                   main_topic=stock[5] if len(stock) > 5 else '', topics=stock[12] if len(stock) > 12 else '')
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return f'LimitUpRecord({self.ts_code} {self.name} {self.board_info})'
+
+
+class LimitUpDataset:
+    def __init__(self, bar_cache=None, cache_dir='bar_cache'):
+        """
+        bar_cache: DailyBarCache（日线截面来源），为 None 时用到日线数据才创建
+        """
+        self.bar_cache = bar_cache
+        self.cache_dir = os.path.join(cache_dir, 'limit_up')
+        self.cache_root = cache_dir
+        self._ladders = {}  # 日期 -> [LimitUpRecord]（梯队）
+        self._daily = {}  # 日期 -> {ts_code: LimitUpRecord}（日线）
+        self._boards = {}  # 日期 -> {ts_code: 板数}
+
+    @staticmethod
+    def normalize(day):
+        """日期统一为 YYYYMMDD"""
+        return str(day).replace('-', '')
+
+    def _ladder_file(self, day):
+        return os.path.join(self.cache_dir, f'{day}.json')
+
+    def cached_ladder(self, day):
+        """已缓存的一天梯队，没有返回 None"""
+        day = self.normalize(day)
+        if day not in self._ladders:
+            filename = self._ladder_file(day)
+            if not os.path.exists(filename):
+                return None
+            with open(filename, 'r', encoding='utf-8') as f:
+                self._ladders[day] = [LimitUpRecord(**record) for record in json.load(f)]
+        return self._ladders[day]
+
+    def add_ladder(self, day, records):
+        """保存一天的梯队（收盘后的数据写入本地缓存，盘中数据只放在内存）"""
+        day = self.normalize(day)
+        self._ladders[day] = records
+        now = datetime.now()
+        if records and (day < now.strftime('%Y%m%d') or now.strftime('%H:%M') >= '15:30'):
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            tmp_file = self._ladder_file(day) + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump([record.as_dict() for record in records], f, ensure_ascii=False)
+            os.replace(tmp_file, self._ladder_file(day))
+
+    def _bar_cache(self):
+        if self.bar_cache is None:
+            import tushare as ts
+            from bar_cache import DailyBarCache
+            self.bar_cache = DailyBarCache(ts.pro_api(), self.cache_root)
+        return self.bar_cache
+
+    def daily(self, day):
+        """一天的日线涨停记录 {ts_code: LimitUpRecord}（当天数据未出时为空）"""
+        day = self.normalize(day)
+        if day in self._daily:
+            return self._daily[day]
+
+        df = self._bar_cache().get_daily(day)
+        if df.empty:
+            return {}
+
+        df = df[df['pct_chg'] >= LIMIT_UP_PCT]
+        records = {}
+        for ts_code, close, pct_chg, amount in zip(df['ts_code'], df['close'], df['pct_chg'], df['amount']):
+            records[ts_code] = LimitUpRecord(code=ts_code[:6], ts_code=ts_code, name='', close=float(close),
+                                             pct_chg=float(pct_chg), amount=float(amount))
+        self._daily[day] = records
+        return records
+
+    def codes(self, day):
+        """一天日线涨停的股票代码集合"""
+        return set(self.daily(day))
+
+    def day(self, day):
+        """合并两个来源的一天涨停记录 {ts_code: LimitUpRecord}
+        梯队中的股票补上日线的收盘价、涨幅、成交额；只在日线中出现的股票没有板数和题材
+        """
+        daily = self.daily(day)
+        merged = {}
+        for record in self.cached_ladder(day) or []:
+            quote = daily.get(record.ts_code)
+            if quote is not None:
+                record.close, record.pct_chg, record.amount = quote.close, quote.pct_chg, quote.amount
+            merged[record.ts_code] = record
+        for ts_code, record in daily.items():
+            merged.setdefault(ts_code, record)
+        return merged
+
+    def boards(self, day, lookback=10):
+        """一天涨停股票的连板数 {ts_code: 板数}
+        有梯队数据用梯队的板数，否则按日线往前数连续涨停的交易日（最多 lookback 天）
+        """
+        day = self.normalize(day)
+        if day in self._boards:
+            return self._boards[day]
+
+        ladder = self.cached_ladder(day)
+        if ladder is not None:
+            boards = {record.ts_code: record.board_num for record in ladder}
+        else:
+            active = self.codes(day)
+            boards = dict.fromkeys(active, 1)
+            calendar = self._bar_cache().calendar
+            prev_day = day
+            for _ in range(lookback - 1):
+                prev_day = calendar.prev(prev_day)
+                active &= self.codes(prev_day)
+                if not active:
+                    break
+                for ts_code in active:
+                    boards[ts_code] += 1
+
+        # 当天日线数据未出、梯队也没有时不缓存，下次再取
+        if boards:
+            self._boards[day] = boards
+        return boards
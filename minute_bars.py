@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+盘中分钟K线缓冲区
+用监控轮询得到的实时行情快照（累计成交量/成交额）聚合出每只股票的分钟K线，
+每只股票固定保留最近 size 根（数组环形缓冲区），查询分钟成交额不再请求接口
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class MinuteBarBuffer:
+    FIELDS = ('open', 'high', 'low', 'close', 'volume', 'amount')
+
+    def __init__(self, size=240):
+        self.size = size  # 每只股票保留的分钟数（A股全天240分钟）
+        self.code_index = {}  # ts_code -> 行号
+        self.codes = []
+
+        capacity = 1024
+        self.bars = {field: np.zeros((capacity, size), dtype=np.float64) for field in self.FIELDS}
+        self.minutes = np.full((capacity, size), -1, dtype=np.int32)  # 槽位对应的分钟（当天分钟数），-1为空
+        self.last_slot = np.full(capacity, -1, dtype=np.int32)  # 最新一根K线所在槽位
+        self.last_minute = np.full(capacity, -1, dtype=np.int32)
+        self.cum_volume = np.full(capacity, np.nan)  # 上一次快照的累计成交量
+        self.cum_amount = np.full(capacity, np.nan)
+
+    def _grow(self, needed):
+        """扩容（按倍数扩容）"""
+        capacity = len(self.last_slot)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        extra = capacity - len(self.last_slot)
+        for field in self.FIELDS:
+            self.bars[field] = np.vstack([self.bars[field], np.zeros((extra, self.size))])
+        self.minutes = np.vstack([self.minutes, np.full((extra, self.size), -1, dtype=np.int32)])
+        self.last_slot = np.concatenate([self.last_slot, np.full(extra, -1, dtype=np.int32)])
+        self.last_minute = np.concatenate([self.last_minute, np.full(extra, -1, dtype=np.int32)])
+        self.cum_volume = np.concatenate([self.cum_volume, np.full(extra, np.nan)])
+        self.cum_amount = np.concatenate([self.cum_amount, np.full(extra, np.nan)])
+
+    def _rows(self, codes):
+        """股票代码转行号，新股票分配新行"""
+        rows = np.empty(len(codes), dtype=np.int64)
+        for i, code in enumerate(codes):
+            row = self.code_index.get(code)
+            if row is None:
+                row = len(self.codes)
+                self.code_index[code] = row
+                self.codes.append(code)
+            rows[i] = row
+        self._grow(len(self.codes))
+        return rows
+
+    @staticmethod
+    def minute_of(ts):
+        """时间转当天分钟数"""
+        return ts.hour * 60 + ts.minute
+
+    def update(self, codes, prices, volumes, amounts, ts):
+        """写入一次行情快照
+        参数: volumes/amounts 为当天累计成交量/成交额，ts 为快照时间
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        valid = prices > 0
+        rows = self._rows(np.asarray(codes)[valid])
+        prices = prices[valid]
+        volumes = np.asarray(volumes, dtype=np.float64)[valid]
+        amounts = np.asarray(amounts, dtype=np.float64)[valid]
+        minute = self.minute_of(ts)
+
+        # 进入新的一分钟：推进槽位，开一根新K线
+        new_bar = self.last_minute[rows] != minute
+        new_rows = rows[new_bar]
+        slots = (self.last_slot[new_rows] + 1) % self.size
+        self.last_slot[new_rows] = slots
+        self.last_minute[new_rows] = minute
+        self.minutes[new_rows, slots] = minute
+        for field in ('open', 'high', 'low'):
+            self.bars[field][new_rows, slots] = prices[new_bar]
+        self.bars['volume'][new_rows, slots] = 0
+        self.bars['amount'][new_rows, slots] = 0
+
+        # 更新当前K线
+        slots = self.last_slot[rows]
+        self.bars['high'][rows, slots] = np.maximum(self.bars['high'][rows, slots], prices)
+        self.bars['low'][rows, slots] = np.minimum(self.bars['low'][rows, slots], prices)
+        self.bars['close'][rows, slots] = prices
+
+        # 累计量的增量记入当前分钟（第一次快照/回补后没有基准，只记基准）
+        delta_volume = np.nan_to_num(volumes - self.cum_volume[rows], nan=0.0)
+        delta_amount = np.nan_to_num(amounts - self.cum_amount[rows], nan=0.0)
+        self.bars['volume'][rows, slots] += np.maximum(delta_volume, 0)
+        self.bars['amount'][rows, slots] += np.maximum(delta_amount, 0)
+        self.cum_volume[rows] = volumes
+        self.cum_amount[rows] = amounts
+
+    def backfill(self, ts_code, df):
+        """用 pro_bar 分钟数据回补一只股票（启动时或断线重连后）
+        参数: df - pro_bar(freq='1min') 返回的数据（含 trade_time, open, high, low, close, vol, amount）
+        """
+        if df is None or df.empty:
+            return
+
+        row = self._rows([ts_code])[0]
+        df = df.sort_values('trade_time').tail(self.size)
+        trade_time = pd.to_datetime(df['trade_time'])
+        minutes = (trade_time.dt.hour * 60 + trade_time.dt.minute).to_numpy(dtype=np.int32)
+        n = len(df)
+
+        self.minutes[row] = -1
+        self.minutes[row, :n] = minutes
+        for field, column in (('open', 'open'), ('high', 'high'), ('low', 'low'),
+                              ('close', 'close'), ('volume', 'vol'), ('amount', 'amount')):
+            self.bars[field][row] = 0
+            self.bars[field][row, :n] = df[column].to_numpy(dtype=np.float64)
+
+        self.last_slot[row] = n - 1
+        self.last_minute[row] = minutes[-1]
+        # 回补后重新建立累计量基准，避免把断线期间的量记到当前分钟
+        self.cum_volume[row] = np.nan
+        self.cum_amount[row] = np.nan
+
+    def recent(self, ts_code, field, limit=30):
+        """最近 limit 分钟的某个字段（按时间升序），返回 (分钟数组, 数值数组)"""
+        row = self.code_index.get(ts_code)
+        if row is None or self.last_slot[row] < 0:
+            return np.array([], dtype=np.int32), np.array([])
+
+        limit = min(limit, self.size)
+        slots = (self.last_slot[row] - np.arange(limit)[::-1]) % self.size
+        minutes = self.minutes[row, slots]
+        filled = minutes >= 0
+        return minutes[filled], self.bars[field][row, slots][filled]
+
+    def minute_amount_stats(self, ts_code, limit=30):
+        """最近 limit 分钟的成交额统计（单位：万元）"""
+        minutes, amounts = self.recent(ts_code, 'amount', limit)
+        if len(amounts) == 0:
+            return None
+
+        max_idx = int(np.argmax(amounts))
+        max_minute = int(minutes[max_idx])
+        return {
+            'latest_amount': float(amounts[-1]) / 10000,
+            'max_amount': float(amounts[max_idx]) / 10000,
+            'max_amount_time': f"{max_minute // 60:02d}:{max_minute % 60:02d}"
+        }
+
+    def volume_surge(self, ts_codes, ratio=3.0, lookback=30):
+        """批量检查分钟放量：最新一分钟成交额 >= 前 lookback 分钟平均成交额的 ratio 倍
+        返回: 放量的股票代码集合
+        """
+        known = [code for code in ts_codes if code in self.code_index]
+        if not known:
+            return set()
+
+        rows = np.array([self.code_index[code] for code in known])
+        lookback = min(lookback, self.size - 1)
+        offsets = np.arange(lookback + 1)[::-1]  # 最后一列为最新一分钟
+        slots = (self.last_slot[rows][:, None] - offsets[None, :]) % self.size
+        amounts = self.bars['amount'][rows[:, None], slots]
+        filled = self.minutes[rows[:, None], slots] >= 0
+
+        history = np.where(filled[:, :-1], amounts[:, :-1], 0.0)
+        history_count = filled[:, :-1].sum(axis=1)
+        avg = np.divide(history.sum(axis=1), history_count,
+                        out=np.zeros(len(rows)), where=history_count > 0)
+        surge = (history_count > 0) & (avg > 0) & (amounts[:, -1] >= avg * ratio)
+        return set(np.asarray(known)[surge])
@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+量价信号回测（VolPriceAnalyzer）
+用本地日线缓存（bar_cache，按交易日的全市场截面）一次加载多年数据，
+把分析器的 量价形态 / 位置 / 趋势 / 追高 / 市场环境 / 买点 / 止损 / 分批止盈 逻辑
+改写成对全市场所有股票、所有交易日同时计算的数组运算，逐个持有日向前推进模拟交易：
+
+- 信号日：与分析器一样取截止当天最近 61 个交易日的日线、保留最后 60 行来判断，
+  停牌的股票窗口内行数更少，各项指标按实际行数退化（与分析器相同）；
+- 买入：操作代码为 ②（量价齐升）且未被熊市 / 下降趋势 / 非上升趋势追高过滤的股票，
+  以信号日收盘价买入，止损价、三个目标价按 calculate_target_prices 计算；
+- 持有：先看止损（最低价触及止损价，按 min(开盘价, 止损价) 卖出），
+  再依次看目标价（卖出 50% / 30% / 20%，按 max(开盘价, 目标价) 成交），
+  收盘跌破成本 12% 止损、浮盈超过 10% 且跌破 5 日线卖出剩余仓位，持有满 max_hold 天收盘卖出；
+- 统计：逐笔收益、胜率、各目标价和止损的触发比例，按年份 / 市场环境 / 趋势 / 位置分组，
+  以及所有持仓等权的每日收益曲线和最大回撤。
+
+日线为不复权数据（与分析器一致），除权日的价格跳空会计入收益；
+ST 过滤使用当前的股票表。
+
+判断阈值来自 AnalyzerParams。参数扫描（sweep）先算一次与阈值无关的指标（均线、量比、区间位置、
+ATR、阻力位、市场环境），保存为 .npy 后由多个进程以内存映射方式共用，每个进程只按各自的阈值
+重新判断信号并模拟交易，结果按指定指标排名。
+
+运行: python main_v2.py --backtest 20200101 [20241231]
+      python main_v2.py --backtest 20200101 20241231 --sweep vol_up=1.2,1.3,1.5 trend_buffer=0.005,0.01
+"""
+
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from numpy.lib.stride_tricks import sliding_window_view
+from tqdm import tqdm
+
+from params import AnalyzerParams
+
+
+WINDOW = 60  # 分析器取最近 60 行日线（get_stock_data 默认值）
+SESSIONS = WINDOW + 1  # 按交易日历往前取 61 个交易日再保留最后 60 行
+
+PATTERNS = [vol + price for vol in '123' for price in 'ABC']  # 形态编号 = 成交量(0-2) * 3 + 价格(0-2)
+
+# calculate_target_prices 中各形态的阻力位放大系数（20日、60日、120日）
+TARGET_FACTORS = {
+    '2B': (1.03, 1.05, 1.08),
+    '1B': (1.02, 1.03, 1.05), '3B': (1.02, 1.03, 1.05),
+    '1C': (1.01, 1.02, 1.03), '2C': (1.01, 1.02, 1.03), '3C': (1.01, 1.02, 1.03),
+}
+DEFAULT_TARGET_FACTORS = (1.015, 1.025, 1.04)
+
+# 趋势、市场环境、位置的编码
+TREND_UP, TREND_RANGE, TREND_DOWN = 1, 0, -1
+TREND_NAMES = {TREND_UP: '上升趋势', TREND_RANGE: '震荡整理', TREND_DOWN: '下降趋势'}
+MARKET_BULL, MARKET_NEUTRAL, MARKET_BEAR = 1, 0, -1
+MARKET_NAMES = {MARKET_BULL: '牛市', MARKET_NEUTRAL: '震荡市', MARKET_BEAR: '熊市'}
+POSITION_NAMES = np.array(['低位', '中位', '高位'])
+
+EXIT_REASONS = ('止损', '目标价', '跌破5日线', '到期', '数据结束')
+
+
+def save_indicators(indicators, directory):
+    """指标数组逐个保存为 .npy（参数扫描的子进程用内存映射读取，共用同一份数据）"""
+    for name, values in indicators.items():
+        np.save(os.path.join(directory, f'{name}.npy'), np.asarray(values))
+
+
+def load_indicators(directory):
+    """以只读内存映射加载 save_indicators 保存的指标"""
+    return {os.path.splitext(filename)[0]: np.load(os.path.join(directory, filename), mmap_mode='r')
+            for filename in os.listdir(directory) if filename.endswith('.npy')}
+
+
+class RangeMax:
+    """区间最大值（稀疏表）：query(m) 返回每行往前 m 行（含当前行）的最大值，m 可以逐行不同
+    只查部分行时传入 rows（与 m 等长）
+    """
+
+    def __init__(self, values, max_len):
+        self.levels = [values]
+        width = 1
+        while width * 2 <= max_len:
+            prev = self.levels[-1]
+            level = prev.copy()
+            level[width:] = np.fmax(prev[width:], prev[:-width])
+            self.levels.append(level)
+            width *= 2
+
+    def query(self, m, rows=None):
+        m = np.asarray(m, dtype=np.int64)
+        rows = np.arange(len(m)) if rows is None else np.asarray(rows)
+        p = np.floor(np.log2(np.maximum(m, 1))).astype(np.int64)
+        out = np.full(len(m), np.nan)
+        for level in np.unique(p):
+            sel = p == level
+            width = 1 << int(level)
+            i = rows[sel]
+            out[sel] = np.fmax(self.levels[level][i], self.levels[level][i - m[sel] + width])
+        return out
+
+
+def rolling_mean(values, k, n):
+    """每行往前 k 行的均值，窗口内不足 k 行为 NaN
+    直接对每个窗口求和（不用累计和相减），结果与逐只用 pandas 计算的一致到舍入位
+    """
+    padded = np.concatenate([np.full(k - 1, np.nan), values])
+    out = sliding_window_view(padded, k).mean(axis=1)
+    out[n < k] = np.nan
+    return out
+
+
+def window_rows(group, session):
+    """每行在分析窗口内的行数：同一股票最近 61 个交易日内的行数，最多 60 行"""
+    rows = np.arange(len(group))
+    key = group.astype(np.int64) * (int(session.max()) + SESSIONS + 1) + session
+    first = np.searchsorted(key, key - (SESSIONS - 1), side='left')
+    return np.minimum(rows - first + 1, WINDOW)
+
+
+class VolPriceBacktester:
+    def __init__(self, analyzer=None, params=None, max_hold=60, take_profit=(0.5, 0.3, 0.2), fee=0.0015,
+                 allow_overlap=False, index_code='000001.SH', exclude_st=True, buy_patterns=None):
+        """
+        analyzer: VolPriceAnalyzer（Tushare 接口、交易日历、股票表、形态配置），
+                  参数扫描的子进程只用算好的指标，不需要
+        params: 判断阈值（AnalyzerParams），默认使用分析器的
+        max_hold: 最长持有交易日数
+        take_profit: 三个目标价依次卖出的仓位比例
+        fee: 一次买卖的总交易成本（佣金 + 印花税，按比例从收益中扣除）
+        allow_overlap: 同一股票持仓期间再次出现信号是否重复买入
+        buy_patterns: 买入的形态编号，默认为配置中操作代码为 ② 的形态
+        """
+        self.analyzer = analyzer
+        self.params = params or (analyzer.params if analyzer is not None else AnalyzerParams())
+        self.max_hold = max_hold
+        self.take_profit = take_profit
+        self.fee = fee
+        self.allow_overlap = allow_overlap
+        self.index_code = index_code
+        self.exclude_st = exclude_st
+        if analyzer is not None:
+            self.bar_cache = analyzer.bar_cache
+            self.calendar = analyzer.calendar
+
+        if buy_patterns is None:
+            buy_patterns = [PATTERNS.index(p) for p, config in analyzer.VOL_PRICE_CONFIG.items()
+                            if config['action_code'] == '②']
+        self.buy_patterns = list(buy_patterns)
+
+    def settings(self):
+        """子进程重建回测器用的设置（不含分析器）"""
+        return {'max_hold': self.max_hold, 'take_profit': self.take_profit, 'fee': self.fee,
+                'allow_overlap': self.allow_overlap, 'buy_patterns': self.buy_patterns}
+
+    def load_bars(self, start, end, codes=None):
+        """加载 [start 往前 61 个交易日, end] 的沪深日线长表（按股票、日期排序）"""
+        first = self.calendar.prev(start, SESSIONS) or start
+        trade_dates = self.calendar.range(first, end)
+        bars = self.bar_cache.load_rows(trade_dates, ['open', 'high', 'low', 'close', 'vol'])
+
+        # 先在去重后的代码上筛选，再按代码过滤长表
+        kept = pd.Series(bars['ts_code'].unique())
+        kept = kept[kept.str[-2:].isin(['SH', 'SZ'])]
+        if codes:
+            kept = kept[kept.isin(codes)]
+        elif self.exclude_st:
+            universe = self.analyzer.universe
+            universe.load()
+            kept = kept[~kept.isin(universe.codes[universe.is_st])]
+        keep = bars['ts_code'].isin(kept)
+        bars = bars[keep].reset_index(drop=True)
+
+        position = self.calendar.position
+        bars['session'] = bars['trade_date'].map(position).astype(np.int64)
+        return bars
+
+    def load_index(self, start, end):
+        """指数日线（本地缓存，不够新时重新下载）
+        与分析器共用 load_index_daily（index_daily 接口）
+        """
+        first = self.calendar.prev(start, SESSIONS) or start
+        return self.analyzer.load_index_daily(self.index_code, first, end)
+
+    def market_status(self, index):
+        """每个交易日的市场环境 {交易日序号: 编码}（analyze_market_environment）"""
+        if index.empty:
+            return {}
+        close = index['close'].to_numpy(dtype=float)
+        session = index['trade_date'].map(self.calendar.position).to_numpy()
+        valid = ~pd.isna(session)
+        close, session = close[valid], session[valid].astype(np.int64)
+
+        n = window_rows(np.zeros(len(close), dtype=np.int64), session)
+        ma20 = rolling_mean(close, 20, n)
+        ma60 = rolling_mean(close, 60, n)
+        ago = close[np.maximum(np.arange(len(close)) - 20, 0)]
+        change = (close - ago) / ago
+
+        status = np.full(len(close), MARKET_NEUTRAL)
+        full = n >= WINDOW
+        status[full & (close > ma20) & (ma20 > ma60) & (change > 0.05)] = MARKET_BULL
+        status[full & (close < ma20) & (ma20 < ma60) & (change < -0.05)] = MARKET_BEAR
+        return dict(zip(session, status))
+
+    def indicators(self, bars, market, start, end):
+        """计算与判断阈值无关的指标（每只股票每个交易日一行，全部为数值数组）
+        不同参数组共用这些指标，判断时再套用各自的阈值（signals）
+        """
+        group = pd.factorize(bars['ts_code'])[0]
+        session = bars['session'].to_numpy()
+        high = bars['high'].to_numpy(dtype=float)
+        low = bars['low'].to_numpy(dtype=float)
+        close = bars['close'].to_numpy(dtype=float)
+        vol = np.nan_to_num(bars['vol'].to_numpy(dtype=float))
+        rows = np.arange(len(close))
+        n = window_rows(group, session)
+
+        ma20 = rolling_mean(close, 20, n)
+
+        # 成交量：5日均量 / 之前20日均量（analyze_volume_status），不足 25 行或均量为 0 时量比为 1
+        recent_5 = rolling_mean(vol, 5, n)
+        avg_20 = np.full(len(vol), np.nan)
+        avg_20[5:] = rolling_mean(vol, 20, n)[:-5]
+        vol_valid = (n >= 25) & (avg_20 != 0)
+        vol_ratio = np.where(vol_valid, recent_5 / np.where(vol_valid, avg_20, 1.0), 1.0)
+
+        # 价格：5日涨跌幅（analyze_price_status）
+        ago = close[rows - np.minimum(n - 1, 5)]
+
+        # 20日区间（analyze_position / is_chasing_high）和阻力位（calculate_target_prices）
+        high_max = RangeMax(high, WINDOW)
+        m20 = np.minimum(n, 20)
+        resistance_20 = high_max.query(m20)
+        support_20 = -RangeMax(-low, 20).query(m20)
+        price_range = resistance_20 - support_20
+
+        # ATR（_calculate_atr），不足 15 行时按收盘价的 2%
+        prev_close = np.full(len(close), np.nan)
+        prev_close[1:] = close[:-1]
+        prev_close[n < 2] = np.nan
+        tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        atr = np.where(n < 15, close * 0.02, rolling_mean(tr, 14, n))
+
+        trade_sessions = [self.calendar.position[day] for day in self.calendar.range(start, end)]
+        return {
+            'group': group, 'session': session, 'n': n,
+            'open': bars['open'].to_numpy(dtype=float), 'high': high, 'low': low, 'close': close,
+            'ma5': rolling_mean(close, 5, n), 'ma20': ma20, 'ma60': rolling_mean(close, 60, n),
+            'vol_ratio': vol_ratio, 'vol_valid': vol_valid,
+            'change_5d': (close - ago) / ago,
+            'level': (close - support_20) / np.where(price_range == 0, 1.0, price_range),
+            'flat_range': price_range == 0,
+            'resistance_20': resistance_20, 'resistance_60': high_max.query(n), 'atr': atr,
+            'status': pd.Series(session).map(market).fillna(MARKET_NEUTRAL).to_numpy(dtype=np.int64),
+            'eligible': session >= trade_sessions[0],
+            'first': np.int64(trade_sessions[0]), 'days': np.int64(len(trade_sessions)),
+        }
+
+    def classify(self, ind, params=None):
+        """按一组阈值判断每一行的 量价形态编号、趋势、是否追高（analyze 的前几步）"""
+        params = params or self.params
+        n, close, ma20, ma60 = ind['n'], ind['close'], ind['ma20'], ind['ma60']
+
+        vol_ratio, vol_valid = ind['vol_ratio'], ind['vol_valid']
+        vol_code = np.where(vol_valid & (vol_ratio > params.vol_up), 1,
+                            np.where(vol_valid & (vol_ratio < params.vol_down), 2, 0))
+        change_5d = ind['change_5d']
+        price_code = np.where(n < 5, 0, np.where(change_5d > params.price_band, 1,
+                                                 np.where(change_5d < -params.price_band, 2, 0)))
+        chasing = (n >= 20) & (close > ind['resistance_20'] * params.chase_ratio)
+
+        # 趋势：MA20/MA60 缓冲带（analyze_trend）
+        up, down = 1 + params.trend_buffer, 1 - params.trend_buffer
+        trend = np.full(len(close), TREND_RANGE)
+        full = n >= WINDOW
+        trend[full & (close > ma20 * up) & (ma20 > ma60 * up)] = TREND_UP
+        trend[full & (close < ma20 * down) & (ma20 < ma60 * down)] = TREND_DOWN
+        return vol_code * 3 + price_code, trend, chasing
+
+    def positions(self, ind, idx, params=None):
+        """idx 行的位置编码（analyze_position）：0 低位、1 中位、2 高位"""
+        params = params or self.params
+        close, level = ind['close'][idx], ind['level'][idx]
+        position = np.where(level > params.position_high, 2, np.where(level < params.position_low, 0, 1))
+        position[ind['flat_range'][idx]] = 1
+        position[(ind['n'][idx] >= 60) & (close > ind['ma60'][idx] * params.ma60_high)] = 2
+        return position
+
+    def signals(self, ind, params=None):
+        """按一组阈值判断买入信号，返回信号 DataFrame（row 为行情行号，其余为数值编码）"""
+        params = params or self.params
+        n, close, ma20 = ind['n'], ind['close'], ind['ma20']
+        pattern, trend, chasing = self.classify(ind, params)
+
+        # 买点：② 形态，排除熊市、下降趋势、非上升趋势追高（analyze）
+        status = ind['status']
+        buy = (np.isin(pattern, self.buy_patterns) & (status != MARKET_BEAR) & (trend != TREND_DOWN)
+               & ~(chasing & (trend != TREND_UP)) & ind['eligible'])
+        idx = np.flatnonzero(buy)
+        c = close[idx]
+        position = self.positions(ind, idx, params)
+
+        # 止损价、目标价（calculate_target_prices，action_code == 2）
+        fixed_stop = c * 0.88
+        trend_stop = np.where(np.isnan(ma20[idx]), fixed_stop, ma20[idx] * 0.97)
+        atr_stop = c - ind['atr'][idx] * np.select([trend[idx] == TREND_UP, trend[idx] == TREND_DOWN], [2.5, 1.5], 2.0)
+        stop = np.round(np.maximum(np.maximum(fixed_stop, trend_stop), atr_stop), 2)
+
+        factors = np.array([TARGET_FACTORS.get(p, DEFAULT_TARGET_FACTORS) for p in PATTERNS])[pattern[idx]]
+        # 窗口只有 60 行，120 日阻力位即窗口内的最高价
+        resistance_60 = ind['resistance_60'][idx]
+        targets = np.round(np.column_stack([ind['resistance_20'][idx], resistance_60, resistance_60]) * factors, 2)
+
+        return pd.DataFrame({
+            'row': idx,
+            'pattern': pattern[idx],
+            'position': position,
+            'trend': trend[idx],
+            'market': status[idx],
+            'vol_ratio': ind['vol_ratio'][idx],
+            'entry': c,
+            'stop': stop,
+            'target1': targets[:, 0],
+            'target2': targets[:, 1],
+            'target3': targets[:, 2],
+        })
+
+    def simulate(self, ind, signals):
+        """所有信号同时向前推进 max_hold 个交易日
+        返回 (逐笔结果 DataFrame, 每笔每个持有日的净值矩阵)
+        """
+        count = len(signals)
+        group, close = ind['group'], ind['close']
+        entry_row = signals['row'].to_numpy()
+        entry = signals['entry'].to_numpy()
+        stop = signals['stop'].to_numpy()
+        targets = signals[['target1', 'target2', 'target3']].to_numpy()
+        fractions = np.asarray(self.take_profit, dtype=float)
+
+        remaining = np.ones(count)  # 剩余仓位
+        cash = np.zeros(count)  # 已卖出部分的金额（按 1 股计）
+        hit = np.zeros(count, dtype=np.int64)  # 已触发的目标价个数
+        active = np.ones(count, dtype=bool)
+        exit_day = np.full(count, self.max_hold)
+        exit_reason = np.full(count, -1)
+        last_close = entry.copy()
+        values = np.ones((count, self.max_hold + 1), dtype=np.float32)  # 每个持有日收盘的净值（相对买入价）
+
+        for day in range(1, self.max_hold + 1):
+            live = np.flatnonzero(active)
+            if not len(live):
+                values[:, day] = values[:, day - 1]
+                continue
+            row = entry_row[live] + day
+            same = row < len(close)
+            same[same] = group[row[same]] == group[entry_row[live[same]]]
+            row = np.where(same, row, 0)
+            o, h, l, c = ind['open'][row], ind['high'][row], ind['low'][row], close[row]
+            p = entry[live]
+
+            def sell(sel, price, fraction, reason=None):
+                """卖出 live[sel] 的 fraction 仓位（price、fraction 与 live 等长）"""
+                target = live[sel]
+                cash[target] += price[sel] * fraction[sel]
+                remaining[target] -= fraction[sel]
+                if reason is not None:
+                    active[target] = False
+                    exit_day[target] = day
+                    exit_reason[target] = reason
+
+            # 该股票后面没有数据：按最后收盘价卖出
+            ended = ~same | np.isnan(c)
+            sell(ended, last_close[live], remaining[live].copy(), 4)
+            exit_day[live[ended]] = day - 1
+
+            # 止损：盘中跌破止损价
+            stopped = ~ended & (l <= stop[live])
+            sell(stopped, np.fmin(o, stop[live]), remaining[live].copy(), 0)
+
+            # 分批止盈：依次触发目标价
+            going = ~ended & ~stopped
+            for level in range(3):
+                reach = going & (hit[live] == level) & (h >= targets[live, level])
+                sell(reach, np.fmax(o, targets[live, level]), np.minimum(fractions[level], remaining[live]))
+                hit[live[reach]] += 1
+            done = going & (remaining[live] <= 1e-9)
+            active[live[done]] = False
+            exit_day[live[done]] = day
+            exit_reason[live[done]] = 1
+            going &= ~done
+
+            # 收盘跌破成本 12%，或浮盈超过 10% 后跌破 5 日线
+            hard_stop = going & (c < p * 0.88)
+            sell(hard_stop, c, remaining[live].copy(), 0)
+            going &= ~hard_stop
+            protect = going & ((c - p) / p > 0.1) & (c < ind['ma5'][row])
+            sell(protect, c, remaining[live].copy(), 2)
+            going &= ~protect
+
+            # 到期
+            if day == self.max_hold:
+                sell(going, c, remaining[live].copy(), 3)
+
+            last_close[live[going]] = c[going]
+            values[:, day] = values[:, day - 1]
+            values[live, day] = (cash[live] + remaining[live] * np.where(ended, 0, c)) / p
+
+        returns = cash / entry - 1 - self.fee
+        trades = signals.assign(
+            hold_days=exit_day,
+            targets_hit=hit,
+            exit_reason=np.array(EXIT_REASONS)[exit_reason],
+            ret=returns,
+        )
+        return trades, values
+
+    def select(self, ind, trades):
+        """去掉信号日之后没有数据的信号；同一股票持仓期间的新信号不再买入（allow_overlap=False）"""
+        keep = np.array(trades['hold_days'] > 0)
+        if not self.allow_overlap:
+            rows = trades['row'].to_numpy()
+            stocks = ind['group'][rows].tolist()
+            entry_sessions = ind['session'][rows].tolist()
+            exit_sessions = ind['session'][rows + trades['hold_days'].to_numpy()].tolist()
+            holding = {}  # 股票 -> 当前持仓的卖出日
+            for i in range(len(trades)):
+                if not keep[i]:
+                    continue
+                if entry_sessions[i] < holding.get(stocks[i], -1):
+                    keep[i] = False
+                else:
+                    holding[stocks[i]] = exit_sessions[i]
+        return keep
+
+    def equity(self, ind, trades, values):
+        """所有持仓等权的每日收益（没有持仓的交易日收益为 0）
+        返回 DataFrame(ret, positions, equity, drawdown)，按回测区间内的交易日顺序排列
+        """
+        hold = trades['hold_days'].to_numpy()
+        days = np.arange(1, values.shape[1])
+        held = days[None, :] <= hold[:, None]
+
+        # 每笔每个持有日的收益，卖出当天扣除交易成本
+        daily = values[:, 1:].astype(float) / values[:, :-1] - 1
+        daily[np.arange(len(hold)), hold - 1] -= self.fee
+
+        # 持有日按该股票的行情行推进（停牌日不计），按行情日期归到交易日
+        rows = trades['row'].to_numpy()[:, None] + days[None, :]
+        slot = ind['session'][np.where(held, rows, 0)][held] - int(ind['first'])
+        length = int(ind['days'])
+
+        total = np.bincount(slot, weights=daily[held], minlength=length)
+        count = np.bincount(slot, minlength=length)
+        curve = pd.DataFrame({'ret': np.where(count > 0, total / np.maximum(count, 1), 0.0), 'positions': count})
+        curve['equity'] = (1 + curve['ret']).cumprod()
+        curve['drawdown'] = curve['equity'] / curve['equity'].cummax() - 1
+        return curve
+
+    def evaluate(self, ind, params=None):
+        """按一组阈值回测：判断信号、模拟交易、去掉重叠持仓、计算收益曲线
+        返回 (逐笔结果, 收益曲线, 统计)
+        """
+        trades, values = self.simulate(ind, self.signals(ind, params))
+        keep = self.select(ind, trades)
+        trades, values = trades[keep].reset_index(drop=True), values[keep]
+        curve = self.equity(ind, trades, values)
+        return trades, curve, pd.concat([self.trade_stats(trades), self.curve_stats(curve)])
+
+    @staticmethod
+    def trade_stats(trades):
+        """逐笔统计：笔数、胜率、收益、持有天数、各目标价和止损的触发比例"""
+        ret = trades['ret']
+        return pd.Series({
+            '笔数': len(trades),
+            '胜率': (ret > 0).mean(),
+            '平均收益': ret.mean(),
+            '收益中位数': ret.median(),
+            '平均持有天数': trades['hold_days'].mean(),
+            '目标1触发': (trades['targets_hit'] >= 1).mean(),
+            '目标2触发': (trades['targets_hit'] >= 2).mean(),
+            '目标3触发': (trades['targets_hit'] >= 3).mean(),
+            '止损比例': (trades['exit_reason'] == '止损').mean(),
+        })
+
+    @staticmethod
+    def curve_stats(curve):
+        """收益曲线统计：总收益、年化收益、最大回撤、夏普比率（按 252 个交易日年化）"""
+        ret = curve['ret']
+        final = curve['equity'].iloc[-1] if len(curve) else 1.0
+        std = ret.std()
+        return pd.Series({
+            '交易日数': len(curve),
+            '有持仓天数': int((curve['positions'] > 0).sum()),
+            '平均持仓数': curve['positions'].mean(),
+            '总收益': final - 1,
+            '年化收益': final ** (252 / max(len(curve), 1)) - 1,
+            '最大回撤': curve['drawdown'].min(),
+            '夏普比率': ret.mean() / std * np.sqrt(252) if std > 0 else np.nan,
+        })
+
+    def prepare(self, start, end=None, codes=None):
+        """加载区间日线和指数、计算指标，返回 (start, end, 日线长表, 指标)"""
+        start = self.calendar.normalize(start)
+        end = self.calendar.last(end or pd.Timestamp.now().strftime('%Y%m%d'))
+
+        bars = self.load_bars(start, end, codes)
+        print(f"日线: {bars['ts_code'].nunique()} 只股票, {len(bars)} 行")
+        market = self.market_status(self.load_index(start, end))
+        return start, end, bars, self.indicators(bars, market, start, end)
+
+    def run(self, start, end=None, codes=None, params=None):
+        """回测 [start, end] 区间内的买入信号（end 默认最近一个交易日）
+        返回 {'trades': 逐笔结果, 'curve': 每日收益曲线, 'summary': 统计}
+        """
+        start, end, bars, ind = self.prepare(start, end, codes)
+        trades, curve, summary = self.evaluate(ind, params)
+        curve.index = pd.Index(self.calendar.range(start, end), name='trade_date')
+        return {'start': start, 'end': end, 'trades': self.label(bars, trades), 'curve': curve,
+                'summary': summary}
+
+    @staticmethod
+    def label(bars, trades):
+        """逐笔结果换成可读的形式：股票代码、买卖日期、形态 / 位置 / 趋势 / 市场环境名称"""
+        rows = trades['row'].to_numpy()
+        codes = bars['ts_code'].to_numpy()
+        dates = bars['trade_date'].to_numpy()
+        labeled = pd.DataFrame({
+            'ts_code': codes[rows],
+            'trade_date': dates[rows],
+            'exit_date': dates[rows + trades['hold_days'].to_numpy()],
+            'pattern': np.array(PATTERNS)[trades['pattern'].to_numpy()],
+            'position': POSITION_NAMES[trades['position'].to_numpy()],
+            'trend': trades['trend'].map(TREND_NAMES).to_numpy(),
+            'market': trades['market'].map(MARKET_NAMES).to_numpy(),
+        })
+        columns = ['vol_ratio', 'entry', 'stop', 'target1', 'target2', 'target3',
+                   'hold_days', 'targets_hit', 'exit_reason', 'ret']
+        return pd.concat([labeled, trades[columns]], axis=1)
+
+    def sweep(self, grid, start, end=None, codes=None, workers=None, rank='夏普比率'):
+        """参数扫描：在同一份指标上回测多组阈值（多进程并行），按 rank 指标从高到低排名
+        grid: AnalyzerParams 列表（AnalyzerParams.grid 生成）
+        返回 DataFrame（每组参数一行：参数值 + 统计），索引为名次
+        """
+        start, end, bars, ind = self.prepare(start, end, codes)
+        del bars
+        workers = max(1, min(workers or os.cpu_count() or 1, len(grid)))
+        print(f"参数扫描: {len(grid)} 组参数, {workers} 个进程")
+
+        if workers == 1:
+            summaries = [self.evaluate(ind, params)[2] for params in tqdm(grid, desc="参数扫描")]
+        else:
+            # 指标写入临时目录，子进程以内存映射读取，不用每个进程复制一份
+            with tempfile.TemporaryDirectory(dir=self.bar_cache.cache_dir) as directory:
+                save_indicators(ind, directory)
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                         initargs=(directory, self.settings())) as executor:
+                    summaries = list(tqdm(executor.map(_evaluate_params, grid), total=len(grid), desc="参数扫描"))
+
+        table = pd.DataFrame([{**params.as_dict(), **summary} for params, summary in zip(grid, summaries)])
+        table = table.sort_values(rank, ascending=False, kind='stable').reset_index(drop=True)
+        table.index = pd.RangeIndex(1, len(table) + 1, name='排名')
+        return table
+
+    @staticmethod
+    def print_sweep(table, top=10):
+        """打印参数扫描排名（只列出有变化的参数）"""
+        varied = [name for name in AnalyzerParams.DEFAULTS if table[name].nunique() > 1]
+        print("\n" + "=" * 100)
+        print(f"参数扫描结果 Top {min(top, len(table))}（共 {len(table)} 组）")
+        print("=" * 100)
+        for rank, row in table.head(top).iterrows():
+            params = ' '.join(f'{name}={row[name]:g}' for name in varied)
+            print(f"{rank}. {params}")
+            print(f"   {int(row['笔数'])}笔  胜率 {row['胜率'] * 100:.1f}%  平均收益 {row['平均收益'] * 100:.2f}%  "
+                  f"年化 {row['年化收益'] * 100:.2f}%  最大回撤 {row['最大回撤'] * 100:.2f}%  夏普 {row['夏普比率']:.2f}")
+
+    def print_report(self, result):
+        """打印回测报告"""
+        trades, summary = result['trades'], result['summary']
+        percent = {'胜率', '平均收益', '收益中位数', '目标1触发', '目标2触发', '目标3触发', '止损比例',
+                   '总收益', '年化收益', '最大回撤'}
+
+        print("\n" + "=" * 50)
+        print(f"量价信号回测 {result['start']} - {result['end']}")
+        print("=" * 50)
+        for key, value in summary.items():
+            if key in percent:
+                print(f"{key}: {value * 100:.2f}%")
+            elif key in ('笔数', '交易日数', '有持仓天数'):
+                print(f"{key}: {int(value)}")
+            elif isinstance(value, float):
+                print(f"{key}: {value:.2f}")
+            else:
+                print(f"{key}: {value}")
+
+        if trades.empty:
+            print("=" * 50 + "\n")
+            return
+
+        print("\n卖出原因: " + '  '.join(f'{reason} {count}' for reason, count
+                                         in trades['exit_reason'].value_counts().items()))
+
+        groups = [('年份', trades['trade_date'].str[:4]), ('市场环境', trades['market']),
+                  ('趋势', trades['trend']), ('位置', trades['position'])]
+        for title, key in groups:
+            table = trades.groupby(key).apply(self.trade_stats)
+            print(f"\n按{title}:")
+            for name, row in table.iterrows():
+                print(f"  {name}: {int(row['笔数'])}笔  胜率 {row['胜率'] * 100:.1f}%  "
+                      f"平均收益 {row['平均收益'] * 100:.2f}%  止损 {row['止损比例'] * 100:.1f}%  "
+                      f"持有 {row['平均持有天数']:.1f}天")
+        print("=" * 50 + "\n")
+
+
+# 参数扫描子进程：回测器和内存映射的指标（由 _init_worker 在进程启动时加载一次）
+_worker = {}
+
+
+def _init_worker(directory, settings):
+    _worker['backtester'] = VolPriceBacktester(**settings)
+    _worker['indicators'] = load_indicators(directory)
+
+
+def _evaluate_params(params):
+    return _worker['backtester'].evaluate(_worker['indicators'], params)[2]
@@ -18,12 +18,27 @@ import pandas as pd
 import numpy as np
 import argparse
 import os
+import sys
 import yaml
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from typing import Tuple, Dict, Optional, List
 from enum import Enum
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+# 复用项目根目录的行情模块（优先读本机共享行情快照，否则请求行情接口）和股票表
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from quote_snapshot import fetch_quotes, get_quote
+from universe import StockUniverse
+from bar_cache import DailyBarCache
+from params import AnalyzerParams
+from pattern_stats import PatternStats, HORIZONS
+
+
+# 日线字段（与 pro.daily 返回的列一致，历史日期分析从本地日线缓存读取）
+BAR_FIELDS = ['open', 'high', 'low', 'close', 'pre_close', 'change', 'pct_chg', 'vol', 'amount']
+
 
 class TrendType(Enum):
     """趋势类型"""
@@ -55,13 +70,15 @@ class VolPriceAnalyzer:
         '3C': {'name': '缩量下跌', 'action': '空仓/观察', 'action_code': '④', 'desc': '卖盘衰竭，可能接近底部，但需等待止跌信号'},
     }
 
-    def __init__(self, token: str = None, config_path: str = None, proxy_url: str = 'http://lianghua.nanyangqiankun.top'):
+    def __init__(self, token: str = None, config_path: str = None, proxy_url: str = 'http://lianghua.nanyangqiankun.top',
+                 params: AnalyzerParams = None):
         """初始化分析器
 
         Args:
             token: Tushare API token
             config_path: 配置文件路径
             proxy_url: API代理地址
+            params: 判断阈值（可选，默认读取配置文件的 vol_price_params，没有则用默认值）
         """
         # 设置默认配置文件路径（尝试多个位置）
         if config_path is None:
@@ -87,6 +104,8 @@ class VolPriceAnalyzer:
             if not config_path or not os.path.exists(config_path):
                 config_path = possible_paths[0]
 
+        self.params = params or AnalyzerParams(**self._load_params_from_config(config_path))
+
         if token:
             ts.set_token(token)
         else:
@@ -107,10 +126,17 @@ class VolPriceAnalyzer:
         self.pro._DataApi__token = token
         self.pro._DataApi__http_url = proxy_url
 
-        # 缓存股票基本信息
-        self.stock_map = {}
+        # 缓存股票基本信息（与监控共用本地股票表缓存）
+        self.universe = StockUniverse(self.pro, cache_dir=os.path.join(ROOT_DIR, 'bar_cache'))
+        # 本地日线缓存（按交易日的全市场截面，与回测、监控共用），历史日期分析只读这里
+        self.bar_cache = DailyBarCache(self.pro, os.path.join(ROOT_DIR, 'bar_cache'))
+        self.calendar = self.bar_cache.calendar
         self._init_stock_cache()
 
+        # 形态历史统计（每天收盘后用 --build-stats 重建，内存映射加载）
+        self.pattern_stats = PatternStats(os.path.join(ROOT_DIR, 'bar_cache', 'pattern_stats.npy'))
+        self.pattern_stats.load()
+
     def _load_token_from_config(self, config_file):
         """从配置文件加载 token"""
         try:
@@ -122,16 +148,25 @@ class VolPriceAnalyzer:
             print(f"警告: 读取配置文件失败 ({e})")
         return ''
 
+    def _load_params_from_config(self, config_file):
+        """从配置文件加载判断阈值（vol_price_params 一节）"""
+        try:
+            if config_file and os.path.exists(config_file):
+                with open(config_file, 'r', encoding='utf-8') as f:
+                    config = yaml.safe_load(f) or {}
+                    return config.get('vol_price_params') or {}
+        except Exception as e:
+            print(f"警告: 读取配置文件失败 ({e})")
+        return {}
+
     def _init_stock_cache(self):
         """初始化股票基本信息缓存"""
         try:
             print("正在加载股票基本信息...")
-            stock_basic = self.pro.stock_basic(fields='ts_code,name')
-            self.stock_map = dict(zip(stock_basic.ts_code, stock_basic.name))
-            print(f"已加载 {len(self.stock_map)} 只股票信息")
+            self.universe.load()
+            print(f"已加载 {len(self.universe)} 只股票信息")
         except Exception as e:
             print(f"警告: 加载股票信息失败 ({e})")
-            self.stock_map = {}
 
     def get_stock_name(self, ts_code: str) -> str:
         """获取股票名称
@@ -142,35 +177,34 @@ class VolPriceAnalyzer:
         Returns:
             股票名称
         """
-        return self.stock_map.get(ts_code, ts_code)
+        try:
+            return self.universe.name(ts_code)
+        except Exception:
+            return ts_code
 
-    def get_realtime_price(self, ts_code: str) -> Tuple[float, float]:
+    def get_realtime_price(self, ts_code: str, quote: Optional[pd.Series] = None) -> Tuple[float, float]:
         """获取实时价格
 
         Args:
             ts_code: 股票代码（如 300569.SZ）
+            quote: 已获取的实时行情（可选，批量扫描时预先获取，避免逐只请求）
 
         Returns:
             (当前价格, 涨跌幅%)
         """
         try:
-            # 转换代码格式：300569.SZ -> 300569
-            code = ts_code.split('.')[0]
-
-            # 使用旧版 tushare 接口获取实时行情（不需要 token）
-            df = ts.get_realtime_quotes(code)
+            if quote is None:
+                quote = get_quote(ts_code)
 
-            if df is not None and not df.empty:
-                current_price = float(df.iloc[0]['price'])
+            if quote is not None:
+                current_price = float(quote['price'])
 
                 # BUG修复：价格保护，防止返回0或负数
-                if current_price <= 0:
+                if not current_price > 0:
                     print(f"警告: 获取到无效价格 {current_price}，将使用日线数据")
                     return None, None
 
-                open_price = float(df.iloc[0]['open'])
-                pre_close = float(df.iloc[0]['pre_close']) if 'pre_close' in df.columns else open_price
-
+                pre_close = float(quote['pre_close'])
                 if pre_close > 0:
                     change_pct = ((current_price - pre_close) / pre_close) * 100
                 else:
@@ -182,21 +216,30 @@ class VolPriceAnalyzer:
 
         return None, None
 
-    def get_stock_data(self, ts_code: str, days: int = 60) -> pd.DataFrame:
+    def get_stock_data(self, ts_code: str, days: int = 60, as_of: str = None) -> pd.DataFrame:
         """获取股票历史数据
 
         Args:
             ts_code: 股票代码（如 000001.SZ）
             days: 获取最近多少天的数据（默认 60 天）
+            as_of: 历史分析日期（可选，YYYYMMDD），只取该日及之前的日线，数据来自本地日线缓存
 
         Returns:
             包含股票数据的 DataFrame
         """
-        end_date = datetime.now().strftime('%Y%m%d')
-        start_date = (datetime.now() - timedelta(days=days+30)).strftime('%Y%m%d')
-
-        # 获取日线数据
-        df = self.pro.daily(ts_code=ts_code, start_date=start_date, end_date=end_date)
+        end_date = self.calendar.normalize(as_of) if as_of else datetime.now().strftime('%Y%m%d')
+        # 按交易日历确定起始日（收盘前当天没有日线，多取一个交易日）
+        trade_dates = self.calendar.recent(days + 1, end_date)
+        if not trade_dates:
+            raise ValueError(f"日期 {end_date} 早于交易日历的第一个交易日")
+        start_date = trade_dates[0]
+
+        # 获取日线数据（历史日期读本地缓存，结果可复现；缓存按交易日存放，
+        # 单只股票也要逐个读取窗口内的截面，读入时即过滤，批量分析请用 analyze_history）
+        if as_of:
+            df = self.bar_cache.load_rows(trade_dates, BAR_FIELDS, codes=[ts_code], progress=False)
+        else:
+            df = self.pro.daily(ts_code=ts_code, start_date=start_date, end_date=end_date)
 
         if df.empty:
             raise ValueError(f"未获取到股票 {ts_code} 的数据，请检查股票代码")
@@ -228,10 +271,10 @@ class VolPriceAnalyzer:
         # 计算量比（5日均量 / 20日均量）
         vol_ratio = recent_5_vol / avg_vol_20
 
-        # 判断成交量状态（更稳健的阈值）
-        if vol_ratio > 1.3:
+        # 判断成交量状态（更稳健的阈值，默认 1.3 / 0.8）
+        if vol_ratio > self.params.vol_up:
             return '量升', vol_ratio
-        elif vol_ratio < 0.8:
+        elif vol_ratio < self.params.vol_down:
             return '量缩', vol_ratio
         else:
             return '量平', vol_ratio
@@ -255,10 +298,10 @@ class VolPriceAnalyzer:
         # 5日累计涨跌幅
         change_pct_5d = (current_price - price_5_days_ago) / price_5_days_ago
 
-        # 判断价格状态（使用3%阈值，过滤短期噪音）
-        if change_pct_5d > 0.03:
+        # 判断价格状态（默认使用3%阈值，过滤短期噪音）
+        if change_pct_5d > self.params.price_band:
             return '价涨'
-        elif change_pct_5d < -0.03:
+        elif change_pct_5d < -self.params.price_band:
             return '价跌'
         else:
             return '价平'
@@ -307,14 +350,14 @@ class VolPriceAnalyzer:
         # 优化3：添加趋势股高位判断（防止趋势股一直被判中位）
         if len(df) >= 60:
             ma60 = df['close'].rolling(60).mean().iloc[-1]
-            if not pd.isna(ma60) and current_price > ma60 * 1.3:
+            if not pd.isna(ma60) and current_price > ma60 * self.params.ma60_high:
                 # 价格超过MA60的30%，强制判为高位
                 return '高位'
 
-        # 更严格的阈值（80% 和 20%）
-        if position > 0.8:
+        # 更严格的阈值（默认 80% 和 20%）
+        if position > self.params.position_high:
             return '高位'
-        elif position < 0.2:
+        elif position < self.params.position_low:
             return '低位'
         else:
             return '中位'
@@ -335,12 +378,13 @@ class VolPriceAnalyzer:
         ma60 = df['close'].rolling(60).mean().iloc[-1]
         price = df.iloc[-1]['close']
 
-        # v2.3 升级：趋势缓冲带（1%阈值，避免边界反复横跳）
+        # v2.3 升级：趋势缓冲带（默认1%阈值，避免边界反复横跳）
+        up, down = 1 + self.params.trend_buffer, 1 - self.params.trend_buffer
         # 上升趋势：价格 > MA20*1.01 且 MA20 > MA60*1.01
-        if price > ma20 * 1.01 and ma20 > ma60 * 1.01:
+        if price > ma20 * up and ma20 > ma60 * up:
             return TrendType.UPTREND
         # 下降趋势：价格 < MA20*0.99 且 MA20 < MA60*0.99
-        elif price < ma20 * 0.99 and ma20 < ma60 * 0.99:
+        elif price < ma20 * down and ma20 < ma60 * down:
             return TrendType.DOWNTREND
         # 震荡整理
         else:
@@ -362,50 +406,96 @@ class VolPriceAnalyzer:
         resistance_20 = recent_20['high'].max()
         current_price = df.iloc[-1]['close']
 
-        # 如果当前价格 > 20日阻力位的95%，视为追高
-        return current_price > resistance_20 * 0.95
+        # 如果当前价格 > 20日阻力位的95%（默认），视为追高
+        return current_price > resistance_20 * self.params.chase_ratio
+
+    # 缓存缺最新交易日时（例如收盘前当天还没有日线），多久内不再重新下载（秒）
+    INDEX_REFRESH_SECONDS = 1800
 
-    def analyze_market_environment(self, index_code: str = '000001.SH') -> MarketStatus:
+    def load_index_daily(self, index_code: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """指数日线 (trade_date, close)（本地缓存 bar_cache/index，不够新时重新下载）
+
+        Args:
+            index_code: 指数代码
+            start_date: 起始日期
+            end_date: 结束日期
+
+        Returns:
+            按日期排序的 DataFrame，取不到时为空表
+        """
+        index_dir = os.path.join(self.bar_cache.cache_dir, 'index')
+        if not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+        filename = os.path.join(index_dir, f'{index_code}.csv')
+
+        start_date = self.calendar.normalize(start_date)
+        df = None
+        if os.path.exists(filename):
+            df = pd.read_csv(filename, dtype={'trade_date': str})
+            if df.empty or df['trade_date'].min() > start_date:
+                df = None
+            elif df['trade_date'].max() < self.calendar.last(end_date):
+                # 只缺最近的交易日：刚下载过的不再重复请求（盘中当天指数日线还没有）
+                if time.time() - os.path.getmtime(filename) >= self.INDEX_REFRESH_SECONDS:
+                    # 重新下载时保留已缓存的更早区间（回测会用到）
+                    start_date = min(start_date, df['trade_date'].min())
+                    df = None
+        if df is None:
+            df = self.pro.index_daily(ts_code=index_code, start_date=start_date,
+                                      end_date=self.calendar.normalize(end_date))
+            if df is None or df.empty:
+                print(f"警告: 未获取到指数 {index_code} 日线，市场环境按震荡市处理")
+                return pd.DataFrame(columns=['trade_date', 'close'])
+            df = df[['trade_date', 'close']].astype({'trade_date': str})
+            df.to_csv(filename, index=False)
+        return df.sort_values('trade_date').reset_index(drop=True)
+
+    def analyze_market_environment(self, index_code: str = '000001.SH', as_of: str = None) -> MarketStatus:
         """分析市场环境（v2.2新增：上证指数环境判断）
 
         Args:
             index_code: 指数代码，默认上证指数
+            as_of: 历史分析日期（可选），判断该日收盘时的市场环境（默认今天）
 
         Returns:
             MarketStatus 枚举值
         """
         try:
-            # 获取上证指数数据
-            df_index = self.pro.daily(ts_code=index_code,
-                                      start_date=(datetime.now() - timedelta(days=120)).strftime('%Y%m%d'),
-                                      end_date=datetime.now().strftime('%Y%m%d'))
-
-            if df_index is None or len(df_index) < 60:
-                return MarketStatus.NEUTRAL
-
-            df_index = df_index.sort_values('trade_date').tail(60)
-
-            # 计算指数MA
-            ma20 = df_index['close'].rolling(20).mean().iloc[-1]
-            ma60 = df_index['close'].rolling(60).mean().iloc[-1]
-            current_price = df_index.iloc[-1]['close']
-
-            # 计算20日涨跌幅
-            price_20_days_ago = df_index.iloc[-21]['close']
-            change_pct_20d = (current_price - price_20_days_ago) / price_20_days_ago
-
-            # 判断市场状态
-            if current_price > ma20 > ma60 and change_pct_20d > 0.05:
-                return MarketStatus.BULL  # 牛市：多头排列且20日涨幅>5%
-            elif current_price < ma20 < ma60 and change_pct_20d < -0.05:
-                return MarketStatus.BEAR  # 熊市：空头排列且20日跌幅<-5%
-            else:
-                return MarketStatus.NEUTRAL  # 震荡市
+            # 获取上证指数数据（index_daily，本地缓存，与回测、形态历史统计相同）
+            end_date = as_of or datetime.now().strftime('%Y%m%d')
+            trade_dates = self.calendar.recent(61, end_date)
+            df_index = self.load_index_daily(index_code, trade_dates[0], trade_dates[-1])
+            df_index = df_index[df_index['trade_date'].between(trade_dates[0], trade_dates[-1])]
+            return self._market_status(df_index)
 
         except Exception as e:
             print(f"警告: 获取市场环境失败 ({e})")
             return MarketStatus.NEUTRAL
 
+    def _market_status(self, df_index: pd.DataFrame) -> MarketStatus:
+        """由最近 61 个交易日的指数日线判断市场状态（不足 60 天为震荡市）"""
+        if df_index is None or len(df_index) < 60:
+            return MarketStatus.NEUTRAL
+
+        df_index = df_index.sort_values('trade_date').tail(60)
+
+        # 计算指数MA
+        ma20 = df_index['close'].rolling(20).mean().iloc[-1]
+        ma60 = df_index['close'].rolling(60).mean().iloc[-1]
+        current_price = df_index.iloc[-1]['close']
+
+        # 计算20日涨跌幅
+        price_20_days_ago = df_index.iloc[-21]['close']
+        change_pct_20d = (current_price - price_20_days_ago) / price_20_days_ago
+
+        # 判断市场状态
+        if current_price > ma20 > ma60 and change_pct_20d > 0.05:
+            return MarketStatus.BULL  # 牛市：多头排列且20日涨幅>5%
+        elif current_price < ma20 < ma60 and change_pct_20d < -0.05:
+            return MarketStatus.BEAR  # 熊市：空头排列且20日跌幅<-5%
+        else:
+            return MarketStatus.NEUTRAL  # 震荡市
+
     def calculate_target_prices(self, df: pd.DataFrame, position: str,
                                action_code: int, pattern: str = '', trend: TrendType = TrendType.RANGE,
                                current_price: float = None) -> Tuple[float, float, float, float, float, float, float, float]:
@@ -560,7 +650,8 @@ class VolPriceAnalyzer:
 
         return atr
 
-    def analyze(self, ts_code: str, shares: int = 0, cost: float = 0.0, market_status=None) -> Dict:
+    def analyze(self, ts_code: str, shares: int = 0, cost: float = 0.0, market_status=None,
+                quote: Optional[pd.Series] = None, as_of: str = None) -> Dict:
         """分析股票量价关系（v2.2 升级版：市场环境过滤 + 优化追高逻辑）
 
         Args:
@@ -568,15 +659,28 @@ class VolPriceAnalyzer:
             shares: 持有股数
             cost: 成本价
             market_status: 市场状态（可选，用于批量扫描时避免重复计算）
+            quote: 实时行情（可选，批量扫描时预先获取）
+            as_of: 历史分析日期（可选，YYYYMMDD）：按该日收盘分析，只用本地日线缓存，
+                   不取实时行情（非交易日按之前最后一个交易日）
 
         Returns:
             分析结果字典
         """
-        # 获取股票数据
-        df = self.get_stock_data(ts_code)
+        if as_of:
+            day = self.calendar.last(as_of)
+            if day is None:
+                raise ValueError(f"分析日期 {as_of} 早于交易日历的第一个交易日")
+            as_of = day
 
-        # 获取实时价格（如果失败则使用日线数据）
-        realtime_price, realtime_change = self.get_realtime_price(ts_code)
+        # 获取股票数据
+        df = self.get_stock_data(ts_code, as_of=as_of)
+        return self._analyze_data(ts_code, df, shares, cost, market_status, quote, as_of)
+
+    def _analyze_data(self, ts_code: str, df: pd.DataFrame, shares: int = 0, cost: float = 0.0,
+                      market_status=None, quote: Optional[pd.Series] = None, as_of: str = None) -> Dict:
+        """用已取得的日线窗口分析（analyze 和历史批量分析共用）"""
+        # 获取实时价格（如果失败则使用日线数据；历史日期直接用当日收盘价）
+        realtime_price, realtime_change = self.get_realtime_price(ts_code, quote) if not as_of else (None, None)
         if realtime_price is not None:
             current_price = realtime_price
             change_pct = realtime_change
@@ -603,7 +707,7 @@ class VolPriceAnalyzer:
 
         # v2.2 升级：分析市场环境（性能优化：如果已提供则复用，避免重复请求）
         if market_status is None:
-            market_status = self.analyze_market_environment()
+            market_status = self.analyze_market_environment(as_of=as_of)
 
         # 获取配置
         config = self.VOL_PRICE_CONFIG[pattern]
@@ -692,6 +796,10 @@ class VolPriceAnalyzer:
             df, position, action_code, pattern, trend, current_price
         )
 
+        # 同一分组（形态 × 趋势 × 位置 × 市场环境）的历史未来收益分布
+        self.pattern_stats.refresh()
+        history = self.pattern_stats.lookup(pattern, trend.value, position, market_status.value)
+
         # 计算持仓盈亏
         profit_loss = None
         profit_loss_pct = None
@@ -733,6 +841,8 @@ class VolPriceAnalyzer:
             'market_value': market_value,
             'profit_loss': profit_loss,
             'profit_loss_pct': profit_loss_pct,
+            'history': history,  # 形态历史统计（没有统计表时为 None）
+            'as_of': as_of,  # 历史分析日期（实时分析为 None）
         }
 
     def print_report(self, result: Dict):
@@ -746,6 +856,8 @@ class VolPriceAnalyzer:
         print("=" * 50)
         print(f"股票代码: {result['ts_code']}")
         print(f"股票名称: {result['stock_name']}")
+        if result.get('as_of'):
+            print(f"分析日期: {result['as_of']}（按当日收盘）")
         print(f"当前价格: {result['current_price']:.2f}")
 
         change_symbol = '+' if result['change_pct'] >= 0 else ''
@@ -795,6 +907,20 @@ class VolPriceAnalyzer:
         print(f"建议操作: {result['action_code']} {result['action']}")
         print(f"说明: {result['description']}")
 
+        history = result.get('history')
+        if history:
+            print("-" * 50)
+            print(f"历史统计 ({history['start']}-{history['end']}，同形态/趋势/位置/市场环境):")
+            print("-" * 50)
+            for horizon in HORIZONS:
+                stats = history['forward'][f'{horizon}d']
+                if not stats['count']:
+                    print(f"{horizon}日后: 无样本")
+                    continue
+                print(f"{horizon}日后: 样本 {stats['count']}  平均 {stats['mean'] * 100:+.2f}%  "
+                      f"上涨比例 {stats['win'] * 100:.1f}%  中位数 {stats['p50'] * 100:+.2f}%  "
+                      f"(10%~90%分位: {stats['p10'] * 100:+.2f}% ~ {stats['p90'] * 100:+.2f}%)")
+
         print("-" * 50)
         print("价格分析:")
         print("-" * 50)
@@ -859,45 +985,49 @@ class VolPriceAnalyzer:
         print("=" * 50 + "\n")
 
     def scan_market(self, pattern: str = '2B', min_vol_ratio: float = 1.2,
-                   exclude_st: bool = True) -> List[Dict]:
+                   exclude_st: bool = True, as_of: str = None) -> List[Dict]:
         """扫描市场，查找特定量价形态的股票
 
         Args:
             pattern: 目标形态（如 '2B'）
             min_vol_ratio: 最小量比
             exclude_st: 是否排除 ST 股票
+            as_of: 历史扫描日期（可选），按该日收盘用本地日线缓存批量分析（analyze_history）
 
         Returns:
             符合条件的股票列表
         """
         print(f"\n开始扫描市场，寻找 {pattern} 形态股票...")
 
+        # 获取所有股票列表（沪深，按需过滤 ST 股票）
+        keep = self.universe.mask(exchanges=('SH', 'SZ'), exclude_st=exclude_st)
+        codes = self.universe.codes[keep].tolist()
+
+        if as_of:
+            print(f"扫描日期: {as_of}，待扫描股票数量: {len(codes)}")
+            results = [result for result in self.analyze_history([(code, as_of) for code in codes])
+                       if result and result['pattern'] == pattern and result['vol_ratio'] >= min_vol_ratio]
+            results.sort(key=lambda x: x['vol_ratio'], reverse=True)
+            print(f"\n扫描完成！发现 {len(results)} 只符合条件的股票")
+            return results
+
         # BUG修复：在扫描前获取一次市场状态，避免重复请求
         market_status = self.analyze_market_environment()
         print(f"市场环境: {market_status.value}")
-
-        # 获取所有股票列表
-        stock_list = self.pro.stock_basic(
-            exchange='',
-            list_status='L',
-            fields='ts_code,name'
-        )
-
-        # 过滤 ST 股票
-        if exclude_st:
-            stock_list = stock_list[~stock_list['name'].str.contains('ST', na=False)]
-
-        # 只保留沪深主板
-        stock_list = stock_list[stock_list['ts_code'].str.endswith(('SH', 'SZ'))]
-
-        codes = stock_list['ts_code'].tolist()
         print(f"待扫描股票数量: {len(codes)}")
 
+        # 一次性并发获取全部实时行情，分析时不再逐只请求
+        quotes = fetch_quotes(codes)
+        quotes = quotes.set_index('ts_code') if not quotes.empty else pd.DataFrame()
+        print(f"获取实时行情: {len(quotes)} 只")
+
         results = []
 
         # 使用线程池并发分析（传入market_status避免重复计算）
         with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = {executor.submit(self._analyze_single, code, market_status): code for code in codes}
+            futures = {executor.submit(self._analyze_single, code, market_status,
+                                       quotes.loc[code] if code in quotes.index else None): code
+                       for code in codes}
 
             for i, future in enumerate(as_completed(futures), 1):
                 if i % 100 == 0:
@@ -918,37 +1048,45 @@ class VolPriceAnalyzer:
         print(f"\n扫描完成！发现 {len(results)} 只符合条件的股票")
         return results
 
-    def _analyze_single(self, ts_code: str, market_status) -> Optional[Dict]:
+    def _analyze_single(self, ts_code: str, market_status, quote: Optional[pd.Series] = None) -> Optional[Dict]:
         """分析单只股票（用于并发扫描）
 
         Args:
             ts_code: 股票代码
             market_status: 市场状态（复用，避免重复计算）
+            quote: 预先获取的实时行情
 
         Returns:
             分析结果字典
         """
         try:
-            return self.analyze(ts_code, market_status=market_status)
+            return self.analyze(ts_code, market_status=market_status, quote=quote)
         except:
             return None
 
-    def batch_analyze(self, codes: List[str]) -> List[Dict]:
+    def batch_analyze(self, codes: List[str], as_of: str = None) -> List[Dict]:
         """批量分析股票
 
         Args:
             codes: 股票代码列表
+            as_of: 历史分析日期（可选）
 
         Returns:
             分析结果列表
         """
         print(f"\n批量分析 {len(codes)} 只股票...")
 
+        if as_of:
+            analyzed = zip(codes, self.analyze_history([(code, as_of) for code in codes]))
+        else:
+            analyzed = ((code, None) for code in codes)
+
         results = []
 
-        for code in codes:
+        for code, result in analyzed:
             try:
-                result = self.analyze(code)
+                if result is None:
+                    result = self.analyze(code, as_of=as_of)
                 results.append(result)
                 print(f"  ✓ {code} - {result['pattern']}")
             except Exception as e:
@@ -956,6 +1094,63 @@ class VolPriceAnalyzer:
 
         return results
 
+    def analyze_history(self, pairs: List[Tuple[str, str]], index_code: str = '000001.SH',
+                        days: int = 60) -> List[Optional[Dict]]:
+        """批量历史分析：对多个 (股票代码, 日期) 按当日收盘分析，结果与 analyze(code, as_of=date) 相同
+
+        覆盖全部日期的日线从本地缓存一次读入，每只股票一张按日期排序的表，
+        每个 (代码, 日期) 用二分查找在表上切出分析窗口，不再逐个读取；
+        指数日线也只读一次，每个日期的市场环境只算一次
+
+        Args:
+            pairs: [(股票代码, 日期), ...]，日期为 YYYYMMDD（非交易日按之前最后一个交易日）
+            index_code: 市场环境使用的指数
+            days: 分析窗口天数（同 get_stock_data）
+
+        Returns:
+            与 pairs 顺序一致的分析结果列表，没有数据或分析失败的为 None
+        """
+        pairs = [(code, self.calendar.last(day)) for code, day in pairs]
+        dates = sorted({day for _, day in pairs if day})
+        if not dates:
+            return [None] * len(pairs)
+
+        # 每个日期的窗口起点（与 get_stock_data 一致：最近 days + 1 个交易日，最多 days 行）
+        window_start = {day: self.calendar.recent(days + 1, day)[0] for day in dates}
+        first = min(window_start.values())
+        trade_dates = self.calendar.range(first, dates[-1])
+
+        bars = self.bar_cache.load_rows(trade_dates, BAR_FIELDS, codes={code for code, _ in pairs})
+        stocks = {code: (frame['trade_date'].to_numpy(), frame) for code, frame in bars.groupby('ts_code', sort=False)}
+
+        # 每个日期的市场环境
+        markets = {}
+        try:
+            index = self.load_index_daily(index_code, self.calendar.recent(61, dates[0])[0], dates[-1])
+        except Exception as e:
+            print(f"警告: 获取市场环境失败 ({e})")
+            index = pd.DataFrame(columns=['trade_date', 'close'])
+        index_dates = index['trade_date'].to_numpy()
+        for day in dates:
+            lo = np.searchsorted(index_dates, self.calendar.recent(61, day)[0])
+            hi = np.searchsorted(index_dates, day, side='right')
+            markets[day] = self._market_status(index.iloc[lo:hi])
+
+        results = []
+        for code, day in pairs:
+            if day is None or code not in stocks:
+                results.append(None)
+                continue
+            trade_date, frame = stocks[code]
+            hi = np.searchsorted(trade_date, day, side='right')
+            lo = max(np.searchsorted(trade_date, window_start[day]), hi - days)
+            try:
+                results.append(self._analyze_data(code, frame.iloc[lo:hi], market_status=markets[day], as_of=day)
+                               if hi > lo else None)
+            except Exception:
+                results.append(None)
+        return results
+
 
 def format_stock_code(code: str) -> str:
     """格式化股票代码
@@ -990,6 +1185,17 @@ def main():
     parser.add_argument('--config', type=str, default=None, help='配置文件路径（可选）')
     parser.add_argument('--scan', type=str, help='扫描市场，指定目标形态（如 2B）')
     parser.add_argument('--top', type=int, default=10, help='扫描结果显示前 N 名（默认 10）')
+    parser.add_argument('--as-of', type=str, default=None, metavar='DATE',
+                        help='按历史日期收盘分析（使用本地日线缓存，不取实时行情）')
+    parser.add_argument('--backtest', type=str, nargs='+', metavar='DATE',
+                        help='回测买入信号：起始日期 [结束日期]（使用本地日线缓存，可配合 --code 限定股票）')
+    parser.add_argument('--output', type=str, default=None, help='回测逐笔结果 / 参数扫描排名保存路径（CSV，可选）')
+    parser.add_argument('--sweep', type=str, nargs='+', metavar='NAME=V1,V2',
+                        help='配合 --backtest 做参数扫描，如 vol_up=1.2,1.3 trend_buffer=0.005,0.01')
+    parser.add_argument('--workers', type=int, default=None, help='参数扫描的进程数（默认 CPU 核数）')
+    parser.add_argument('--rank', type=str, default='夏普比率', help='参数扫描的排名指标（默认 夏普比率）')
+    parser.add_argument('--build-stats', type=str, nargs='?', const='', default=None, metavar='DATE',
+                        help='用本地日线重建形态历史统计（可指定起始日期，默认最近约5年；建议每天收盘后运行）')
 
     args = parser.parse_args()
 
@@ -1004,9 +1210,45 @@ def main():
         # 创建分析器
         analyzer = VolPriceAnalyzer(token=args.token, config_path=args.config)
 
+        # 重建形态历史统计
+        if args.build_stats is not None:
+            from backtest import VolPriceBacktester
+            from pattern_stats import STATS_SESSIONS
+            today = datetime.now().strftime('%Y%m%d')
+            start = args.build_stats or analyzer.calendar.recent(STATS_SESSIONS, today)[0]
+            analyzer.pattern_stats.build(VolPriceBacktester(analyzer), start)
+            return 0
+
+        # 回测模式
+        if args.backtest:
+            from backtest import VolPriceBacktester
+            codes = [format_stock_code(c.strip()) for c in args.code.split(',')] if args.code else None
+            backtester = VolPriceBacktester(analyzer)
+            start, end = args.backtest[0], args.backtest[1] if len(args.backtest) > 1 else None
+
+            if args.sweep:
+                values = {}
+                for item in args.sweep:
+                    name, _, options = item.partition('=')
+                    values[name.strip()] = [float(v) for v in options.split(',')]
+                grid = AnalyzerParams.grid(analyzer.params, **values)
+                table = backtester.sweep(grid, start, end, codes, workers=args.workers, rank=args.rank)
+                backtester.print_sweep(table, args.top)
+                if args.output:
+                    table.to_csv(args.output, encoding='utf-8-sig')
+                    print(f"参数扫描结果已保存到: {args.output}")
+                return 0
+
+            result = backtester.run(start, end, codes)
+            backtester.print_report(result)
+            if args.output:
+                result['trades'].to_csv(args.output, index=False, encoding='utf-8-sig')
+                print(f"逐笔结果已保存到: {args.output}")
+            return 0
+
         # 市场扫描模式
         if args.scan:
-            results = analyzer.scan_market(pattern=args.scan)
+            results = analyzer.scan_market(pattern=args.scan, as_of=args.as_of)
 
             if results:
                 print("\n" + "=" * 100)
@@ -1029,11 +1271,11 @@ def main():
 
             if len(codes) == 1:
                 # 单股分析
-                result = analyzer.analyze(codes[0], shares=args.shares, cost=args.cost)
+                result = analyzer.analyze(codes[0], shares=args.shares, cost=args.cost, as_of=args.as_of)
                 analyzer.print_report(result)
             else:
                 # 批量分析
-                results = analyzer.batch_analyze(codes)
+                results = analyzer.batch_analyze(codes, as_of=args.as_of)
 
                 print("\n" + "=" * 100)
                 print("批量分析结果")
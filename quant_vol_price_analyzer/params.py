@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+量价分析阈值参数
+原来写死在各判断方法中的阈值集中到一个参数对象，默认值与原逻辑相同；
+分析器、回测和参数扫描共用（配置文件 vol_price_params 一节可覆盖默认值）
+"""
+
+import itertools
+
+
+class AnalyzerParams:
+    """分析器阈值"""
+
+    DEFAULTS = {
+        'vol_up': 1.3,  # 量比高于此值为量升（analyze_volume_status）
+        'vol_down': 0.8,  # 量比低于此值为量缩
+        'price_band': 0.03,  # 5日涨跌幅超过 ±3% 为价涨 / 价跌（analyze_price_status）
+        'position_high': 0.8,  # 20日区间位置高于此值为高位（analyze_position）
+        'position_low': 0.2,  # 低于此值为低位
+        'ma60_high': 1.3,  # 价格超过 MA60 的倍数直接判为高位
+        'trend_buffer': 0.01,  # 趋势缓冲带（analyze_trend）
+        'chase_ratio': 0.95,  # 价格超过20日阻力位的比例视为追高（is_chasing_high）
+    }
+
+    __slots__ = tuple(DEFAULTS)
+
+    def __init__(self, **overrides):
+        unknown = set(overrides) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"未知的分析参数: {', '.join(sorted(unknown))}")
+        for name, default in self.DEFAULTS.items():
+            setattr(self, name, float(overrides.get(name, default)))
+
+    def replace(self, **overrides):
+        """返回修改了部分参数的新对象"""
+        return AnalyzerParams(**{**self.as_dict(), **overrides})
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def grid(cls, base=None, **values):
+        """参数网格：每个参数给一组取值，返回所有组合的参数对象列表
+        例如 AnalyzerParams.grid(vol_up=[1.2, 1.3], trend_buffer=[0.005, 0.01]) 返回 4 组
+        """
+        base = base or cls()
+        names = list(values)
+        return [base.replace(**dict(zip(names, combo))) for combo in itertools.product(*values.values())]
+
+    def __eq__(self, other):
+        return isinstance(other, AnalyzerParams) and self.as_dict() == other.as_dict()
+
+    def __hash__(self):
+        return hash(tuple(self.as_dict().values()))
+
+    def __repr__(self):
+        changed = {k: v for k, v in self.as_dict().items() if v != self.DEFAULTS[k]}
+        return 'AnalyzerParams(' + ', '.join(f'{k}={v:g}' for k, v in changed.items()) + ')'
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+量价形态历史统计
+按 形态(9) × 趋势(3) × 位置(3) × 市场环境(3) 共 243 个分组，统计本地历史日线中
+每个分组出现之后 5 / 20 / 60 个交易日的收益分布（样本数、平均收益、上涨比例、分位数）。
+
+用回测的指标数组一次算出全市场所有交易日的分组编号和未来收益，按 (分组, 收益) 排序后
+直接按位置取分位数；结果是定长结构数组（每个分组一行），保存为 .npy，
+分析器启动时以内存映射方式加载，每次分析按分组编号取一行（O(1)），附在 analyze() 结果中。
+未来收益按该股票之后第 N 个有行情的交易日的收盘价计算（不复权，与分析器一致）
+
+每天收盘后重建: python main_v2.py --build-stats [起始日期]
+"""
+
+import os
+import json
+import numpy as np
+from datetime import datetime
+
+from backtest import PATTERNS, POSITION_NAMES, TREND_NAMES, MARKET_NAMES
+
+
+HORIZONS = (5, 20, 60)  # 未来交易日数
+QUANTILES = (10, 25, 50, 75, 90)  # 分位数（百分位）
+STATS_SESSIONS = 1250  # 默认统计最近约 5 年
+
+FIELDS = ('count', 'mean', 'win') + tuple(f'p{q}' for q in QUANTILES)
+DTYPE = np.dtype([(f'{field}_{horizon}', np.int32 if field == 'count' else np.float32)
+                  for horizon in HORIZONS for field in FIELDS])
+BUCKETS = len(PATTERNS) * 3 * 3 * 3
+
+
+def bucket_ids(pattern, trend, position, market):
+    """分组编号：形态编号(0-8)、趋势(-1/0/1)、位置(0-2)、市场环境(-1/0/1)"""
+    return ((pattern * 3 + (trend + 1)) * 3 + position) * 3 + (market + 1)
+
+
+class PatternStats:
+    def __init__(self, filename):
+        self.filename = filename
+        self.meta_file = os.path.splitext(filename)[0] + '.json'
+        self.table = None  # 结构数组（内存映射），每个分组一行
+        self.meta = {}
+        self.mtime = None
+
+        # 名称 -> 编码（与分析器结果中的文字一致）
+        self.pattern_codes = {pattern: i for i, pattern in enumerate(PATTERNS)}
+        self.trend_codes = {name: code for code, name in TREND_NAMES.items()}
+        self.position_codes = {name: i for i, name in enumerate(POSITION_NAMES)}
+        self.market_codes = {name: code for code, name in MARKET_NAMES.items()}
+
+    def load(self):
+        """内存映射加载统计表，文件不存在返回 False"""
+        if not os.path.exists(self.filename):
+            return False
+        self.mtime = os.path.getmtime(self.filename)
+        self.table = np.load(self.filename, mmap_mode='r')
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+        return True
+
+    def refresh(self):
+        """统计表文件被重建后重新加载（长期运行的服务每次分析前调用，只检查一次文件时间）"""
+        if os.path.exists(self.filename) and os.path.getmtime(self.filename) != self.mtime:
+            self.load()
+
+    @staticmethod
+    def compute(backtester, ind, params=None):
+        """用回测指标一次计算全部分组的未来收益分布，返回结构数组（每个分组一行）"""
+        pattern, trend, _ = backtester.classify(ind, params)
+        rows = np.flatnonzero(ind['eligible'])
+        bucket = bucket_ids(pattern[rows], trend[rows], backtester.positions(ind, rows, params),
+                            ind['status'][rows])
+        group, close = ind['group'], ind['close']
+
+        table = np.zeros(BUCKETS, dtype=DTYPE)
+        for horizon in HORIZONS:
+            # 之后第 horizon 行仍是同一只股票才有未来收益
+            ahead = rows + horizon
+            valid = ahead < len(close)
+            valid[valid] = group[ahead[valid]] == group[rows[valid]]
+            ret = close[ahead[valid]] / close[rows[valid]] - 1
+            ids = bucket[valid]
+            finite = np.isfinite(ret)
+            ret, ids = ret[finite], ids[finite]
+
+            order = np.lexsort((ret, ids))
+            ret, ids = ret[order], ids[order]
+            count = np.bincount(ids, minlength=BUCKETS)
+            first = np.concatenate([[0], np.cumsum(count)[:-1]])
+            has = count > 0
+            size = np.maximum(count, 1)
+
+            table[f'count_{horizon}'] = count
+            table[f'mean_{horizon}'] = np.where(has, np.bincount(ids, weights=ret, minlength=BUCKETS) / size, np.nan)
+            table[f'win_{horizon}'] = np.where(has, np.bincount(ids, weights=(ret > 0).astype(float), minlength=BUCKETS) / size, np.nan)
+            for q in QUANTILES:
+                # 线性插值（同 np.percentile 默认方式），每个分组在排序后数组中的位置
+                pos = first + (count - 1) * q / 100
+                lo = np.clip(np.floor(pos).astype(np.int64), 0, max(len(ret) - 1, 0))
+                hi = np.clip(np.ceil(pos).astype(np.int64), 0, max(len(ret) - 1, 0))
+                if len(ret):
+                    value = ret[lo] + (ret[hi] - ret[lo]) * (pos - np.floor(pos))
+                else:
+                    value = np.full(BUCKETS, np.nan)
+                table[f'p{q}_{horizon}'] = np.where(has, value, np.nan)
+        return table
+
+    def build(self, backtester, start, end=None):
+        """用本地日线重建统计表并保存（先写临时文件再替换）"""
+        start, end, bars, ind = backtester.prepare(start, end)
+        table = self.compute(backtester, ind)
+
+        directory = os.path.dirname(self.filename)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.table = None  # 释放旧文件的内存映射再替换
+        tmp_file = self.filename + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.save(f, table)
+        os.replace(tmp_file, self.filename)
+
+        meta = {'start': start, 'end': end, 'built_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'params': backtester.params.as_dict()}
+        with open(self.meta_file + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(self.meta_file + '.tmp', self.meta_file)
+
+        self.load()
+        print(f"形态历史统计已更新: {start}-{end}, {int(table[f'count_{HORIZONS[0]}'].sum())} 个样本")
+        return table
+
+    def lookup(self, pattern, trend, position, market):
+        """按分析结果中的名称取一个分组的统计（O(1)），没有统计表时返回 None
+        返回 {'start', 'end', 'forward': {'5d': {...}, '20d': {...}, '60d': {...}}}，收益为小数
+        """
+        if self.table is None:
+            return None
+        try:
+            bucket = bucket_ids(self.pattern_codes[pattern], self.trend_codes[trend],
+                                self.position_codes[position], self.market_codes[market])
+        except KeyError:
+            return None
+
+        row = self.table[bucket]
+        forward = {}
+        for horizon in HORIZONS:
+            count = int(row[f'count_{horizon}'])
+            stats = {'count': count}
+            for field in FIELDS[1:]:
+                value = float(row[f'{field}_{horizon}'])
+                stats[field] = round(value, 4) if count else None
+            forward[f'{horizon}d'] = stats
+        return {'start': self.meta.get('start'), 'end': self.meta.get('end'), 'forward': forward}
@@ -54,6 +54,7 @@ def api_analyze():
         code = request.form.get('code', '').strip()
         shares = request.form.get('shares', '0').strip()
         cost = request.form.get('cost', '0').strip()
+        as_of = request.form.get('as_of', '').strip() or None  # 历史分析日期（可选）
 
         # 验证参数
         if not code:
@@ -70,7 +71,7 @@ def api_analyze():
 
         # 执行分析
         analyzer_instance = get_analyzer()
-        result = analyzer_instance.analyze(code, shares=shares, cost=cost)
+        result = analyzer_instance.analyze(code, shares=shares, cost=cost, as_of=as_of)
 
         # 格式化结果用于显示
         response = {
@@ -94,6 +95,8 @@ def api_analyze():
                 'target2': f"{result['target_price2']:.2f}",
                 'target3': f"{result['target_price3']:.2f}",
                 'stop_loss': f"{result['stop_loss_price']:.2f}",
+                'history': result['history'],
+                'as_of': result['as_of'],
             }
         }
 
@@ -122,6 +125,7 @@ def api_analyze_json():
         code = data.get('code', '').strip()
         shares = data.get('shares', 0)
         cost = data.get('cost', 0.0)
+        as_of = data.get('as_of') or None
 
         # 验证参数
         if not code:
@@ -132,7 +136,7 @@ def api_analyze_json():
 
         # 执行分析
         analyzer_instance = get_analyzer()
-        result = analyzer_instance.analyze(code, shares=shares, cost=cost)
+        result = analyzer_instance.analyze(code, shares=shares, cost=cost, as_of=as_of)
 
         return jsonify({'success': True, 'data': result})
 
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+异步实时行情客户端
+直接请求新浪行情接口（hq.sinajs.cn），基于 asyncio + aiohttp：
+连接池复用长连接、按域名限制并发、请求超时与整体截止时间（超时未完成的请求会被取消）。
+同时提供异步接口（await fetch）和同步接口（fetch_sync，在后台事件循环线程中执行），
+监控、扫描和 Web 服务共用一个客户端，几百个并发请求只占用少量连接，不再需要大量线程
+"""
+
+import asyncio
+import re
+import threading
+import concurrent.futures
+from urllib.parse import urlparse
+
+import aiohttp
+import pandas as pd
+
+
+SINA_URL = 'https://hq.sinajs.cn/list='
+SINA_HEADERS = {
+    'Referer': 'https://finance.sina.com.cn/',
+    'User-Agent': 'Mozilla/5.0',
+}
+
+# 新浪行情字段顺序（与 tushare realtime_quote 小写列名一致）
+QUOTE_COLUMNS = ['name', 'open', 'pre_close', 'price', 'high', 'low', 'bid', 'ask', 'volume', 'amount',
+                 'b1_v', 'b1_p', 'b2_v', 'b2_p', 'b3_v', 'b3_p', 'b4_v', 'b4_p', 'b5_v', 'b5_p',
+                 'a1_v', 'a1_p', 'a2_v', 'a2_p', 'a3_v', 'a3_p', 'a4_v', 'a4_p', 'a5_v', 'a5_p',
+                 'date', 'time']
+NUMERIC_COLUMNS = QUOTE_COLUMNS[1:30]
+
+LINE_PATTERN = re.compile(r'hq_str_([a-z]{2})(\d{6})="([^"]*)"')
+
+
+def to_sina_code(ts_code):
+    """000001.SZ -> sz000001"""
+    code, exchange = ts_code.split('.')
+    return exchange.lower() + code
+
+
+def parse_sina_quotes(text):
+    """解析新浪行情返回文本，返回 DataFrame（含 ts_code 列），停牌/无效代码被忽略"""
+    rows = []
+    for exchange, code, body in LINE_PATTERN.findall(text):
+        fields = body.split(',')
+        if len(fields) < len(QUOTE_COLUMNS):
+            continue
+        row = dict(zip(QUOTE_COLUMNS, fields[:len(QUOTE_COLUMNS)]))
+        row['ts_code'] = f"{code}.{exchange.upper()}"
+        rows.append(row)
+
+    if not rows:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(rows)
+    df[NUMERIC_COLUMNS] = df[NUMERIC_COLUMNS].apply(pd.to_numeric, errors='coerce')
+    return df
+
+
+class AsyncQuoteClient:
+    def __init__(self, batch_size=80, limit_per_host=8, timeout=3.0, retries=1):
+        self.batch_size = batch_size  # 每个请求包含的股票数
+        self.limit_per_host = limit_per_host  # 每个域名的最大并发连接数
+        self.timeout = timeout  # 单个请求超时（秒）
+        self.retries = retries  # 失败重试次数
+
+        self._sessions = {}  # 事件循环 -> ClientSession（会话不能跨事件循环使用）
+        self._semaphores = {}  # (事件循环, 域名) -> Semaphore
+        self._loop = None  # 同步接口使用的后台事件循环
+        self._lock = threading.Lock()
+
+    async def _get_session(self):
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host, ttl_dns_cache=300)
+            session = aiohttp.ClientSession(connector=connector, headers=SINA_HEADERS,
+                                            timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._sessions[loop] = session
+        return session
+
+    def _get_semaphore(self, url):
+        key = (asyncio.get_running_loop(), urlparse(url).netloc)
+        if key not in self._semaphores:
+            self._semaphores[key] = asyncio.Semaphore(self.limit_per_host)
+        return self._semaphores[key]
+
+    async def fetch_batch(self, ts_codes):
+        """获取一批股票行情"""
+        url = SINA_URL + ','.join(to_sina_code(code) for code in ts_codes)
+        session = await self._get_session()
+
+        last_error = None
+        for _ in range(self.retries + 1):
+            try:
+                async with self._get_semaphore(url):
+                    async with session.get(url) as response:
+                        raw = await response.read()
+                return parse_sina_quotes(raw.decode('gbk', errors='ignore'))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                last_error = e
+
+        print(f"获取行情失败({len(ts_codes)}只): {last_error}")
+        return pd.DataFrame()
+
+    async def fetch(self, ts_codes, deadline=None):
+        """异步获取多只股票行情（分批并发）
+        deadline: 整体截止时间（秒），到时仍未完成的批次会被取消，只返回已完成的部分
+        """
+        ts_codes = list(ts_codes)
+        if not ts_codes:
+            return pd.DataFrame()
+
+        batches = [ts_codes[i:i + self.batch_size] for i in range(0, len(ts_codes), self.batch_size)]
+        tasks = [asyncio.ensure_future(self.fetch_batch(batch)) for batch in batches]
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+
+        frames = []
+        for task in done:
+            if task.exception() is None and not task.result().empty:
+                frames.append(task.result())
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def _ensure_loop(self):
+        """启动同步接口使用的后台事件循环线程"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=self._loop.run_forever, name='quote-client', daemon=True)
+                thread.start()
+        return self._loop
+
+    def fetch_sync(self, ts_codes, deadline=None):
+        """同步获取多只股票行情（线程安全，可在多个线程中同时调用）"""
+        future = asyncio.run_coroutine_threadsafe(self.fetch(ts_codes, deadline), self._ensure_loop())
+        try:
+            return future.result(None if deadline is None else deadline + self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return pd.DataFrame()
+
+    def get_quote(self, ts_code):
+        """同步获取单只股票行情，返回一行 Series，失败返回 None"""
+        df = self.fetch_sync([ts_code])
+        if df.empty:
+            return None
+        return df.iloc[0]
+
+    async def aclose(self):
+        """关闭当前事件循环中的连接（异步接口使用完毕后调用）"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+    def close(self):
+        """关闭后台事件循环中的连接"""
+        if self._loop is None:
+            return
+        session = self._sessions.pop(self._loop, None)
+        if session is not None and not session.closed:
+            asyncio.run_coroutine_threadsafe(session.close(), self._loop).result(self.timeout)
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def default_client():
+    """进程内共享的行情客户端"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = AsyncQuoteClient()
+    return _default_client
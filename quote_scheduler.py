@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+分层行情轮询
+全市场分片获取实时行情：热门股（涨幅超过阈值、接近涨停）每轮都取，
+冷门股分成 quiet_every 片，每轮只取其中一片，保证单轮耗时在预算内；
+冷门股未轮到时沿用上一次的报价。同时记录每轮的耗时，定期输出延迟报告
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from collections import deque
+
+
+class TieredQuoteScheduler:
+    def __init__(self, fetch, codes, quiet_every=1, hot_pct=6.0, budget=1.0, report_every=60):
+        self.fetch = fetch  # 获取行情的函数: fetch(codes) -> DataFrame（内部分批并发）
+        self.codes = list(codes)
+        self.quiet_every = max(1, quiet_every)  # 冷门股每隔几轮取一次
+        self.hot_pct = hot_pct  # 涨幅超过该值视为热门股
+        self.budget = budget  # 单轮耗时预算（秒）
+        self.report_every = report_every
+
+        # 冷门股固定分片，避免热门股集合变化时分片错位
+        self.shards = [self.codes[i::self.quiet_every] for i in range(self.quiet_every)]
+        self.hot = set()
+        self.latest = pd.DataFrame()  # 每只股票最近一次报价
+        self.tick = 0
+
+        self.timings = deque(maxlen=1000)  # 每轮耗时记录
+        self._pending = None
+
+    def select(self):
+        """本轮需要获取的股票：全部热门股 + 一片冷门股"""
+        shard = self.shards[self.tick % self.quiet_every]
+        hot = [code for code in self.codes if code in self.hot]
+        return hot + [code for code in shard if code not in self.hot]
+
+    def poll(self):
+        """获取本轮行情，返回合并后的全量快照（副本）"""
+        start = time.perf_counter()
+        codes = self.select()
+        try:
+            fresh = self.fetch(codes)
+        except Exception as e:
+            print(f"获取行情失败: {str(e)}")
+            fresh = None
+        fetch_time = time.perf_counter() - start
+
+        received = 0
+        if fresh is not None and not fresh.empty:
+            received = len(fresh)
+            self.latest = pd.concat([fresh, self.latest], ignore_index=True).drop_duplicates('ts_code')
+            self.update_hot()
+
+        self.tick += 1
+        self._pending = {'codes': len(codes), 'missing': len(codes) - received, 'fetch': fetch_time}
+        return self.latest.copy()
+
+    def update_hot(self):
+        """根据最新报价更新热门股集合"""
+        price = pd.to_numeric(self.latest['price'], errors='coerce')
+        pre_close = pd.to_numeric(self.latest['pre_close'], errors='coerce')
+        pct_chg = (price - pre_close) / pre_close * 100
+        self.hot = set(self.latest.loc[pct_chg >= self.hot_pct, 'ts_code'])
+
+    def record_tick(self, total_time):
+        """记录一轮的总耗时（获取 + 处理），每 report_every 轮输出一次报告"""
+        if self._pending is None:
+            return
+        timing = self._pending
+        timing['total'] = total_time
+        timing['process'] = total_time - timing['fetch']
+        self.timings.append(timing)
+        self._pending = None
+
+        if self.tick % self.report_every == 0:
+            self.print_latency_report()
+
+    def print_latency_report(self):
+        """输出延迟报告"""
+        if not self.timings:
+            return
+
+        recent = list(self.timings)[-self.report_every:]
+        print(f"\n=== 行情轮询延迟报告（最近 {len(recent)} 轮，预算 {self.budget:.1f} 秒）===")
+        for key, label in (('fetch', '获取'), ('process', '处理'), ('total', '合计')):
+            values = np.array([t[key] for t in recent])
+            print(f"{label}: p50 {np.percentile(values, 50) * 1000:.0f}ms  "
+                  f"p95 {np.percentile(values, 95) * 1000:.0f}ms  "
+                  f"max {values.max() * 1000:.0f}ms")
+
+        over_budget = sum(1 for t in recent if t['total'] > self.budget)
+        avg_codes = np.mean([t['codes'] for t in recent])
+        missing = sum(t['missing'] for t in recent)
+        print(f"每轮平均 {avg_codes:.0f} 只（热门 {len(self.hot)} 只，共 {len(self.codes)} 只，"
+              f"冷门股每 {self.quiet_every} 轮一次），超预算 {over_budget} 轮，未取到报价 {missing} 次")
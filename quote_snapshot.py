@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+本机共享行情快照
+一个守护进程轮询全市场行情，把最新快照写入共享内存文件（/dev/shm 下的 mmap），
+监控、扫描和 Web 服务直接读取，不再各自请求行情接口。
+文件布局：64字节头（魔数、序号、股票数、更新时间、代码表编号）+ 每个字段一个定长 float64 数组，
+数组下标对应代码表（codes.json）中的顺序。写入前后序号各加一（写入中为奇数），
+读取时前后序号一致且为偶数才算读到完整快照
+
+运行守护进程: python quote_snapshot.py
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+import numpy as np
+import pandas as pd
+
+from quote_client import default_client
+from quote_scheduler import TieredQuoteScheduler
+
+
+SNAPSHOT_FIELDS = ('price', 'pre_close', 'open', 'high', 'low', 'volume', 'amount')
+
+if os.path.isdir('/dev/shm'):
+    DEFAULT_PATH = '/dev/shm/stock_quotes'
+else:
+    DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quote_shm')
+
+MAGIC = b'QSNAP001'
+HEADER = struct.Struct('<8sQQdQ')  # 魔数, 序号, 股票数, 更新时间, 代码表编号
+HEADER_SIZE = 64
+SEQ_OFFSET = 8
+TIME_OFFSET = 24
+
+
+def _views(buffer, n):
+    """在共享内存上建立各字段数组（不复制）"""
+    seq = np.ndarray(1, dtype=np.uint64, buffer=buffer, offset=SEQ_OFFSET)
+    update_time = np.ndarray(1, dtype=np.float64, buffer=buffer, offset=TIME_OFFSET)
+    fields = {}
+    for i, field in enumerate(SNAPSHOT_FIELDS):
+        fields[field] = np.ndarray(n, dtype=np.float64, buffer=buffer, offset=HEADER_SIZE + i * n * 8)
+    return seq, update_time, fields
+
+
+class QuoteSnapshotWriter:
+    def __init__(self, stocks, path=DEFAULT_PATH):
+        """stocks: 含 ts_code、name 的 DataFrame，决定代码表顺序"""
+        self.path = path
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        self.codes = pd.Index(stocks['ts_code'])
+        n = len(self.codes)
+        table_id = time.time_ns()
+
+        # 新建文件后整体替换，已打开旧文件的读取方不受影响（按 inode 判断需要重新映射）；
+        # 先替换数据文件，再替换代码表，读取方按代码表编号判断两者是否匹配
+        size = HEADER_SIZE + len(SNAPSHOT_FIELDS) * n * 8
+        data_file = os.path.join(path, 'snapshot.bin')
+        self.buffer = np.memmap(data_file + '.tmp', dtype=np.uint8, mode='w+', shape=size)
+        self.buffer[:HEADER.size] = np.frombuffer(HEADER.pack(MAGIC, 0, n, 0.0, table_id), dtype=np.uint8)
+        self.seq, self.update_time, self.fields = _views(self.buffer, n)
+        for values in self.fields.values():
+            values[:] = np.nan
+        os.replace(data_file + '.tmp', data_file)
+
+        tmp_file = os.path.join(path, 'codes.json.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'table_id': table_id, 'codes': stocks['ts_code'].tolist(),
+                       'names': stocks['name'].tolist()}, f, ensure_ascii=False)
+        os.replace(tmp_file, os.path.join(path, 'codes.json'))
+
+    def write(self, df):
+        """写入一批行情（只更新行情中出现的股票）"""
+        idx = self.codes.get_indexer(df['ts_code'])
+        valid = idx >= 0
+        idx = idx[valid]
+
+        self.seq[0] += 1  # 奇数：写入中
+        for field in SNAPSHOT_FIELDS:
+            self.fields[field][idx] = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=np.float64)[valid]
+        self.update_time[0] = time.time()
+        self.seq[0] += 1
+
+
+class QuoteSnapshotReader:
+    def __init__(self, path=DEFAULT_PATH, max_age=10.0):
+        self.path = path
+        self.max_age = max_age  # 快照超过多少秒未更新视为守护进程已停止
+        self.inode = None
+        self.codes = pd.Index([])
+        self.names = np.array([], dtype=object)
+        self.buffer = None
+
+    def _open(self):
+        """打开共享内存文件；守护进程重启后代码表可能变化，需要重新映射"""
+        data_file = os.path.join(self.path, 'snapshot.bin')
+        try:
+            inode = os.stat(data_file).st_ino
+        except OSError:
+            return False
+        if self.buffer is not None and inode == self.inode:
+            return True
+
+        try:
+            with open(os.path.join(self.path, 'codes.json'), 'r', encoding='utf-8') as f:
+                table = json.load(f)
+            buffer = np.memmap(data_file, dtype=np.uint8, mode='r')
+        except (OSError, ValueError):
+            return False
+
+        magic, _, n, _, table_id = HEADER.unpack(bytes(buffer[:HEADER.size]))
+        if magic != MAGIC or table_id != table['table_id']:
+            return False  # 守护进程正在重建文件
+
+        self.buffer = buffer
+        self.inode = inode
+        self.codes = pd.Index(table['codes'])
+        self.names = np.asarray(table['names'], dtype=object)
+        self.seq, self.update_time, self.fields = _views(buffer, n)
+        return True
+
+    def available(self):
+        """守护进程是否在运行（快照存在且最近更新过）"""
+        return self._open() and time.time() - float(self.update_time[0]) <= self.max_age
+
+    def arrays(self):
+        """直接返回共享内存上的字段数组（不复制，只读），以及当前序号"""
+        if not self._open():
+            return None, {}
+        return int(self.seq[0]), self.fields
+
+    def get_quotes(self, ts_codes=None, retries=5):
+        """读取行情快照，返回与行情客户端相同格式的 DataFrame（没有报价的股票不返回）"""
+        if not self._open():
+            return pd.DataFrame()
+
+        if ts_codes is None:
+            idx = np.arange(len(self.codes))
+        else:
+            idx = self.codes.get_indexer(pd.Index(ts_codes))
+            idx = idx[idx >= 0]
+
+        for _ in range(retries):
+            seq = int(self.seq[0])
+            if seq % 2:
+                time.sleep(0.001)
+                continue
+            values = {field: self.fields[field][idx] for field in SNAPSHOT_FIELDS}  # 按下标取值即复制
+            if int(self.seq[0]) == seq:
+                break
+        else:
+            return pd.DataFrame()
+
+        df = pd.DataFrame(values)
+        df.insert(0, 'ts_code', self.codes[idx])
+        df.insert(1, 'name', self.names[idx])
+        return df[df['price'].notna()].reset_index(drop=True)
+
+    def get_quote(self, ts_code):
+        """读取单只股票行情，返回一行 Series，没有报价返回 None"""
+        df = self.get_quotes([ts_code])
+        if df.empty:
+            return None
+        return df.iloc[0]
+
+
+_default_reader = None
+
+
+def default_reader():
+    """进程内共享的快照读取器"""
+    global _default_reader
+    if _default_reader is None:
+        _default_reader = QuoteSnapshotReader()
+    return _default_reader
+
+
+def fetch_quotes(ts_codes, deadline=None):
+    """获取实时行情：本机守护进程在运行时读共享快照，否则直接请求行情接口"""
+    reader = default_reader()
+    if reader.available():
+        return reader.get_quotes(ts_codes)
+    return default_client().fetch_sync(ts_codes, deadline)
+
+
+def get_quote(ts_code):
+    """获取单只股票实时行情，优先读共享快照"""
+    reader = default_reader()
+    if reader.available():
+        return reader.get_quote(ts_code)
+    return default_client().get_quote(ts_code)
+
+
+def run_daemon(pro, interval=1, quiet_every=5, path=DEFAULT_PATH):
+    """行情守护进程：分层轮询全市场（沪深）行情并写入共享快照
+    pro: Tushare 接口，启动时取一次股票列表
+    """
+    stocks = pro.stock_basic(exchange='', list_status='L', fields='ts_code,name')
+    stocks = stocks[stocks['ts_code'].str.endswith(('SH', 'SZ'))].reset_index(drop=True)
+    writer = QuoteSnapshotWriter(stocks, path)
+    client = default_client()
+    scheduler = TieredQuoteScheduler(lambda codes: client.fetch_sync(codes, deadline=interval * 0.8),
+                                     stocks['ts_code'].tolist(), quiet_every=quiet_every, budget=interval)
+    print(f"行情快照守护进程已启动: {path}，共 {len(stocks)} 只股票")
+
+    while True:
+        tick_start = time.perf_counter()
+        df = scheduler.poll()
+        if not df.empty:
+            writer.write(df)
+        scheduler.record_tick(time.perf_counter() - tick_start)
+        time.sleep(max(0.0, interval - (time.perf_counter() - tick_start)))
+
+
+if __name__ == "__main__":
+    import tushare as ts
+
+    # token 取自环境变量 TUSHARE_TOKEN 或脚本目录下的 config.prod.yaml，都没有时用 tushare 本地保存的 token
+    token = os.environ.get('TUSHARE_TOKEN', '')
+    config_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.prod.yaml')
+    if not token and os.path.exists(config_file):
+        import yaml
+        with open(config_file, 'r', encoding='utf-8') as f:
+            token = (yaml.safe_load(f) or {}).get('tushare_token', '')
+
+    try:
+        run_daemon(ts.pro_api(token) if token else ts.pro_api(),
+                   interval=float(sys.argv[1]) if len(sys.argv) > 1 else 1)
+    except KeyboardInterrupt:
+        print("\n守护进程已停止")
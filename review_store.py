@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+复盘数据存储（SQLite）
+题材进阶追踪每天追加一行（按日期，重复运行同一天会覆盖当天），
+每行保存13列单元格的值和样式描述，导出 Excel 时按日期顺序流式读取，
+不再每天打开、复制、重写整个进阶追踪 Excel。
+每日涨停数据按 日期/板数/题材/股票 一行保存，按日期、代码、题材建索引，
+跨天查询（题材哪些天达到N板、某只股票的连板路径）直接查表，不再逐个打开每日 JSON 文件。
+题材颜色映射也保存在这里，新分配或回收的颜色逐条写入，不再每次重写整个映射文件
+"""
+
+import os
+import json
+import sqlite3
+
+
+class ReviewStore:
+    def __init__(self, db_file='stock_review.db'):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS progress_tracker (
+                date TEXT PRIMARY KEY,
+                cells TEXT NOT NULL
+            )
+        ''')
+        # seq: 股票在当天数据中的顺序（还原每日数据时保持题材、股票的原始顺序）
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS limit_up (
+                date TEXT NOT NULL,
+                board INTEGER NOT NULL,
+                topic TEXT NOT NULL,
+                code TEXT NOT NULL,
+                name TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                PRIMARY KEY (date, seq)
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_limit_up_code ON limit_up (code, date)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_limit_up_topic ON limit_up (topic, board, date)')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS topic_colors (
+                topic TEXT PRIMARY KEY,
+                color TEXT NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    def append_tracker_rows(self, rows):
+        """追加进阶追踪行
+        参数: rows - [(日期, 单元格列表), ...]，单元格为 {'value', 'font', 'fill', 'alignment'} 描述
+        """
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO progress_tracker (date, cells) VALUES (?, ?)',
+            [(day, json.dumps(cells, ensure_ascii=False)) for day, cells in rows])
+        self.conn.commit()
+
+    def tracker_rows(self, limit=None, end=None):
+        """按日期顺序逐行读取进阶追踪（生成器）
+        参数: limit - 只取最近 limit 行（按主键倒序取，耗时与历史长度无关）；end - 只取不晚于该日期的行
+        """
+        where, params = ('WHERE date <= ?', [end]) if end else ('', [])
+        if limit is None:
+            cursor = self.conn.execute(f'SELECT cells FROM progress_tracker {where} ORDER BY date', params)
+        else:
+            cursor = self.conn.execute(
+                f'SELECT cells FROM (SELECT date, cells FROM progress_tracker {where} '
+                f'ORDER BY date DESC LIMIT ?) ORDER BY date', params + [limit])
+        for (cells,) in cursor:
+            yield json.loads(cells)
+
+    def tracker_count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM progress_tracker').fetchone()[0]
+
+    def save_day(self, data):
+        """保存一天的涨停数据（覆盖当天已有数据）
+        参数: data - {'date': 日期, 'boards': {板数: {题材: [{'code', 'name'}, ...]}}}
+        """
+        self._insert_day(data)
+        self.conn.commit()
+
+    def _insert_day(self, data):
+        rows = []
+        for board, topics in data['boards'].items():
+            for topic, stocks in topics.items():
+                for stock in stocks:
+                    rows.append((data['date'], int(board), topic, stock['code'], stock['name'], len(rows)))
+        self.conn.execute('DELETE FROM limit_up WHERE date = ?', (data['date'],))
+        self.conn.executemany(
+            'INSERT INTO limit_up (date, board, topic, code, name, seq) VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def load_day(self, day):
+        """读取一天的涨停数据（格式同 save_day），没有数据返回 None"""
+        cursor = self.conn.execute('SELECT board, topic, code, name FROM limit_up WHERE date = ? ORDER BY seq',
+                                   (day,))
+        boards = {}
+        for board, topic, code, name in cursor:
+            boards.setdefault(str(board), {}).setdefault(topic, []).append({'code': code, 'name': name})
+        if not boards:
+            return None
+        return {'date': day, 'boards': boards}
+
+    def has_day(self, day):
+        return self.conn.execute('SELECT 1 FROM limit_up WHERE date = ? LIMIT 1', (day,)).fetchone() is not None
+
+    def days(self):
+        """已保存的日期列表（升序）"""
+        return [day for (day,) in self.conn.execute('SELECT DISTINCT date FROM limit_up ORDER BY date')]
+
+    def topic_days(self, topic, min_board=3, start=None, end=None):
+        """题材达到 min_board 板及以上的日期
+        返回: [(日期, 最高板数, 达到的股票数), ...]
+        """
+        sql = 'SELECT date, MAX(board), COUNT(*) FROM limit_up WHERE topic = ? AND board >= ?'
+        params = [topic, min_board]
+        if start:
+            sql += ' AND date >= ?'
+            params.append(start)
+        if end:
+            sql += ' AND date <= ?'
+            params.append(end)
+        return self.conn.execute(sql + ' GROUP BY date ORDER BY date', params).fetchall()
+
+    def stock_path(self, code, start=None, end=None):
+        """股票的连板路径
+        返回: [(日期, 板数, 题材), ...]，只包含涨停的日期
+        """
+        sql = 'SELECT date, board, topic FROM limit_up WHERE code = ?'
+        params = [code]
+        if start:
+            sql += ' AND date >= ?'
+            params.append(start)
+        if end:
+            sql += ' AND date <= ?'
+            params.append(end)
+        return self.conn.execute(sql + ' ORDER BY date', params).fetchall()
+
+    def import_daily_json(self, directory):
+        """导入每日数据 JSON 文件（只导入数据库中还没有的日期），返回导入的天数"""
+        if not os.path.isdir(directory):
+            return 0
+
+        saved = set(self.days())
+        count = 0
+        for filename in sorted(os.listdir(directory)):
+            day, ext = os.path.splitext(filename)
+            if ext != '.json' or day in saved:
+                continue
+            with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+                self._insert_day(json.load(f))
+            count += 1
+        self.conn.commit()
+        return count
+
+    def topic_last_seen(self):
+        """每个题材最后一次出现涨停的日期"""
+        return dict(self.conn.execute('SELECT topic, MAX(date) FROM limit_up GROUP BY topic'))
+
+    def load_topic_colors(self):
+        """题材 -> 颜色（按分配顺序）"""
+        return dict(self.conn.execute('SELECT topic, color FROM topic_colors ORDER BY rowid'))
+
+    def update_topic_colors(self, assigned, released=()):
+        """保存新分配的颜色 {题材: 颜色}，删除已回收颜色的题材"""
+        self.conn.executemany('DELETE FROM topic_colors WHERE topic = ?', [(topic,) for topic in released])
+        self.conn.executemany('INSERT OR REPLACE INTO topic_colors (topic, color) VALUES (?, ?)',
+                              list(assigned.items()))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -7,23 +7,52 @@
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 import openpyxl
+import pandas as pd
 from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
 from collections import defaultdict
-import re
 import os
+import time
+import threading
+
+from trading_calendar import TradingCalendar
+from review_store import ReviewStore
+from topic_progress import TopicProgressEngine
+from topic_colors import TopicColorAllocator
+from limit_up_data import LimitUpDataset, LimitUpRecord
+
+# 脚本所在目录（项目根目录），交易日历等本地缓存放在其下的 bar_cache，与监控、量价分析共用
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
 class StockReviewTool:
-    def __init__(self):
+    def __init__(self, pro=None):
+        """
+        pro: Tushare 接口（交易日历用），为 None 时用环境变量 TUSHARE_TOKEN 或 config.prod.yaml 中的 token 创建
+        """
         self.headers = {
             'Accept': '*/*',
             'User-Agent': 'lhb/5.20.9 (com.kaipanla.www; build:1; iOS 18.6.2) Alamofire/4.9.1',
         }
         self.base_url = 'https://apphwshhq.longhuvip.com/w1/api/index.php'
 
+        # 复用长连接的会话：请求超时，连接失败/服务端错误自动重试
+        self.timeout = 10
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=('GET',))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=16, max_retries=retry))
+        self.min_interval = 0  # 两次请求的最小间隔（秒），回补时设置以限制请求速率
+        self._rate_lock = threading.Lock()
+        self._next_request = 0.0
+
         # 预定义颜色列表（用于不同题材）- 扩展到100种颜色
         self.colors = [
             # 第一组：原有15种颜色
@@ -125,33 +154,96 @@ class StockReviewTool:
             'BC8F8F',  # 玫瑰褐色2
         ]
 
-        # 题材颜色映射文件
-        self.color_map_file = 'topic_colors.json'
-        self.topic_colors = self.load_topic_colors()
-        self.color_index = len(self.topic_colors)
+        # 每日数据和进阶追踪保存在数据库，进阶追踪 Excel 每次从数据库导出
+        self.progress_excel = 'stock_progress_tracker.xlsx'
+        self.store = ReviewStore()
+        self.styles = {}  # 样式描述 -> 样式对象
+        self.import_progress_history()
+
+        # 题材颜色映射（保存在数据库，旧版 topic_colors.json 首次运行时导入）
+        # 超过 color_recycle_days 个交易日没有涨停的题材回收颜色
+        self.color_allocator = TopicColorAllocator(self.store, self.colors, legacy_file='topic_colors.json')
+        self.color_recycle_days = 60
 
-        # 每日数据存储目录
+        # 旧版每日数据目录（JSON 文件），新的日期导入数据库
         self.data_dir = 'daily_data'
-        if not os.path.exists(self.data_dir):
-            os.makedirs(self.data_dir)
+        imported = self.store.import_daily_json(self.data_dir)
+        if imported:
+            print(f"已从 {self.data_dir} 导入 {imported} 天的每日数据")
+
+        # 交易日历（本地缓存，与监控共用）；取不到日历时按星期判断交易日
+        self.pro = pro or self.tushare_api()
+        self.calendar = TradingCalendar(self.pro, os.path.join(BASE_DIR, 'bar_cache', 'trade_cal.csv'))
+
+        # 涨停数据（梯队按天缓存在 bar_cache/limit_up，与首板筛选、盘中监控共用）
+        self.limit_up = LimitUpDataset(cache_dir=os.path.join(BASE_DIR, 'bar_cache'))
+
+        # 多日题材进阶统计（统计窗口：最近多少个交易日）
+        self.progress_engine = TopicProgressEngine(self.store, self.calendar)
+        self.stats_days = 250
+
+    @staticmethod
+    def tushare_api():
+        """用本地配置的 token 创建 Tushare 接口，没有 token 或 tushare 不可用时返回 None"""
+        token = os.environ.get('TUSHARE_TOKEN', '')
+        config_file = os.path.join(BASE_DIR, 'config.prod.yaml')
+        if not token and os.path.exists(config_file):
+            try:
+                import yaml
+                with open(config_file, 'r', encoding='utf-8') as f:
+                    token = (yaml.safe_load(f) or {}).get('tushare_token', '')
+            except Exception as e:
+                print(f"警告: 读取配置文件失败 ({e})")
+        if not token:
+            return None
+        try:
+            import tushare as ts
+            return ts.pro_api(token)
+        except Exception as e:
+            print(f"警告: 创建 Tushare 接口失败 ({e})")
+            return None
 
-        # 进阶追踪表文件
-        self.progress_excel = 'stock_progress_tracker.xlsx'
+    def is_trading_day(self, day):
+        """是否交易日（按交易日历）；日历不可用（网络失败、超出日历范围）时按星期判断"""
+        try:
+            return self.calendar.is_trading_day(day)
+        except Exception as e:
+            print(f"警告: 交易日历不可用 ({e})，按星期判断是否交易日")
+            return datetime.strptime(TradingCalendar.normalize(day), '%Y%m%d').weekday() < 5
 
-    def load_topic_colors(self):
-        """从文件加载题材颜色映射"""
-        if os.path.exists(self.color_map_file):
-            try:
-                with open(self.color_map_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
+    def release_topic_colors(self, day):
+        """回收 day 之前 color_recycle_days 个交易日内没有涨停的题材的颜色"""
+        try:
+            cutoff = self.calendar.prev(day, self.color_recycle_days)
+        except Exception as e:
+            print(f"警告: 交易日历不可用 ({e})，跳过题材颜色回收")
+            return
+        if cutoff is None:
+            return
+        released = self.color_allocator.release_inactive(self.format_day(cutoff))
+        if released:
+            print(f"回收 {released} 个不活跃题材的颜色")
 
     def save_topic_colors(self):
-        """保存题材颜色映射到文件"""
-        with open(self.color_map_file, 'w', encoding='utf-8') as f:
-            json.dump(self.topic_colors, f, ensure_ascii=False, indent=2)
+        """保存题材颜色映射（只写入有变化的题材）"""
+        self.color_allocator.save()
+
+    def throttle(self):
+        """按 min_interval 限制请求速率（多线程共用）"""
+        if not self.min_interval:
+            return
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_request - now
+            self._next_request = max(now, self._next_request) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def request_api(self, params):
+        """请求开盘啦接口，返回解析后的 JSON"""
+        self.throttle()
+        response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+        return response.json()
 
     def get_daily_limit_index(self, day):
         """获取各板数量统计"""
@@ -165,8 +257,7 @@ class StockReviewTool:
         }
         
         try:
-            response = requests.get(self.base_url, params=params, headers=self.headers)
-            data = response.json()
+            data = self.request_api(params)
             if data.get('errcode') == '0':
                 return data.get('info', [])
             return []
@@ -177,7 +268,7 @@ class StockReviewTool:
     def get_stocks_by_pidtype(self, day, pidtype):
         """根据PidType获取股票数据
         PidType: 1=首板, 2=2板, 3=3板, 4=4板, 5=5板及以上
-        返回: [(stock_data, board_num), ...]
+        返回: [LimitUpRecord, ...]
         """
         params = {
             'Day': day,
@@ -194,24 +285,10 @@ class StockReviewTool:
         }
 
         try:
-            response = requests.get(self.base_url, params=params, headers=self.headers)
-            data = response.json()
+            data = self.request_api(params)
             if data.get('errcode') == '0' and 'info' in data:
                 if len(data['info']) > 0 and isinstance(data['info'][0], list):
-                    stocks = data['info'][0]
-                    # 为每只股票添加板数信息
-                    # PidType=1-4 直接对应板数，PidType=5 需要从连板信息解析
-                    result = []
-                    for stock in stocks:
-                        if pidtype <= 4:
-                            # PidType 1-4 直接对应板数
-                            result.append((stock, pidtype))
-                        else:
-                            # PidType=5 是高连板，需要从stock[18]解析具体板数
-                            board_info = stock[18] if len(stock) > 18 else ''
-                            board_num = self.parse_board_number(board_info)
-                            result.append((stock, board_num))
-                    return result
+                    return [LimitUpRecord.from_ladder(stock, pidtype) for stock in data['info'][0]]
                 return []
             return []
         except Exception as e:
@@ -220,83 +297,40 @@ class StockReviewTool:
 
     def get_all_board_stocks(self, day):
         """获取所有板数的股票（1-5板及以上）
-        返回: [(stock_data, board_num), ...]
+        返回: [LimitUpRecord, ...]
         """
-        all_stocks = []
-
-        # 获取1-5板的数据（PidType=1,2,3,4,5）
-        for pidtype in range(1, 6):
-            stocks = self.get_stocks_by_pidtype(day, pidtype)
-            if stocks:
-                print(f"  PidType={pidtype}: 获取到 {len(stocks)} 只股票")
-                all_stocks.extend(stocks)
-
+        _, all_stocks = self.fetch_day(day)
         return all_stocks
+
+    def fetch_day(self, day):
+        """并发获取一天的板数统计和1-5板股票（6个请求同时发出），梯队保存到涨停数据缓存
+        返回: (板数统计, [LimitUpRecord, ...])
+        """
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            index_future = executor.submit(self.get_daily_limit_index, day)
+            # 获取1-5板的数据（PidType=1,2,3,4,5），按 PidType 顺序合并
+            pid_futures = [executor.submit(self.get_stocks_by_pidtype, day, pidtype) for pidtype in range(1, 6)]
+
+            all_stocks = []
+            for pidtype, future in enumerate(pid_futures, 1):
+                stocks = future.result()
+                if stocks:
+                    print(f"  PidType={pidtype}: 获取到 {len(stocks)} 只股票")
+                    all_stocks.extend(stocks)
+            self.limit_up.add_ladder(day, all_stocks)
+            return index_future.result(), all_stocks
     
-    def parse_board_number(self, board_info):
-        """解析连板信息，返回板数"""
-        if not board_info or board_info == '':
-            return 1  # 没有连板信息，默认为一板
-
-        # 匹配 "X连板"、"X天Y板" 或 "Y板" 格式
-        # 优先匹配 "X连板"
-        match = re.search(r'(\d+)连板', board_info)
-        if match:
-            return int(match.group(1))
-
-        # 其次匹配 "X天Y板" 中的 Y
-        match = re.search(r'(\d+)天(\d+)板', board_info)
-        if match:
-            return int(match.group(2))
-
-        # 最后匹配 "Y板"
-        match = re.search(r'(\d+)板', board_info)
-        if match:
-            return int(match.group(1))
-
-        return 1
-    
-    def classify_stocks_by_board(self, stocks_with_board):
+    def classify_stocks_by_board(self, stocks):
         """按连板数分类股票
-        参数: stocks_with_board - [(stock_data, board_num), ...]
+        参数: stocks - [LimitUpRecord, ...]
         """
         board_stocks = defaultdict(list)
-
-        for stock_data, board_num in stocks_with_board:
-            # 股票数据结构：
-            # [0]: 代码, [1]: 名称, [5]: 主题材, [12]: 题材列表, [18]: 连板信息
-            code = stock_data[0]
-            name = stock_data[1]
-            main_topic = stock_data[5] if len(stock_data) > 5 else ''
-            topics = stock_data[12] if len(stock_data) > 12 else ''
-            board_info = stock_data[18] if len(stock_data) > 18 else ''
-
-            # 如果board_info为空，使用传入的board_num构造
-            if not board_info:
-                if board_num == 1:
-                    board_info = '首板'
-                else:
-                    board_info = f'{board_num}板'
-
-            # 存储股票信息
-            stock_info = {
-                'code': code,
-                'name': name,
-                'main_topic': main_topic,
-                'topics': topics,
-                'board_info': board_info,
-                'board_num': board_num
-            }
-
-            board_stocks[board_num].append(stock_info)
-
+        for stock in stocks:
+            board_stocks[stock.board_num].append(stock)
         return board_stocks
 
-    def save_daily_data(self, day, board_stocks):
-        """保存每日数据到JSON文件"""
-        filename = os.path.join(self.data_dir, f'{day}.json')
-
-        # 按题材统计每个板数的股票
+    def build_day_data(self, day, board_stocks):
+        """按板数、题材整理一天的涨停股票（每日数据的格式）"""
         data = {
             'date': day,
             'boards': {}
@@ -306,10 +340,9 @@ class StockReviewTool:
             # 按题材分组
             topic_groups = defaultdict(list)
             for stock in stocks:
-                topic = stock['main_topic'] if stock['main_topic'] else '其他'
-                topic_groups[topic].append({
-                    'code': stock['code'],
-                    'name': stock['name']
+                topic_groups[stock.topic].append({
+                    'code': stock.code,
+                    'name': stock.name
                 })
 
             # 保存该板数的题材数据
@@ -317,18 +350,19 @@ class StockReviewTool:
                 topic: stocks_list for topic, stocks_list in topic_groups.items()
             }
 
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        return data
 
-        print(f"每日数据已保存到: {filename}")
+    def save_daily_data(self, day, board_stocks):
+        """保存每日数据到数据库，返回保存的数据"""
+        data = self.build_day_data(day, board_stocks)
+        self.store.save_day(data)
+
+        print(f"每日数据已保存到: {self.store.db_file}（{day}）")
+        return data
 
     def load_daily_data(self, day):
         """加载指定日期的数据"""
-        filename = os.path.join(self.data_dir, f'{day}.json')
-        if os.path.exists(filename):
-            with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return None
+        return self.store.load_day(day)
 
     def analyze_topic_progress(self, yesterday_data, today_data):
         """分析题材进阶情况（混合判断）
@@ -397,40 +431,32 @@ class StockReviewTool:
         return progress
     
     def get_topic_color(self, topic):
-        """获取题材对应的颜色（带冲突检测）"""
-        if topic not in self.topic_colors:
-            # 获取已使用的颜色
-            used_colors = set(self.topic_colors.values())
-
-            # 找到第一个未使用的颜色
-            assigned_color = None
-            for color in self.colors:
-                if color not in used_colors:
-                    assigned_color = color
-                    break
-
-            # 如果所有颜色都用完了，使用循环索引（但会有重复）
-            if assigned_color is None:
-                assigned_color = self.colors[self.color_index % len(self.colors)]
-                print(f'警告: 颜色池已用完，题材 "{topic}" 使用重复颜色 {assigned_color}')
-
-            self.topic_colors[topic] = assigned_color
-            self.color_index += 1
-
-        return self.topic_colors[topic]
-    
+        """获取题材对应的颜色（新题材分配空闲颜色）"""
+        return self.color_allocator.get(topic)
+
+    def styled_cell(self, ws, value, font=None, fill=None, alignment=None, border=None):
+        """生成 write_only 单元格，样式从样式表中取（相同样式共用一个对象）"""
+        cell = WriteOnlyCell(ws, value=value)
+        if font:
+            cell.font = self.get_style('font', font)
+        if fill:
+            cell.fill = self.get_style('fill', fill)
+        if alignment:
+            cell.alignment = self.get_style('alignment', alignment)
+        if border:
+            cell.border = self.get_style('border', border)
+        return cell
+
     def export_to_excel(self, board_stocks, day, filename=None):
-        """导出到Excel（板数列+题材列交替 + 题材说明列）"""
+        """导出到Excel（板数列+题材列交替 + 题材说明列）
+        使用 write_only 工作簿按行流式写入，先按列排好每列的单元格，再逐行输出
+        """
         if filename is None:
             filename = f'stock_review_{day}.xlsx'
 
         # 创建工作簿
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = '连板复盘'
-
-        # 获取最大板数
-        max_board_num = max(board_stocks.keys()) if board_stocks else 1
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet(title='连板复盘')
 
         # 将超过8板的归类为"高连板"
         # 重新组织数据：1-8板各自一列，9板及以上合并为"高连板"
@@ -453,204 +479,99 @@ class StockReviewTool:
         # 计算总列数：每个板数2列（股票信息+题材）+ 1列题材说明
         total_cols = len(display_boards) * 2 + 1
 
-        # 设置列宽
+        # 设置列宽（write_only 模式下必须在写入行之前设置）
         for col_idx in range(1, total_cols + 1):
             ws.column_dimensions[openpyxl.utils.get_column_letter(col_idx)].width = 25
 
-        # 写入标题
-        ws['A1'] = f'{day} 连板复盘'
-        ws['A1'].font = Font(size=16, bold=True, color='FFFFFF')
-        ws['A1'].fill = PatternFill(start_color='2E75B6', end_color='2E75B6', fill_type='solid')
-        merge_end = openpyxl.utils.get_column_letter(total_cols) + '1'
-        ws.merge_cells(f'A1:{merge_end}')
-        ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
-        ws.row_dimensions[1].height = 30
+        header_style = {'font': [12, True, 'FFFFFF'], 'fill': '4472C4',
+                        'alignment': ['center', 'center', False], 'border': ['medium'] * 4}
+        # 题材第一只股票使用粗边框顶部，标记题材开始
+        first_border = ['thin', 'thin', 'medium', 'thin']
+        thin_border = ['thin'] * 4
 
-        # 写入统计信息
-        ws['A2'] = '统计信息：'
-        ws['A2'].font = Font(size=11, bold=True)
-        stats_text = '  '.join([f'{board_num}板: {len(stocks)}只'
-                                for board_num, stocks in sorted(board_stocks.items())])
-        ws['B2'] = stats_text
-        ws['B2'].font = Font(size=10)
-        merge_end_col2 = openpyxl.utils.get_column_letter(total_cols) + '2'
-        ws.merge_cells(f'B2:{merge_end_col2}')
-
-        # 写入列标题（板数列 + 题材列交替）
-        row = 4
-        col_idx = 1
+        # 按题材分组，每个板数生成股票信息列和题材列
+        columns = []
         for board_num in display_boards:
-            # 板数列标题
-            cell = ws.cell(row=row, column=col_idx)
-            count = len(reorganized_stocks.get(board_num, []))
-
-            # 如果是9，显示为"高连板"
-            if board_num == 9:
-                cell.value = f'高连板 ({count}只)'
-            else:
-                cell.value = f'{board_num}板 ({count}只)'
-
-            cell.font = Font(size=12, bold=True, color='FFFFFF')
-            cell.fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = Border(
-                left=Side(style='medium'),
-                right=Side(style='medium'),
-                top=Side(style='medium'),
-                bottom=Side(style='medium')
-            )
-            col_idx += 1
-
-            # 题材列标题
-            cell = ws.cell(row=row, column=col_idx)
-            cell.value = '题材'
-            cell.font = Font(size=12, bold=True, color='FFFFFF')
-            cell.fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = Border(
-                left=Side(style='medium'),
-                right=Side(style='medium'),
-                top=Side(style='medium'),
-                bottom=Side(style='medium')
-            )
-            col_idx += 1
-
-        # 最后一列：题材说明
-        cell = ws.cell(row=row, column=total_cols)
-        cell.value = '题材说明'
-        cell.font = Font(size=12, bold=True, color='FFFFFF')
-        cell.fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        cell.border = Border(
-            left=Side(style='medium'),
-            right=Side(style='medium'),
-            top=Side(style='medium'),
-            bottom=Side(style='medium')
-        )
-        ws.row_dimensions[row].height = 25
-
-        # 按题材分组并写入数据
-        max_row = 5
-
-        for board_idx, board_num in enumerate(display_boards):
-            if board_num not in reorganized_stocks:
-                continue
-
             stocks = reorganized_stocks[board_num]
 
             # 按主题材分组
             topic_groups = defaultdict(list)
             for stock in stocks:
-                topic = stock['main_topic'] if stock['main_topic'] else '其他'
-                topic_groups[topic].append(stock)
-
-            # 计算该板数的列索引（股票信息列和题材列）
-            stock_col = board_idx * 2 + 1  # 股票信息列
-            topic_col = stock_col + 1      # 题材列
+                topic_groups[stock.topic].append(stock)
 
-            # 写入每个题材的股票
-            current_row = 5
+            stock_column, topic_column = [], []
             for topic, topic_stocks in sorted(topic_groups.items(), key=lambda x: -len(x[1])):
                 # 获取题材颜色
                 color = self.get_topic_color(topic)
 
                 for stock_idx, stock in enumerate(topic_stocks):
                     # 股票信息列
-                    cell_stock = ws.cell(row=int(current_row), column=stock_col)
-
-                    # 设置单元格内容
                     content_parts = [
-                        f"【{stock['name']}】",
-                        f"代码: {stock['code']}",
-                        f"题材: {stock['topics']}"
+                        f"【{stock.name}】",
+                        f"代码: {stock.code}",
+                        f"题材: {stock.topics}"
                     ]
-                    if stock['board_info']:
-                        content_parts.append(f"连板: {stock['board_info']}")
-
-                    cell_stock.value = '\n'.join(content_parts)
-
-                    # 设置样式
-                    cell_stock.fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
-                    cell_stock.alignment = Alignment(horizontal='left', vertical='top', wrap_text=True)
-                    cell_stock.font = Font(size=9)
-
-                    # 如果是该题材的第一只股票，使用粗边框顶部
-                    if stock_idx == 0:
-                        cell_stock.border = Border(
-                            left=Side(style='thin'),
-                            right=Side(style='thin'),
-                            top=Side(style='medium'),  # 粗边框标记题材开始
-                            bottom=Side(style='thin')
-                        )
-                    else:
-                        cell_stock.border = Border(
-                            left=Side(style='thin'),
-                            right=Side(style='thin'),
-                            top=Side(style='thin'),
-                            bottom=Side(style='thin')
-                        )
+                    if stock.board_info:
+                        content_parts.append(f"连板: {stock.board_info}")
 
+                    border = first_border if stock_idx == 0 else thin_border
+                    stock_column.append(self.styled_cell(ws, '\n'.join(content_parts), font=[9, False, None],
+                                                         fill=color, alignment=['left', 'top', True],
+                                                         border=border))
                     # 题材列
-                    cell_topic = ws.cell(row=int(current_row), column=topic_col)
-                    cell_topic.value = topic
-                    cell_topic.fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
-                    cell_topic.alignment = Alignment(horizontal='center', vertical='center')
-                    cell_topic.font = Font(size=10, bold=True)
-
-                    # 题材列边框
-                    if stock_idx == 0:
-                        cell_topic.border = Border(
-                            left=Side(style='thin'),
-                            right=Side(style='thin'),
-                            top=Side(style='medium'),
-                            bottom=Side(style='thin')
-                        )
-                    else:
-                        cell_topic.border = Border(
-                            left=Side(style='thin'),
-                            right=Side(style='thin'),
-                            top=Side(style='thin'),
-                            bottom=Side(style='thin')
-                        )
-
-                    # 设置行高
-                    ws.row_dimensions[int(current_row)].height = 70
-
-                    current_row += 1
-
-                # 更新最大行数
-                max_row = max(max_row, int(current_row))
-
-        # 在最右边的题材说明列填充
-        summary_col = total_cols
-        current_row = 5
+                    topic_column.append(self.styled_cell(ws, topic, font=[10, True, None], fill=color,
+                                                         alignment=['center', 'center', False], border=border))
+            columns.extend([stock_column, topic_column])
 
         # 收集所有题材及其股票数量（使用原始的board_stocks，包含所有板数）
         topic_stats = defaultdict(int)
         for stocks in board_stocks.values():
             for stock in stocks:
-                topic = stock['main_topic'] if stock['main_topic'] else '其他'
-                topic_stats[topic] += 1
+                topic_stats[stock.topic] += 1
 
-        # 按股票数量排序题材
-        sorted_topics = sorted(topic_stats.items(), key=lambda x: -x[1])
-
-        # 在题材说明列填充
-        for topic, count in sorted_topics:
+        # 最右边的题材说明列，按股票数量排序题材
+        summary_column = []
+        for topic, count in sorted(topic_stats.items(), key=lambda x: -x[1]):
             color = self.get_topic_color(topic)
-            cell = ws.cell(row=current_row, column=summary_col)
-            cell.value = f'{topic}\n({count}只)'
-            cell.fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
-            cell.font = Font(size=10, bold=True)
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            cell.border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
-            ws.row_dimensions[current_row].height = 50
-            current_row += 1
+            summary_column.append(self.styled_cell(ws, f'{topic}\n({count}只)', font=[10, True, None], fill=color,
+                                                   alignment=['center', 'center', True], border=thin_border))
+        columns.append(summary_column)
+
+        # 行高：有股票的行70，题材说明所在的行50
+        data_rows = max(len(column) for column in columns)
+        for i in range(data_rows):
+            ws.row_dimensions[i + 5].height = 50 if i < len(summary_column) else 70
+        ws.row_dimensions[1].height = 30
+        ws.row_dimensions[4].height = 25
+
+        # 标题（合并第一行）
+        last_col = openpyxl.utils.get_column_letter(total_cols)
+        ws.merged_cells.add(f'A1:{last_col}1')
+        ws.append([self.styled_cell(ws, f'{day} 连板复盘', font=[16, True, 'FFFFFF'], fill='2E75B6',
+                                    alignment=['center', 'center', False])])
+
+        # 统计信息
+        ws.merged_cells.add(f'B2:{last_col}2')
+        stats_text = '  '.join([f'{board_num}板: {len(stocks)}只'
+                                for board_num, stocks in sorted(board_stocks.items())])
+        ws.append([self.styled_cell(ws, '统计信息：', font=[11, True, None]),
+                   self.styled_cell(ws, stats_text, font=[10, False, None])])
+        ws.append([])
+
+        # 列标题（板数列 + 题材列交替，最后一列题材说明）
+        header = []
+        for board_num in display_boards:
+            count = len(reorganized_stocks[board_num])
+            # 如果是9，显示为"高连板"
+            title = f'高连板 ({count}只)' if board_num == 9 else f'{board_num}板 ({count}只)'
+            header.append(self.styled_cell(ws, title, **header_style))
+            header.append(self.styled_cell(ws, '题材', **header_style))
+        header.append(self.styled_cell(ws, '题材说明', **header_style))
+        ws.append(header)
+
+        # 逐行写入数据
+        for i in range(data_rows):
+            ws.append([column[i] if i < len(column) else None for column in columns])
 
         # 保存颜色映射
         self.save_topic_colors()
@@ -658,163 +579,158 @@ class StockReviewTool:
         # 不在这里保存文件，返回workbook和filename
         return wb, filename
 
+    @staticmethod
+    def format_day(day):
+        """YYYYMMDD -> YYYY-MM-DD"""
+        return f'{day[:4]}-{day[4:6]}-{day[6:]}'
+
     def find_last_trading_day(self, day):
-        """找到最近的一个交易日（有数据的日期）
-        从day-1开始往前找，最多找7天
+        """找到上一个交易日（按交易日历），返回 YYYY-MM-DD；该日没有保存数据时返回 None
+        交易日历不可用时从 day 往前找最多7天内有数据的日期
         """
-        from datetime import datetime as dt, timedelta
-
-        date_obj = dt.strptime(day, '%Y-%m-%d')
-
-        # 往前找最多7天
-        for i in range(1, 8):
-            check_date = (date_obj - timedelta(days=i)).strftime('%Y-%m-%d')
-            data_file = os.path.join(self.data_dir, f'{check_date}.json')
-
-            if os.path.exists(data_file):
-                print(f"找到上一个交易日: {check_date} (距今{i}天)")
-                return check_date
-
-        print(f"警告: 未找到最近7天内的交易日数据")
+        try:
+            prev_day = self.calendar.prev(day)
+        except Exception as e:
+            print(f"警告: 交易日历不可用 ({e})，按最近7天内有数据的日期查找")
+            date_obj = datetime.strptime(TradingCalendar.normalize(day), '%Y%m%d')
+            for i in range(1, 8):
+                check_date = (date_obj - timedelta(days=i)).strftime('%Y-%m-%d')
+                if self.store.has_day(check_date):
+                    print(f"找到上一个交易日: {check_date} (距今{i}天)")
+                    return check_date
+            print(f"警告: 未找到最近7天内的交易日数据")
+            return None
+        if prev_day is None:
+            return None
+
+        check_date = self.format_day(prev_day)
+        if self.store.has_day(check_date):
+            print(f"找到上一个交易日: {check_date}")
+            return check_date
+
+        print(f"警告: 上一个交易日 {check_date} 没有保存数据")
         return None
 
-    def load_progress_history(self):
-        """加载进阶追踪的历史数据
-        优先从 stock_progress_tracker.xlsx 读取
-        如果不存在，返回空列表
+    def get_style(self, kind, spec):
+        """样式描述转 openpyxl 样式对象（相同描述共用一个对象）
+        font: [字号, 加粗, 颜色]，fill: 背景色，alignment: [水平, 垂直, 自动换行]
+        border: [左, 右, 上, 下] 边框样式
         """
-        history_rows = []
-
-        if os.path.exists(self.progress_excel):
-            try:
-                wb = openpyxl.load_workbook(self.progress_excel)
-                ws = wb.active
-
-                # 读取所有数据行（跳过表头）
-                # 检查列数，兼容旧版本（12列）和新版本（13列）
-                max_col = min(ws.max_column, 13)
-
-                for row_idx in range(2, ws.max_row + 1):
-                    row_data = []
-                    for col_idx in range(1, 14):  # 13列
-                        if col_idx <= max_col:
-                            cell = ws.cell(row=row_idx, column=col_idx)
-                            row_data.append({
-                                'value': cell.value,
-                                'font': cell.font,
-                                'fill': cell.fill,
-                                'alignment': cell.alignment
-                            })
-                        else:
-                            # 旧数据没有第13列，填充空值
-                            row_data.append({
-                                'value': '',
-                                'font': None,
-                                'fill': None,
-                                'alignment': None
-                            })
-                    history_rows.append(row_data)
-
-                print(f"已加载 {len(history_rows)} 条历史进阶数据")
-            except Exception as e:
-                print(f"加载历史数据失败: {e}")
+        key = (kind, json.dumps(spec))
+        if key not in self.styles:
+            if kind == 'font':
+                size, bold, color = spec
+                self.styles[key] = Font(size=size, bold=bold, color=color)
+            elif kind == 'fill':
+                self.styles[key] = PatternFill(start_color=spec, end_color=spec, fill_type='solid')
+            elif kind == 'border':
+                left, right, top, bottom = spec
+                self.styles[key] = Border(left=Side(style=left), right=Side(style=right),
+                                          top=Side(style=top), bottom=Side(style=bottom))
+            else:
+                horizontal, vertical, wrap_text = spec
+                self.styles[key] = Alignment(horizontal=horizontal, vertical=vertical, wrap_text=wrap_text)
+        return self.styles[key]
 
-        return history_rows
+    def import_progress_history(self):
+        """把旧版进阶追踪 Excel 导入数据库（只在数据库为空时执行一次）"""
+        if self.store.tracker_count() > 0 or not os.path.exists(self.progress_excel):
+            return
 
-    def update_progress_tracker(self, wb, day, board_stocks, max_board):
-        """在workbook中添加进阶追踪sheet"""
+        try:
+            wb = openpyxl.load_workbook(self.progress_excel, read_only=True)
+            ws = wb.active
+
+            rows = []
+            # 读取所有数据行（跳过表头），兼容旧版本（12列）和新版本（13列）
+            for cells in ws.iter_rows(min_row=2, max_col=13):
+                row_data = []
+                for cell in cells:
+                    font = fill = alignment = None
+                    if cell.font is not None and (cell.font.b or cell.font.sz):
+                        color = cell.font.color.rgb if cell.font.color is not None and cell.font.color.type == 'rgb' else None
+                        font = [cell.font.sz, bool(cell.font.b), color[-6:] if isinstance(color, str) else None]
+                    if cell.fill is not None and cell.fill.fill_type == 'solid':
+                        # 主题色、索引色的 rgb 不是字符串，不保留填充色
+                        rgb = cell.fill.fgColor.rgb
+                        fill = rgb[-6:] if isinstance(rgb, str) else None
+                    if cell.alignment is not None and (cell.alignment.horizontal or cell.alignment.wrap_text):
+                        alignment = [cell.alignment.horizontal, cell.alignment.vertical, bool(cell.alignment.wrap_text)]
+                    row_data.append({'value': cell.value, 'font': font, 'fill': fill, 'alignment': alignment})
+                while len(row_data) < 13:
+                    # 旧数据没有第13列，填充空值
+                    row_data.append({'value': '', 'font': None, 'fill': None, 'alignment': None})
+                if row_data[1]['value']:
+                    rows.append((str(row_data[1]['value']), row_data))
+            wb.close()
+
+            self.store.append_tracker_rows(rows)
+            print(f"已从 {self.progress_excel} 导入 {len(rows)} 条历史进阶数据")
+        except Exception as e:
+            print(f"导入历史数据失败: {e}")
+
+    TRACKER_HEADERS = ['连板高度', '日期', '星期', '2板', '3板', '4板', '5板', '6板', '7板', '8板', '9板', '10板', '股票详情']
+
+    def write_tracker_header(self, ws):
+        """设置进阶追踪列宽，返回表头单元格（write_only 工作表逐行追加）"""
+        for col_idx in range(1, len(self.TRACKER_HEADERS) + 1):
+            # 股票详情列宽一些
+            ws.column_dimensions[openpyxl.utils.get_column_letter(col_idx)].width = 50 if col_idx == 13 else 15
+
+        header_cells = []
+        for header in self.TRACKER_HEADERS:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = self.get_style('font', [12, True, 'FFFFFF'])
+            cell.fill = self.get_style('fill', '4472C4')
+            cell.alignment = self.get_style('alignment', ['center', 'center', False])
+            header_cells.append(cell)
+        return header_cells
+
+    def tracker_cells(self, ws, row_data):
+        """一行进阶追踪数据转为 write_only 单元格"""
+        cells = []
+        for cell_data in row_data:
+            cell = WriteOnlyCell(ws, value=cell_data['value'])
+            if cell_data['font']:
+                cell.font = self.get_style('font', cell_data['font'])
+            if cell_data['fill']:
+                cell.fill = self.get_style('fill', cell_data['fill'])
+            if cell_data['alignment']:
+                cell.alignment = self.get_style('alignment', cell_data['alignment'])
+            cells.append(cell)
+        return cells
+
+    def write_tracker_sheet(self, ws, today=None, limit=None):
+        """流式写入进阶追踪sheet（按日期顺序）
+        参数: today - 当天日期，当天的行加高显示，只写到这一天为止
+              limit - 只写最近 limit 行（每日复盘用，耗时不随历史增长）；None 写入全部历史
+        """
+        ws.append(self.write_tracker_header(ws))
+        row_idx = 2
+        for row_data in self.store.tracker_rows(limit=limit, end=today):
+            # 设置行高（当天的行增加高度以容纳更多内容）
+            ws.row_dimensions[row_idx].height = 100 if today is None or row_data[1]['value'] == today else 40
+            ws.append(self.tracker_cells(ws, row_data))
+            row_idx += 1
+
+    def build_tracker_row(self, day, board_stocks, max_board, progress):
+        """生成一天的进阶追踪行（13列，每列为值和样式描述）"""
         from datetime import datetime as dt
 
+        def cell(value, font=None, fill=None, alignment=None):
+            return {'value': value, 'font': font, 'fill': fill, 'alignment': alignment}
+
         # 获取星期
         weekday_map = ['星期一', '星期二', '星期三', '星期四', '星期五', '星期六', '星期日']
         date_obj = dt.strptime(day, '%Y-%m-%d')
         weekday = weekday_map[date_obj.weekday()]
 
-        # 找到最近的一个交易日（而不是简单的昨天）
-        last_trading_day = self.find_last_trading_day(day)
-        if last_trading_day:
-            yesterday_data = self.load_daily_data(last_trading_day)
-        else:
-            yesterday_data = None
-            print("警告: 未找到上一个交易日数据，无法分析题材进阶")
-
-        # 保存今天的数据
-        today_data_dict = {
-            'date': day,
-            'boards': {}
-        }
-        for board_num, stocks in board_stocks.items():
-            topic_groups = defaultdict(list)
-            for stock in stocks:
-                topic = stock['main_topic'] if stock['main_topic'] else '其他'
-                topic_groups[topic].append({
-                    'code': stock['code'],
-                    'name': stock['name']
-                })
-            today_data_dict['boards'][str(board_num)] = {
-                topic: stocks_list for topic, stocks_list in topic_groups.items()
-            }
-
-        self.save_daily_data(day, board_stocks)
-
-        # 分析题材进阶
-        progress = self.analyze_topic_progress(yesterday_data, today_data_dict)
-
-        # 加载历史数据
-        history_rows = self.load_progress_history()
+        # 连板高度、日期、星期
+        center = ['center', 'center', False]
+        row_data = [cell(max_board, alignment=center), cell(day, alignment=center), cell(weekday, alignment=center)]
 
-        # 在workbook中创建新的sheet
-        ws = wb.create_sheet(title='题材进阶追踪')
-
-        # 写入表头
-        headers = ['连板高度', '日期', '星期', '2板', '3板', '4板', '5板', '6板', '7板', '8板', '9板', '10板', '股票详情']
-        for col_idx, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_idx)
-            cell.value = header
-            cell.font = Font(size=12, bold=True, color='FFFFFF')
-            cell.fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            if col_idx == 13:  # 股票详情列宽一些
-                ws.column_dimensions[openpyxl.utils.get_column_letter(col_idx)].width = 50
-            else:
-                ws.column_dimensions[openpyxl.utils.get_column_letter(col_idx)].width = 15
-
-        # 写入历史数据
-        next_row = 2
-        for row_data in history_rows:
-            for col_idx, cell_data in enumerate(row_data, 1):
-                cell = ws.cell(row=next_row, column=col_idx)
-                cell.value = cell_data['value']
-                if cell_data['font']:
-                    cell.font = cell_data['font'].copy()
-                if cell_data['fill']:
-                    cell.fill = cell_data['fill'].copy()
-                if cell_data['alignment']:
-                    cell.alignment = cell_data['alignment'].copy()
-            ws.row_dimensions[next_row].height = 40
-            next_row += 1
-
-        # 写入当天的新数据行
-        # 连板高度
-        cell = ws.cell(row=next_row, column=1)
-        cell.value = max_board
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-
-        # 日期
-        cell = ws.cell(row=next_row, column=2)
-        cell.value = day
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-
-        # 星期
-        cell = ws.cell(row=next_row, column=3)
-        cell.value = weekday
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-
-        # 2-10板的进阶情况
+        # 2-10板的进阶情况（2板在第4列，3板在第5列...）
         for board_num in range(2, 11):
-            col_idx = board_num + 2  # 2板在第4列，3板在第5列...
-            cell = ws.cell(row=next_row, column=col_idx)
-
             if board_num in progress:
                 # 有进阶的题材
                 topics_info = progress[board_num]
@@ -835,8 +751,7 @@ class StockReviewTool:
                         topic, count, color = item
                         text_parts.append(f'{topic}({count})')
 
-                cell.value = '\n'.join(text_parts)
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+                alignment = ['center', 'center', True]
 
                 # 如果只有一个题材，用背景色
                 if len(topics_info) == 1:
@@ -845,90 +760,198 @@ class StockReviewTool:
                         topic, count, color, from_topic = item
                     else:
                         topic, count, color = item
-                    cell.fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
-                    cell.font = Font(size=10, bold=True)
+                    row_data.append(cell('\n'.join(text_parts), font=[10, True, None], fill=color,
+                                         alignment=alignment))
                 else:
                     # 多个题材，用文字颜色（这里简化处理，用第一个题材的颜色）
                     # Excel单元格不支持多种文字颜色，所以用加粗表示
-                    cell.font = Font(size=10, bold=True, color='FF0000')
+                    row_data.append(cell('\n'.join(text_parts), font=[10, True, 'FF0000'], alignment=alignment))
             else:
                 # 没有进阶
-                cell.value = f'{board_num}板'
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.fill = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
+                row_data.append(cell(f'{board_num}板', fill='D3D3D3', alignment=center))
 
-        # 添加股票详情列（第13列）
-        cell = ws.cell(row=next_row, column=13)
+        # 股票详情列（第13列）
         stock_details = []
         for board_num in sorted(board_stocks.keys()):
             stocks = board_stocks[board_num]
             stock_list = []
             for stock in stocks:
-                stock_list.append(f"{stock['name']}:{stock['code']}")
+                stock_list.append(f"{stock.name}:{stock.code}")
             stock_details.append(f"{board_num}板（{' ，'.join(stock_list)}）")
 
-        cell.value = '\n'.join(stock_details)
-        cell.alignment = Alignment(horizontal='left', vertical='top', wrap_text=True)
-        cell.font = Font(size=9)
+        row_data.append(cell('\n'.join(stock_details), font=[9, False, None],
+                             alignment=['left', 'top', True]))
+        return row_data
 
-        # 设置行高（增加高度以容纳更多内容）
-        ws.row_dimensions[next_row].height = 100
+    def append_tracker_rows(self, rows):
+        """追加进阶追踪行到数据库（完整历史的 Excel 按需用 --export-tracker 导出）"""
+        if not rows:
+            return
+        self.store.append_tracker_rows([(row_data[1]['value'], row_data) for row_data in rows])
 
-        # 同时更新独立的进阶追踪文件（用于下次读取历史数据）
-        if os.path.exists(self.progress_excel):
-            tracker_wb = openpyxl.load_workbook(self.progress_excel)
-            tracker_ws = tracker_wb.active
-            tracker_next_row = tracker_ws.max_row + 1
+    def export_progress_tracker(self):
+        """从数据库流式导出完整历史的进阶追踪 Excel（write_only，不读取旧文件）
+        耗时与历史行数成正比，只在需要时手动执行（--export-tracker），每日复盘不再导出
+        """
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet(title='题材进阶追踪')
+        self.write_tracker_sheet(ws)
+        wb.save(self.progress_excel)
+        print(f"进阶追踪已导出: {self.progress_excel}（{self.store.tracker_count()} 天）")
+
+    def update_progress_tracker(self, wb, day, board_stocks, max_board):
+        """在workbook中添加进阶追踪sheet"""
+        # 找到最近的一个交易日（而不是简单的昨天）
+        last_trading_day = self.find_last_trading_day(day)
+        if last_trading_day:
+            yesterday_data = self.load_daily_data(last_trading_day)
         else:
-            tracker_wb = openpyxl.Workbook()
-            tracker_ws = tracker_wb.active
-            tracker_ws.title = '题材进阶追踪'
-
-            # 写入表头
-            for col_idx, header in enumerate(headers, 1):
-                cell = tracker_ws.cell(row=1, column=col_idx)
-                cell.value = header
-                cell.font = Font(size=12, bold=True, color='FFFFFF')
-                cell.fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                if col_idx == 13:  # 股票详情列宽一些
-                    tracker_ws.column_dimensions[openpyxl.utils.get_column_letter(col_idx)].width = 50
-                else:
-                    tracker_ws.column_dimensions[openpyxl.utils.get_column_letter(col_idx)].width = 15
+            yesterday_data = None
+            print("警告: 未找到上一个交易日数据，无法分析题材进阶")
 
-            tracker_next_row = 2
+        # 保存今天的数据
+        today_data_dict = self.save_daily_data(day, board_stocks)
 
-        # 复制当天数据到独立文件（包括第13列）
-        for col_idx in range(1, 14):  # 改为14，包含第13列
-            src_cell = ws.cell(row=next_row, column=col_idx)
-            dst_cell = tracker_ws.cell(row=tracker_next_row, column=col_idx)
-            dst_cell.value = src_cell.value
-            if src_cell.font:
-                dst_cell.font = src_cell.font.copy()
-            if src_cell.fill:
-                dst_cell.fill = src_cell.fill.copy()
-            if src_cell.alignment:
-                dst_cell.alignment = src_cell.alignment.copy()
+        # 分析题材进阶，追加到数据库
+        progress = self.analyze_topic_progress(yesterday_data, today_data_dict)
+        self.append_tracker_rows([self.build_tracker_row(day, board_stocks, max_board, progress)])
 
-        tracker_ws.row_dimensions[tracker_next_row].height = 100
-        tracker_wb.save(self.progress_excel)
+        # 在workbook中创建新的sheet（最近 stats_days 个交易日，从数据库流式写入）
+        ws = wb.create_sheet(title='题材进阶追踪')
+        self.write_tracker_sheet(ws, today=day, limit=self.stats_days)
 
         print(f"进阶追踪sheet已添加到Excel")
 
+    def load_progress_stats(self, day, days=None):
+        """加载截止到 day 的最近 days 个交易日的题材进阶统计"""
+        window = self.calendar.recent(days or self.stats_days, day)
+        return self.progress_engine.load(self.format_day(window[0]), self.format_day(window[-1]))
+
+    STATS_HEADERS = ['题材', '活跃天数', '涨停数', '最高板', '晋级率', '梯队存活率', '最长连续天数']
+
+    def write_progress_stats(self, wb, day, top=50):
+        """在workbook中添加题材统计sheet（最近一段时间的题材汇总和各板晋级率）"""
+        engine = self.load_progress_stats(day)
+        summary = engine.topic_summary().head(top)
+
+        ws = wb.create_sheet(title='题材统计')
+        for col_idx in range(1, len(self.STATS_HEADERS) + 1):
+            ws.column_dimensions[openpyxl.utils.get_column_letter(col_idx)].width = 20 if col_idx == 1 else 14
+
+        header_style = {'font': [12, True, 'FFFFFF'], 'fill': '4472C4', 'alignment': ['center', 'center', False]}
+        center = ['center', 'center', False]
+        ws.append([self.styled_cell(ws, f'最近 {len(engine.days)} 个交易日题材统计（截止 {day}）',
+                                    font=[12, True, None])])
+        ws.append([self.styled_cell(ws, header, **header_style) for header in self.STATS_HEADERS])
+        for row in summary.itertuples(index=False):
+            values = [row.days, row.stocks, row.max_board, self.format_rate(row.promotion_rate),
+                      self.format_rate(row.survival_rate), row.longest_streak]
+            ws.append([self.styled_cell(ws, row.topic, font=[10, True, None], fill=self.get_topic_color(row.topic),
+                                        alignment=center)] +
+                      [self.styled_cell(ws, value, alignment=center) for value in values])
+
+        ws.append([])
+        ws.append([self.styled_cell(ws, header, **header_style) for header in ['板数', '股票数', '晋级数', '晋级率']])
+        for row in engine.promotion_rates().itertuples(index=False):
+            ws.append([self.styled_cell(ws, value, alignment=center)
+                       for value in [f'{row.board}板', row.stocks, int(row.promoted), self.format_rate(row.rate)]])
+
+    @staticmethod
+    def format_rate(rate):
+        return '-' if pd.isna(rate) else f'{rate:.0%}'
+
+    def print_progress_stats(self, day=None, days=None, top=20):
+        """命令行输出题材进阶统计"""
+        day = day or datetime.now().strftime('%Y-%m-%d')
+        engine = self.load_progress_stats(day, days)
+        if engine.data.empty:
+            print("没有每日数据，请先运行复盘或回补")
+            return
+        print(f"题材进阶统计: {engine.days[0]} 至 {engine.days[-1]}（{len(engine.days)} 个交易日）")
+
+        print("\n各板晋级率:")
+        for row in engine.promotion_rates().itertuples(index=False):
+            print(f"  {row.board}板 -> {row.board + 1}板: {int(row.promoted)}/{row.stocks} = {self.format_rate(row.rate)}")
+
+        print(f"\n活跃题材（前{top}）:")
+        for row in engine.topic_summary().head(top).itertuples(index=False):
+            print(f"  {row.topic}: 活跃{row.days}天, 涨停{row.stocks}只, 最高{row.max_board}板, "
+                  f"晋级率{self.format_rate(row.promotion_rate)}, 梯队存活率{self.format_rate(row.survival_rate)}, "
+                  f"最长连续{row.longest_streak}天")
+
+        print(f"\n题材轮动（前{top}）:")
+        for row in engine.rotations().head(top).itertuples(index=False):
+            print(f"  {row.from_topic} -> {row.to_topic}: {row.stocks}只（{row.days}天）")
+
+        print("\n领涨题材轮动链:")
+        for row in engine.rotation_chain().tail(top).itertuples(index=False):
+            print(f"  {row.start} 至 {row.end}: {row.topic}（{row.days}天，最高{row.max_board}板）")
+
+    def backfill(self, start_day, end_day, max_workers=4, rate=10):
+        """回补一段日期的每日数据和进阶追踪
+        先在速率限制下并发获取所有交易日的数据，再按日期顺序在内存中计算题材进阶，
+        一次写入每日数据和进阶追踪行
+        参数: rate - 每秒最多请求数
+        """
+        days = [self.format_day(d) for d in self.calendar.range(start_day, end_day)]
+        if not days:
+            print(f"{start_day} 至 {end_day} 没有交易日")
+            return
+
+        print(f"回补 {days[0]} 至 {days[-1]} 共 {len(days)} 个交易日...")
+        self.release_topic_colors(days[0])
+        # 已缓存梯队的日期不再请求
+        fetched = {}
+        for day in days:
+            ladder = self.limit_up.cached_ladder(day)
+            if ladder is not None:
+                fetched[day] = ladder
+        self.min_interval = 1.0 / rate
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(self.fetch_day, day): day for day in days if day not in fetched}
+                for future in as_completed(futures):
+                    fetched[futures[future]] = future.result()[1]
+        finally:
+            self.min_interval = 0
+
+        # 第一天的进阶需要区间前一个交易日的数据（从数据库读取）
+        last_trading_day = self.find_last_trading_day(days[0])
+        yesterday_data = self.load_daily_data(last_trading_day) if last_trading_day else None
+
+        rows = []
+        for day in days:
+            if not fetched[day]:
+                print(f"{day} 没有获取到涨停股票数据，跳过")
+                yesterday_data = None
+                continue
+
+            board_stocks = self.classify_stocks_by_board(fetched[day])
+            today_data = self.save_daily_data(day, board_stocks)
+            progress = self.analyze_topic_progress(yesterday_data, today_data)
+            rows.append(self.build_tracker_row(day, board_stocks, max(board_stocks.keys()), progress))
+            yesterday_data = today_data
+
+        self.append_tracker_rows(rows)
+        self.save_topic_colors()
+        print(f"回补完成: 写入 {len(rows)} 天的每日数据和进阶追踪")
+
     def run(self, day=None):
         """运行复盘工具"""
         if day is None:
             day = datetime.now().strftime('%Y-%m-%d')
 
+        if not self.is_trading_day(day):
+            print(f"{day} 不是交易日，无需复盘")
+            return
+
         print(f"正在获取 {day} 的涨停数据...")
 
-        # 获取板数统计
-        board_index = self.get_daily_limit_index(day)
+        # 并发获取板数统计和所有板数的股票（1-5板及以上）
+        board_index, all_stocks = self.fetch_day(day)
         if board_index:
             print(f"板数统计: 一板{board_index[0]}个, 二板{board_index[1]}个, 三板{board_index[2]}个, 四板{board_index[3]}个, 更高{board_index[4]}个")
 
-        # 获取所有板数的股票（1-5板及以上）
-        all_stocks = self.get_all_board_stocks(day)
         print(f"共获取到 {len(all_stocks)} 只涨停股票")
 
         if not all_stocks:
@@ -937,6 +960,7 @@ class StockReviewTool:
 
         # 按连板数分类
         board_stocks = self.classify_stocks_by_board(all_stocks)
+        self.release_topic_colors(day)
 
         # 打印分类结果
         for board_num in sorted(board_stocks.keys()):
@@ -952,21 +976,49 @@ class StockReviewTool:
         print(f"\n正在添加进阶追踪sheet...")
         self.update_progress_tracker(wb, day, board_stocks, max_board)
 
+        # 最近一段时间的题材统计（需要交易日历）
+        try:
+            self.write_progress_stats(wb, day)
+        except Exception as e:
+            print(f"警告: 题材统计生成失败 ({e})")
+        self.save_topic_colors()
+
         # 保存Excel文件
         wb.save(filename)
         print(f"\n复盘完成！文件已保存: {filename}")
         print(f"  - Sheet1: 连板复盘（当天数据）")
-        print(f"  - Sheet2: 题材进阶追踪（历史累积）")
+        print(f"  - Sheet2: 题材进阶追踪（最近{self.stats_days}个交易日，完整历史用 --export-tracker 导出）")
+        print(f"  - Sheet3: 题材统计（最近{self.stats_days}个交易日）")
 
         return filename
 
 
 if __name__ == '__main__':
-    import sys
-    
+    import argparse
+
+    parser = argparse.ArgumentParser(description='股票连板复盘工具')
     # 可以通过命令行参数指定日期，格式：YYYY-MM-DD
-    day = sys.argv[1] if len(sys.argv) > 1 else None
-    
-    tool = StockReviewTool()
-    tool.run(day)
+    parser.add_argument('day', nargs='?', default=None, help='复盘日期（默认今天）')
+    parser.add_argument('--from', dest='from_day', help='回补起始日期')
+    parser.add_argument('--to', dest='to_day', help='回补结束日期（默认今天）')
+    parser.add_argument('--stats', action='store_true', help='输出题材进阶统计（截止 day）')
+    parser.add_argument('--days', type=int, default=None, help='统计最近多少个交易日（默认250）')
+    parser.add_argument('--export-tracker', action='store_true', help='导出完整历史的进阶追踪 Excel')
+    parser.add_argument('--watch', action='store_true', help='盘中实时跟踪连板梯队')
+    parser.add_argument('--interval', type=float, default=30, help='实时跟踪的轮询间隔（秒）')
+    parser.add_argument('--view', default=None, help='实时跟踪页面文件（.html 或 .json）')
+    parser.add_argument('--webhook', default=None, help='实时跟踪变化推送的飞书 webhook')
+    args = parser.parse_args()
 
+    tool = StockReviewTool()
+    if args.watch:
+        from ladder_watch import LadderWatcher
+        LadderWatcher(tool, interval=args.interval, view_file=args.view, webhook=args.webhook).run(args.day)
+    elif args.export_tracker:
+        tool.export_progress_tracker()
+    elif args.stats:
+        tool.print_progress_stats(args.day, args.days)
+    elif args.from_day:
+        tool.backfill(args.from_day, args.to_day or datetime.now().strftime('%Y-%m-%d'))
+    else:
+        tool.run(args.day)
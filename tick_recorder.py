@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+行情录制与回放
+盘中把每一批行情按列追加写入当天目录下的定长二进制文件（可直接 memmap 读取），
+收盘后压缩成一个 {交易日}.npz 文件。回放时按录制的时间顺序逐批返回行情，
+配合可注入的时钟驱动 StockMonitor.monitor，按 1 倍速或尽快重跑一个交易日，
+同时也是每轮处理耗时的基准测试
+"""
+
+import os
+import json
+import time
+import shutil
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+
+# 录制的数值字段（与行情客户端列名一致）
+RECORD_FIELDS = ('price', 'pre_close', 'open', 'high', 'low', 'volume', 'amount')
+
+
+class SystemClock:
+    """实盘时钟"""
+
+    def now(self):
+        return datetime.now()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def running(self):
+        return True
+
+
+class ReplayClock:
+    """回放时钟：当前时间为正在回放的那一批行情的录制时间
+    speed: 回放倍速，None 表示不等待、尽快回放
+    """
+
+    def __init__(self, times, speed=None):
+        self.times = times  # 每批行情的录制时间（秒级时间戳）
+        self.speed = speed
+        self.index = 0  # 当前回放的批次
+
+    def now(self):
+        return datetime.fromtimestamp(self.times[min(self.index, len(self.times) - 1)])
+
+    def sleep(self, seconds):
+        """跳到下一批行情；按倍速回放时等待录制时的间隔"""
+        if self.index + 1 < len(self.times) and self.speed:
+            time.sleep((self.times[self.index + 1] - self.times[self.index]) / self.speed)
+        self.index += 1
+
+    def running(self):
+        return self.index < len(self.times)
+
+
+class TickRecorder:
+    def __init__(self, directory='ticks', trade_date=None):
+        self.directory = directory
+        self.trade_date = trade_date or datetime.now().strftime('%Y%m%d')
+        self.day_dir = os.path.join(directory, self.trade_date)
+        if not os.path.exists(self.day_dir):
+            os.makedirs(self.day_dir)
+
+        # 代码表：行情中的股票代码映射为 int32 编号，同一天内保持不变
+        self.codes = []
+        self.names = []
+        self.code_index = {}
+        codes_file = os.path.join(self.day_dir, 'codes.json')
+        if os.path.exists(codes_file):
+            # 当天中途重启，接着原来的文件继续写
+            with open(codes_file, 'r', encoding='utf-8') as f:
+                table = json.load(f)
+            self.codes, self.names = table['codes'], table['names']
+            self.code_index = {code: i for i, code in enumerate(self.codes)}
+
+        times_file = os.path.join(self.day_dir, 'times.bin')
+        self.tick = os.path.getsize(times_file) // 8 if os.path.exists(times_file) else 0
+
+        self.files = {column: open(os.path.join(self.day_dir, f'{column}.bin'), 'ab')
+                      for column in ('times', 'tick', 'code') + RECORD_FIELDS}
+
+    def _save_codes(self):
+        with open(os.path.join(self.day_dir, 'codes.json'), 'w', encoding='utf-8') as f:
+            json.dump({'codes': self.codes, 'names': self.names}, f, ensure_ascii=False)
+
+    def record(self, df, ts):
+        """追加一批行情（ts 为获取时间）"""
+        if df is None or df.empty:
+            return
+
+        added = False
+        code_ids = np.empty(len(df), dtype=np.int32)
+        names = df['name'] if 'name' in df.columns else df['ts_code']
+        for i, (code, name) in enumerate(zip(df['ts_code'], names)):
+            code_id = self.code_index.get(code)
+            if code_id is None:
+                code_id = len(self.codes)
+                self.code_index[code] = code_id
+                self.codes.append(code)
+                self.names.append(name)
+                added = True
+            code_ids[i] = code_id
+        if added:
+            self._save_codes()
+
+        np.array([ts.timestamp()], dtype=np.float64).tofile(self.files['times'])
+        np.full(len(df), self.tick, dtype=np.int32).tofile(self.files['tick'])
+        code_ids.tofile(self.files['code'])
+        for field in RECORD_FIELDS:
+            values = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=np.float64)
+            values.tofile(self.files[field])
+        for f in self.files.values():
+            f.flush()
+        self.tick += 1
+
+    def wrap(self, fetch, clock):
+        """包装行情获取函数：每次获取的行情都录制下来"""
+        def recorded_fetch(codes):
+            df = fetch(codes)
+            self.record(df, clock.now())
+            return df
+        return recorded_fetch
+
+    def close(self, compress=True):
+        """收盘后关闭文件，并把当天数据压缩为一个 npz 文件"""
+        for f in self.files.values():
+            f.close()
+        if not compress or self.tick == 0:
+            return None
+
+        tape = TickTape.load(self.day_dir)
+        filename = os.path.join(self.directory, f'{self.trade_date}.npz')
+        columns = {column: np.asarray(tape.columns[column]) for column in tape.columns}
+        np.savez_compressed(filename, times=np.asarray(tape.times), codes=np.array(tape.codes),
+                            names=np.array(tape.names), **columns)
+        shutil.rmtree(self.day_dir)
+        print(f"行情录制已压缩保存: {filename}（{self.tick} 批）")
+        return filename
+
+
+class TickTape:
+    """录制的一天行情（按批次读取）"""
+
+    def __init__(self, times, codes, names, columns):
+        self.times = times  # 每批的录制时间
+        self.codes = list(codes)
+        self.names = list(names)
+        self.columns = columns  # tick/code/各数值字段，每行一只股票的一次报价
+        # 每批在列数组中的起止位置（tick 列按写入顺序递增）
+        self.offsets = np.searchsorted(columns['tick'], np.arange(len(times) + 1))
+
+    @classmethod
+    def load(cls, path):
+        """读取录制文件：当天目录（memmap，录制中也可读取）或收盘后压缩的 npz"""
+        if path.endswith('.npz'):
+            data = np.load(path)
+            columns = {column: data[column] for column in ('tick', 'code') + RECORD_FIELDS}
+            return cls(data['times'], data['codes'].tolist(), data['names'].tolist(), columns)
+
+        with open(os.path.join(path, 'codes.json'), 'r', encoding='utf-8') as f:
+            table = json.load(f)
+        times = np.fromfile(os.path.join(path, 'times.bin'), dtype=np.float64)
+
+        def column_map(column, dtype):
+            filename = os.path.join(path, f'{column}.bin')
+            if os.path.getsize(filename) == 0:
+                return np.empty(0, dtype=dtype)
+            return np.memmap(filename, dtype=dtype, mode='r')
+
+        columns = {'tick': column_map('tick', np.int32), 'code': column_map('code', np.int32)}
+        # 录制中读取时各列长度可能不一致，以最短的为准
+        for field in RECORD_FIELDS:
+            columns[field] = column_map(field, np.float64)
+        rows = min(len(values) for values in columns.values())
+        columns = {column: values[:rows] for column, values in columns.items()}
+        times = times[:int(columns['tick'][-1]) + 1] if rows else times[:0]
+        return cls(times, table['codes'], table['names'], columns)
+
+    def __len__(self):
+        return len(self.times)
+
+    def batch(self, index):
+        """第 index 批行情，返回与行情客户端相同格式的 DataFrame"""
+        start, end = self.offsets[index], self.offsets[index + 1]
+        code_ids = np.asarray(self.columns['code'][start:end])
+        df = pd.DataFrame({field: np.asarray(self.columns[field][start:end]) for field in RECORD_FIELDS})
+        df.insert(0, 'ts_code', np.asarray(self.codes, dtype=object)[code_ids])
+        df.insert(1, 'name', np.asarray(self.names, dtype=object)[code_ids])
+        return df
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+题材颜色分配
+维护 题材 -> 颜色、颜色 -> 题材 两个映射和一个空闲颜色队列，新题材直接从队列头取色（O(1)），
+不再每次收集已用颜色再扫描整个调色板。很久没有出现涨停的题材（按历史数据判断）
+把颜色放回队列尾部给新题材用，颜色池不会随着题材越来越多而耗尽。
+颜色映射保存在数据库，只写入有变化的题材
+"""
+
+import json
+import os
+from collections import deque
+
+
+class TopicColorAllocator:
+    def __init__(self, store, palette, legacy_file=None):
+        """
+        store: ReviewStore
+        palette: 调色板（按优先顺序，重复的颜色只用一次）
+        legacy_file: 旧版 topic_colors.json，数据库中没有颜色映射时导入
+        """
+        self.store = store
+        self.palette = list(dict.fromkeys(palette))
+        self.topic_colors = store.load_topic_colors()
+        if not self.topic_colors and legacy_file and os.path.exists(legacy_file):
+            try:
+                with open(legacy_file, 'r', encoding='utf-8') as f:
+                    self.topic_colors = json.load(f)
+                store.update_topic_colors(self.topic_colors)
+                print(f"已从 {legacy_file} 导入 {len(self.topic_colors)} 个题材颜色")
+            except (OSError, ValueError):
+                self.topic_colors = {}
+
+        # 颜色 -> 题材（旧数据中颜色池用完后有重复颜色，保留最早分配的）
+        self.color_topics = {}
+        for topic, color in self.topic_colors.items():
+            self.color_topics.setdefault(color, topic)
+        self.free = deque(color for color in self.palette if color not in self.color_topics)
+        self.free_set = set(self.free)  # 与队列同步，用于 O(1) 判断颜色是否空闲
+        self.reuse_index = len(self.topic_colors)  # 颜色池用完时循环复用的位置
+
+        # 待保存的变化
+        self.assigned = {}
+        self.released = set()
+
+    def get(self, topic):
+        """获取题材颜色，新题材分配一个空闲颜色"""
+        color = self.topic_colors.get(topic)
+        if color is not None:
+            return color
+
+        if self.free:
+            color = self.free.popleft()
+            self.free_set.discard(color)
+            self.color_topics[color] = topic
+        else:
+            # 颜色池用完（近期活跃题材超过调色板大小），循环使用（会有重复）
+            color = self.palette[self.reuse_index % len(self.palette)]
+            self.reuse_index += 1
+            print(f'警告: 颜色池已用完，题材 "{topic}" 使用重复颜色 {color}')
+
+        self.topic_colors[topic] = color
+        self.assigned[topic] = color
+        self.released.discard(topic)
+        return color
+
+    def release_inactive(self, cutoff):
+        """回收最后一次涨停早于 cutoff（YYYY-MM-DD）的题材的颜色，返回回收的题材数
+        没有历史记录的题材（例如刚分配、当天数据还没保存）保留颜色
+        """
+        last_seen = self.store.topic_last_seen()
+        inactive = [topic for topic in self.topic_colors
+                    if topic in last_seen and last_seen[topic] < cutoff]
+        vacated = set()  # 记录的持有者被回收的颜色
+        for topic in inactive:
+            color = self.topic_colors.pop(topic)
+            if self.color_topics.get(color) == topic:
+                del self.color_topics[color]
+                vacated.add(color)
+            self.assigned.pop(topic, None)
+            self.released.add(topic)
+
+        # 颜色池用完时循环复用的颜色可能还有其他活跃题材在用：改记为其中一个，不放回空闲队列
+        if vacated:
+            for topic, color in self.topic_colors.items():
+                if color in vacated:
+                    self.color_topics.setdefault(color, topic)
+        for color in vacated:
+            if color not in self.color_topics and color in self.palette and color not in self.free_set:
+                self.free.append(color)
+                self.free_set.add(color)
+        return len(inactive)
+
+    def save(self):
+        """保存有变化的题材颜色"""
+        if not self.assigned and not self.released:
+            return
+        self.store.update_topic_colors(self.assigned, self.released)
+        self.assigned = {}
+        self.released = set()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+题材进阶统计
+一次读取数据库中的全部涨停记录（或指定区间），把日期、股票、题材编号后整体做表连接，
+同时算出所有交易日的：各板数晋级率、题材梯队存活率、题材最长连续活跃天数、
+题材轮动（晋级股票换题材的流向）和每日领涨题材的轮动链，不再逐天两两比较
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class TopicProgressEngine:
+    def __init__(self, store, calendar=None):
+        """
+        store: ReviewStore
+        calendar: TradingCalendar，提供时相邻两天必须是相邻交易日才算连续（中间缺数据的日期不计入晋级）
+        """
+        self.store = store
+        self.calendar = calendar
+        self.days = []
+        self.data = pd.DataFrame()
+
+    def load(self, start=None, end=None):
+        """读取 [start, end] 区间的涨停记录并计算次日情况"""
+        sql = 'SELECT date, board, topic, code FROM limit_up'
+        conditions, params = [], []
+        if start:
+            conditions.append('date >= ?')
+            params.append(start)
+        if end:
+            conditions.append('date <= ?')
+            params.append(end)
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        data = pd.read_sql_query(sql, self.store.conn, params=params)
+        # 同一天同一只股票只保留最高板
+        data = data.sort_values('board', ascending=False).drop_duplicates(['date', 'code'])
+
+        self.days = sorted(data['date'].unique())
+        day = pd.Index(self.days).get_indexer(data['date'])
+        data = data.assign(day=day).sort_values(['day', 'board']).reset_index(drop=True)
+
+        # has_next[i]: 第 i 天之后还有数据，且是下一个交易日
+        has_next = np.zeros(len(self.days), dtype=bool)
+        if len(self.days) > 1:
+            has_next[:-1] = True
+            if self.calendar is not None:
+                has_next[:-1] = [self.calendar.next(d) == self.calendar.normalize(n)
+                                 for d, n in zip(self.days[:-1], self.days[1:])]
+        data['has_next'] = has_next[data['day'].to_numpy()]
+
+        # 次日同一只股票的板数和题材（没有涨停为空）
+        following = data[['code', 'day', 'board', 'topic']].rename(
+            columns={'board': 'next_board', 'topic': 'next_topic'})
+        following['day'] -= 1
+        data = data.merge(following, on=['code', 'day'], how='left')
+        data['promoted'] = data['has_next'] & (data['next_board'] == data['board'] + 1)
+
+        self.data = data
+        return self
+
+    def promotion_rates(self):
+        """各板数的晋级率（次日晋级到下一板的股票比例）
+        返回 DataFrame: board, stocks（有次日数据的股票数）, promoted, rate
+        """
+        data = self.data[self.data['has_next']]
+        result = data.groupby('board').agg(stocks=('code', 'size'), promoted=('promoted', 'sum')).reset_index()
+        result['rate'] = result['promoted'] / result['stocks']
+        return result
+
+    def ladder_survival(self):
+        """题材梯队存活率：某天题材有 N 板股票，次日同一题材有 N+1 板股票的比例
+        返回 DataFrame: topic, board, days, survived, rate
+        """
+        levels = self.data.loc[self.data['has_next'], ['topic', 'day', 'board']].drop_duplicates()
+        following = self.data[['topic', 'day', 'board']].drop_duplicates()
+        following = following.assign(day=following['day'] - 1, board=following['board'] - 1, survived=True)
+        levels = levels.merge(following, on=['topic', 'day', 'board'], how='left')
+        levels['survived'] = levels['survived'].notna()
+        result = levels.groupby(['topic', 'board']).agg(days=('day', 'size'),
+                                                        survived=('survived', 'sum')).reset_index()
+        result['rate'] = result['survived'] / result['days']
+        return result
+
+    def longest_streaks(self, min_board=2):
+        """题材最长连续活跃天数（每天都有 min_board 板及以上的股票）
+        返回 DataFrame: topic, streak, start, end（按天数降序）
+        """
+        active = self.data.loc[self.data['board'] >= min_board, ['topic', 'day', 'has_next']]
+        active = active.drop_duplicates(['topic', 'day']).sort_values(['topic', 'day'])
+        if active.empty:
+            return pd.DataFrame(columns=['topic', 'streak', 'start', 'end'])
+
+        # 与前一行不是同一题材，或者前一天不是紧接着的交易日，就开始一段新的连续
+        topic = active['topic'].to_numpy()
+        day = active['day'].to_numpy()
+        prev_next = np.r_[False, active['has_next'].to_numpy()[:-1]]
+        breaks = np.r_[True, (topic[1:] != topic[:-1]) | (day[1:] != day[:-1] + 1)] | ~prev_next
+        active = active.assign(run=np.cumsum(breaks))
+        runs = active.groupby('run').agg(topic=('topic', 'first'), streak=('day', 'size'),
+                                         start=('day', 'min'), end=('day', 'max'))
+        runs = runs.sort_values('streak', ascending=False).drop_duplicates('topic')
+        days = np.asarray(self.days, dtype=object)
+        runs['start'] = days[runs['start'].to_numpy()]
+        runs['end'] = days[runs['end'].to_numpy()]
+        return runs.reset_index(drop=True)
+
+    def rotations(self):
+        """题材轮动：晋级股票次日换了题材的流向
+        返回 DataFrame: from_topic, to_topic, stocks, days（按股票数降序）
+        """
+        changed = self.data[self.data['promoted'] & (self.data['topic'] != self.data['next_topic'])]
+        result = changed.groupby(['topic', 'next_topic']).agg(stocks=('code', 'size'), days=('day', 'nunique'))
+        result = result.reset_index().rename(columns={'topic': 'from_topic', 'next_topic': 'to_topic'})
+        return result.sort_values('stocks', ascending=False).reset_index(drop=True)
+
+    def leaders(self):
+        """每日领涨题材（最高板所在题材，板数相同时取该板股票多的）
+        返回 DataFrame: date, topic, board, stocks
+        """
+        counts = self.data.groupby(['day', 'board', 'topic']).size().rename('stocks').reset_index()
+        counts = counts.sort_values(['day', 'board', 'stocks'], ascending=[True, False, False])
+        result = counts.drop_duplicates('day')
+        result.insert(0, 'date', np.asarray(self.days, dtype=object)[result['day'].to_numpy()])
+        return result.drop(columns='day').reset_index(drop=True)
+
+    def rotation_chain(self):
+        """领涨题材轮动链：连续多天领涨的题材合并为一段
+        返回 DataFrame: topic, start, end, days, max_board
+        """
+        leaders = self.leaders()
+        if leaders.empty:
+            return pd.DataFrame(columns=['topic', 'start', 'end', 'days', 'max_board'])
+        topic = leaders['topic'].to_numpy()
+        leaders['run'] = np.cumsum(np.r_[True, topic[1:] != topic[:-1]])
+        chain = leaders.groupby('run').agg(topic=('topic', 'first'), start=('date', 'first'), end=('date', 'last'),
+                                           days=('date', 'size'), max_board=('board', 'max'))
+        return chain.reset_index(drop=True)
+
+    def topic_summary(self):
+        """题材汇总：活跃天数、涨停股票数、最高板、晋级率、梯队存活率、最长连续天数
+        返回 DataFrame（按活跃天数、最高板降序）
+        """
+        data = self.data
+        summary = data.groupby('topic').agg(days=('day', 'nunique'), stocks=('code', 'size'),
+                                            max_board=('board', 'max'))
+        eligible = data[data['has_next']].groupby('topic').agg(eligible=('code', 'size'),
+                                                                promoted=('promoted', 'sum'))
+        summary = summary.join(eligible)
+        summary['promotion_rate'] = summary['promoted'] / summary['eligible']
+
+        survival = self.ladder_survival().groupby('topic')[['days', 'survived']].sum()
+        summary['survival_rate'] = survival['survived'] / survival['days']
+        streaks = self.longest_streaks().set_index('topic')['streak']
+        summary['longest_streak'] = streaks.reindex(summary.index).fillna(0).astype(int)
+
+        summary = summary.drop(columns=['eligible', 'promoted']).reset_index()
+        return summary.sort_values(['days', 'max_board'], ascending=False).reset_index(drop=True)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+交易日历
+从 trade_cal 一次性加载沪市交易日历并保存到本地，之后直接读本地文件；
+建立 日期 -> 交易日序号 的索引，上一个/下一个交易日、往前第 N 个交易日、
+区间内交易日等查询都是 O(1) 查表，不再按自然日估算窗口或逐天试探
+"""
+
+import os
+import bisect
+import pandas as pd
+from datetime import datetime, date
+
+
+class TradingCalendar:
+    def __init__(self, pro=None, cache_file=os.path.join('bar_cache', 'trade_cal.csv')):
+        self.pro = pro  # 为 None 时按需创建（使用 tushare 本地保存的 token）
+        self.cache_file = cache_file
+        self.dates = []  # 交易日（升序，YYYYMMDD）
+        self.position = {}  # 交易日 -> 序号
+        self.floor = {}  # 日历中每一天 -> 不晚于该日的最后一个交易日的序号
+        self.start = None  # 日历覆盖的起止日期
+        self.end = None
+        self.refreshed = False
+
+    @staticmethod
+    def normalize(day):
+        """日期统一为 YYYYMMDD 字符串（支持 datetime、date、YYYY-MM-DD）"""
+        if isinstance(day, (datetime, date)):
+            return day.strftime('%Y%m%d')
+        return str(day).replace('-', '')
+
+    def _fetch(self):
+        """从接口下载日历（2000年至今年年底）并保存到本地"""
+        if self.pro is None:
+            import tushare as ts
+            self.pro = ts.pro_api()
+        end = f'{datetime.now().year}1231'
+        cal = self.pro.trade_cal(exchange='SSE', start_date='20000101', end_date=end,
+                                 fields='cal_date,is_open')
+        cal = cal[['cal_date', 'is_open']].astype({'cal_date': str, 'is_open': int})
+
+        directory = os.path.dirname(self.cache_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        cal.to_csv(self.cache_file, index=False)
+        return cal
+
+    def _build(self, cal):
+        cal = cal.sort_values('cal_date')
+        self.dates = cal.loc[cal['is_open'] == 1, 'cal_date'].tolist()
+        self.position = {d: i for i, d in enumerate(self.dates)}
+        self.floor = {}
+        i = -1
+        for day, is_open in zip(cal['cal_date'], cal['is_open']):
+            if is_open == 1:
+                i += 1
+            self.floor[day] = i
+        self.start, self.end = cal['cal_date'].iloc[0], cal['cal_date'].iloc[-1]
+
+    def _ensure(self, day=None):
+        """确保日历已加载并覆盖 day；本地文件不够新时重新下载（每个进程最多一次）"""
+        if not self.dates:
+            if os.path.exists(self.cache_file):
+                self._build(pd.read_csv(self.cache_file, dtype={'cal_date': str}))
+            else:
+                self._build(self._fetch())
+                self.refreshed = True
+        if day is not None and day > self.end and not self.refreshed:
+            self._build(self._fetch())
+            self.refreshed = True
+        if day is not None and not (self.start <= day <= self.end):
+            raise ValueError(f"日期 {day} 超出交易日历范围 {self.start}-{self.end}")
+
+    def is_trading_day(self, day):
+        day = self.normalize(day)
+        self._ensure(day)
+        return day in self.position
+
+    def last(self, day):
+        """不晚于 day 的最后一个交易日（day 是交易日时返回它本身）"""
+        day = self.normalize(day)
+        self._ensure(day)
+        i = self.floor[day]
+        return self.dates[i] if i >= 0 else None
+
+    def prev(self, day, n=1):
+        """day 之前的第 n 个交易日（不含 day）"""
+        day = self.normalize(day)
+        self._ensure(day)
+        i = self.floor[day] - n + (0 if day in self.position else 1)
+        return self.dates[i] if i >= 0 else None
+
+    def next(self, day, n=1):
+        """day 之后的第 n 个交易日（不含 day）"""
+        day = self.normalize(day)
+        self._ensure(day)
+        i = self.floor[day] + n
+        return self.dates[i] if i < len(self.dates) else None
+
+    def range(self, start, end):
+        """[start, end] 区间内的交易日列表"""
+        start, end = self.normalize(start), self.normalize(end)
+        self._ensure(end)
+        lo = bisect.bisect_left(self.dates, start)
+        return self.dates[lo:self.floor[end] + 1]
+
+    def recent(self, n, end, inclusive=True):
+        """截止到 end 的最近 n 个交易日（升序），inclusive=False 时不含 end 当天"""
+        end = self.normalize(end)
+        self._ensure(end)
+        hi = self.floor[end] + 1
+        if not inclusive and end in self.position:
+            hi -= 1
+        return self.dates[max(0, hi - n):hi]
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+全市场股票表
+每天加载一次 stock_basic（本地按日缓存），把 ts_code 映射为连续的 int32 编号，
+名称、交易所、板块、行业、上市日期、涨跌停幅度等属性按编号存放在数组中。
+盘中的筛选、关联都先把代码转成编号，再用整数数组运算，不再反复做字符串匹配
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+
+EXCHANGES = ('SH', 'SZ', 'BJ')
+
+BOARD_MAIN = 0  # 主板
+BOARD_GEM = 1  # 创业板
+BOARD_STAR = 2  # 科创板
+BOARD_BSE = 3  # 北交所
+BOARD_NAMES = ('主板', '创业板', '科创板', '北交所')
+
+
+class StockUniverse:
+    def __init__(self, pro, cache_dir='bar_cache'):
+        self.pro = pro
+        self.cache_dir = os.path.join(cache_dir, 'universe')
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        self.loaded_date = None
+        self.basic = pd.DataFrame()  # stock_basic 原始数据，行号即编号
+        self.index = pd.Index([])  # 加载失败时为空表，所有代码的编号都是 -1
+        self.symbol_index = pd.Index([])
+
+    def load(self):
+        """加载当天的股票表（每天只请求一次接口）"""
+        today = datetime.now().strftime('%Y%m%d')
+        if self.loaded_date == today:
+            return
+
+        filename = os.path.join(self.cache_dir, f'{today}.csv')
+        if os.path.exists(filename):
+            data = pd.read_csv(filename, dtype=str)
+        else:
+            data = self.pro.stock_basic(exchange='', list_status='L',
+                                        fields='ts_code,symbol,name,area,industry,list_date')
+            data.to_csv(filename, index=False)
+
+        self.build(data)
+        self.loaded_date = today
+
+    def build(self, data):
+        """由 stock_basic 数据建立编号和属性数组"""
+        data = data.sort_values('ts_code').reset_index(drop=True)
+        self.basic = data
+        self.index = pd.Index(data['ts_code'])
+        self.symbol_index = pd.Index(data['symbol'].astype(str))
+
+        self.codes = data['ts_code'].to_numpy(dtype=object)
+        self.names = data['name'].fillna('').to_numpy(dtype=object)
+
+        suffix = data['ts_code'].str[-2:]
+        self.exchange = np.full(len(data), -1, dtype=np.int8)
+        for i, exchange in enumerate(EXCHANGES):
+            self.exchange[(suffix == exchange).to_numpy()] = i
+
+        symbol = data['symbol'].astype(str)
+        self.board = np.full(len(data), BOARD_MAIN, dtype=np.int8)
+        self.board[symbol.str.startswith(('300', '301')).to_numpy()] = BOARD_GEM
+        self.board[symbol.str.startswith(('688', '689')).to_numpy()] = BOARD_STAR
+        self.board[self.exchange == EXCHANGES.index('BJ')] = BOARD_BSE
+
+        codes, self.industries = pd.factorize(data['industry'].fillna(''))
+        self.industry = codes.astype(np.int16)  # 行业编号，名称见 self.industries
+        self.list_date = pd.to_numeric(data['list_date'], errors='coerce').fillna(0).to_numpy(dtype=np.int32)
+        self.is_st = data['name'].fillna('').str.contains('ST').to_numpy()
+
+        # 涨跌停幅度：主板10%（ST 5%），创业板/科创板20%，北交所30%
+        self.limit_ratio = np.full(len(data), 0.10, dtype=np.float32)
+        self.limit_ratio[self.is_st & (self.board == BOARD_MAIN)] = 0.05
+        self.limit_ratio[(self.board == BOARD_GEM) | (self.board == BOARD_STAR)] = 0.20
+        self.limit_ratio[self.board == BOARD_BSE] = 0.30
+
+    def __len__(self):
+        return len(self.basic)
+
+    def ids(self, ts_codes):
+        """ts_code 转编号（int32 数组），不在表中的为 -1"""
+        self.load()
+        return self.index.get_indexer(pd.Index(ts_codes)).astype(np.int32)
+
+    def ids_by_symbol(self, symbols):
+        """6位代码转编号，不在表中的为 -1"""
+        self.load()
+        return self.symbol_index.get_indexer(pd.Index(symbols)).astype(np.int32)
+
+    def name(self, ts_code):
+        """股票名称，不在表中返回代码本身"""
+        idx = self.ids([ts_code])[0]
+        return self.names[idx] if idx >= 0 else ts_code
+
+    def mask(self, exchanges=None, boards=None, exclude_st=False):
+        """按交易所、板块、ST 筛选，返回布尔数组（下标为编号）"""
+        self.load()
+        keep = np.ones(len(self.basic), dtype=bool)
+        if exchanges is not None:
+            keep &= np.isin(self.exchange, [EXCHANGES.index(e) for e in exchanges])
+        if boards is not None:
+            keep &= np.isin(self.board, boards)
+        if exclude_st:
+            keep &= ~self.is_st
+        return keep
+
+    def frame(self, ids):
+        """按编号取 stock_basic 数据（DataFrame）"""
+        self.load()
+        return self.basic.iloc[np.asarray(ids)]
+
+    def industry_map(self):
+        """ts_code -> 行业名称"""
+        self.load()
+        return dict(zip(self.codes, self.industries[self.industry]))